@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+過去データの一括生成（バックフィル）CLI
+APIを経由せず、指定期間の全ブロックを生成してSupabase（または --sink で指定したファイル）に直接保存する
+
+使用例:
+    python3 backfill.py --persona child_5yo --start 2025-10-01 --end 2025-10-31
+    python3 backfill.py --all-personas --start 2025-10-01 --end 2025-10-31 --chunk-size 1000
+    python3 backfill.py --all-personas --start 2025-01-01 --end 2025-12-31 --sink sqlite:./demo.db
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+import main
+from sinks import SinkError, create_sink
+
+
+async def backfill(persona_ids: list, start_date: str, end_date: str, chunk_size: int, output) -> dict:
+    await output.open()
+    try:
+        return await main.run_backfill(persona_ids, start_date, end_date, chunk_size=chunk_size, output=output)
+    finally:
+        await output.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="指定期間のデモデータを一括生成してSupabase（またはファイル）に保存")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--persona", action="append", dest="personas", help="対象ペルソナ（複数指定可）")
+    target.add_argument("--all-personas", action="store_true", help="生成に対応している全ペルソナ")
+    parser.add_argument("--start", required=True, help="開始日 YYYY-MM-DD")
+    parser.add_argument("--end", help="終了日 YYYY-MM-DD（省略時は開始日のみ）")
+    parser.add_argument("--chunk-size", type=int, default=main.UPSERT_CHUNK_SIZE, help="複数行upsertの1回あたりの件数")
+    parser.add_argument("--sink", default=main.SINK, help="出力先（supabase / ndjson:<dir> / parquet:<dir> / sqlite:<file>）")
+    return parser.parse_args(argv)
+
+
+def main_cli(argv=None) -> int:
+    args = parse_args(argv)
+
+    persona_ids = list(main.PERSONAS) if args.all_personas else args.personas
+    end_date = args.end or args.start
+    try:
+        for persona_id in persona_ids:
+            main.validate_persona(persona_id)
+        main.validate_backfill_range(args.start, end_date)
+    except main.HTTPException as e:
+        print(f"Error: {e.detail}")
+        return 1
+
+    try:
+        output = create_sink(args.sink, main.supabase_pool, args.chunk_size)
+    except SinkError as e:
+        print(f"Error: {e}")
+        return 1
+    if not output.configured:
+        print("Error: Supabase credentials not configured (SUPABASE_URL / SUPABASE_KEY)")
+        return 1
+
+    print(f"Backfilling {persona_ids} from {args.start} to {end_date} (chunk size: {args.chunk_size}, sink: {args.sink})")
+
+    started = time.perf_counter()
+    totals = asyncio.run(backfill(persona_ids, args.start, end_date, args.chunk_size, output))
+    elapsed = time.perf_counter() - started
+
+    print(f"Days: {totals['days']}")
+    print(f"spot_results written: {totals['spot_results_written']}")
+    print(f"daily_results written: {totals['daily_results_written']}")
+    print(f"Skipped (unchanged): {totals['writes_skipped']}")
+    print(f"Elapsed: {elapsed:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,121 @@
+"""
+daily_results のインクリメンタル集計
+
+(device_id, local_date) ごとに合計・件数・直前スコア・バーストイベントを保持し、
+新しいブロックが来たら差分だけを適用する（毎回 0..N を再走査しない）。
+"""
+
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+from day_templates import burst_time_str, detect_burst
+
+
+class DailyState:
+    """1デバイス×1日の集計状態"""
+
+    __slots__ = ("device_id", "local_date", "block_index", "count", "total", "last_score", "vibe_scores",
+                 "burst_events", "last_delta")
+
+    def __init__(self, device_id: str, local_date: str):
+        self.device_id = device_id
+        self.local_date = local_date
+        self.block_index = -1  # 適用済みの最後のブロック（夏時間で存在しないブロックも含む）
+        self.count = 0  # 適用したブロック数（存在しないブロックは数えない）
+        self.total = 0
+        self.last_score: Optional[int] = None
+        self.vibe_scores: List[dict] = []
+        self.burst_events: List[dict] = []
+        # 直近の advance で追加された分（{"vibe_scores": [...], "burst_events": [...]}）
+        self.last_delta = {"vibe_scores": [], "burst_events": []}
+
+    @property
+    def average(self) -> float:
+        return self.total / self.count if self.count else 0
+
+    def apply(self, block_index: int, time_iso: str, score: int, describe_burst: Callable[[int, int], str]) -> dict:
+        """ブロック block_index を1件適用し、追加分を返す（バーストは直前に適用したブロックと比べる）"""
+        entry = {"time": time_iso, "score": score}
+        self.vibe_scores.append(entry)
+        delta = {"vibe_scores": [entry], "burst_events": []}
+
+        if self.last_score is not None and detect_burst(self.last_score, score):
+            change = score - self.last_score
+            burst = {
+                "time": burst_time_str(block_index),
+                "event": describe_burst(block_index, change),
+                "score_change": abs(change)
+            }
+            self.burst_events.append(burst)
+            delta["burst_events"].append(burst)
+
+        self.block_index = block_index
+        self.count += 1
+        self.total += score
+        self.last_score = score
+        return delta
+
+
+class DailyAggregator:
+    """(device_id, local_date) ごとの DailyState を保持する
+
+    通常は1ティックにつき1ブロック分の差分適用で済む。同じブロックの再送は何もせず、
+    ブロックが戻った場合（過去ブロックの再生成）だけ先頭から作り直す。
+    日付が変わった時点で前日以前の状態を破棄する。
+    """
+
+    def __init__(self, today: Callable[[], str], max_entries: int = 10000):
+        self._today = today
+        self._max_entries = max_entries
+        self._states: "OrderedDict[tuple, DailyState]" = OrderedDict()
+        self._current_date: Optional[str] = None
+
+    def advance(self, device_id: str, local_date: str, block_index: int, scores: List[int], times: List[str],
+                describe_burst: Callable[[int, int], str], skipped: Optional[List[bool]] = None) -> DailyState:
+        """block_index までの集計状態を返す（scores / times / skipped は48ブロック分）
+
+        skipped のブロック（夏時間で存在しないブロック）は spot_results がないため適用しない。
+        """
+        self._evict_on_rollover()
+        key = (device_id, local_date)
+        state = self._states.get(key)
+        if state is None or state.block_index > block_index:
+            state = DailyState(device_id, local_date)
+            self._states[key] = state
+            if len(self._states) > self._max_entries:
+                self._states.popitem(last=False)
+        else:
+            self._states.move_to_end(key)
+
+        if state.block_index == block_index:
+            # 同じブロックの再送（追加分なし）
+            state.last_delta = {"vibe_scores": [], "burst_events": []}
+            return state
+
+        delta = {"vibe_scores": [], "burst_events": []}
+        for i in range(state.block_index + 1, block_index + 1):
+            if skipped is not None and skipped[i]:
+                continue
+            step = state.apply(i, times[i], scores[i], describe_burst)
+            delta["vibe_scores"].extend(step["vibe_scores"])
+            delta["burst_events"].extend(step["burst_events"])
+        state.block_index = block_index
+        state.last_delta = delta
+        return state
+
+    def get(self, device_id: str, local_date: str) -> Optional[DailyState]:
+        return self._states.get((device_id, local_date))
+
+    def reset(self, device_id: str, local_date: str) -> None:
+        self._states.pop((device_id, local_date), None)
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def _evict_on_rollover(self) -> None:
+        today = self._today()
+        if today == self._current_date:
+            return
+        self._current_date = today
+        for key in [k for k in self._states if k[1] < today]:
+            del self._states[key]
@@ -0,0 +1,139 @@
+"""
+ペルソナ×日付ごとの1日テンプレートのキャッシュ
+
+48ブロック分の時刻文字列・累積スコア・バーストイベントを1日1回だけ計算し、
+任意ブロック時点の daily_results は事前計算済みデータのスライスで組み立てる。
+"""
+
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+from timezones import DEFAULT_TIMEZONE, block_index
+
+BLOCKS_PER_DAY = 48
+
+
+def detect_burst(previous: int, score: int) -> bool:
+    """バースト判定（|変化| >= 15 またはゼロ交差）"""
+    return abs(score - previous) >= 15 or previous * score < 0
+
+
+def burst_time_str(block_index: int) -> str:
+    """burst_events の time 表記（HH:MM）"""
+    return f"{block_index // 2:02d}:{30 if block_index % 2 == 1 else 0:02d}"
+
+
+class DayTemplate:
+    """1日分（48ブロック）の事前計算済みデータ"""
+
+    __slots__ = (
+        "persona_id", "date", "local_times", "recorded_at_utc", "skipped", "scores",
+        "processed_counts", "cumulative_sums", "vibe_scores", "burst_events", "burst_counts", "day",
+    )
+
+    def __init__(self, persona_id: str, date: str, scores: List[int], describe_burst: Callable[[int, int], str],
+                 day=None, tz_name: str = DEFAULT_TIMEZONE):
+        self.persona_id = persona_id
+        self.date = date
+        self.scores = scores
+        # その日の spot_results 用の値（variation.DeviceDay）
+        self.day = day
+
+        # ブロック開始時刻（ローカル / UTC）と、夏時間で存在しないブロック（timezones.BlockIndex と共有）
+        blocks = block_index(tz_name, date)
+        self.local_times = blocks.local_times
+        self.recorded_at_utc = blocks.recorded_at_utc
+        self.skipped = blocks.skipped
+
+        # 存在しないブロックは spot_results がないので、vibe_scores・平均・件数・バースト判定のどれにも含めない
+        # ブロックiまでの件数と累積和（ブロックiまでの平均 = cumulative_sums[i] / processed_counts[i]）
+        self.processed_counts = []
+        self.cumulative_sums = []
+        self.vibe_scores = []
+        count = 0
+        total = 0
+        for i, score in enumerate(scores):
+            if not self.skipped[i]:
+                count += 1
+                total += score
+                self.vibe_scores.append({"time": self.local_times[i], "score": score})
+            self.processed_counts.append(count)
+            self.cumulative_sums.append(total)
+
+        # バーストイベント（直前の存在するブロックからの |変化| >= 15 またはゼロ交差）と、ブロックiまでの件数
+        self.burst_events = []
+        self.burst_counts = []
+        previous = None
+        for i in range(BLOCKS_PER_DAY):
+            if not self.skipped[i]:
+                if previous is not None and detect_burst(previous, scores[i]):
+                    change = scores[i] - previous
+                    self.burst_events.append({
+                        "time": burst_time_str(i),
+                        "event": describe_burst(i, change),
+                        "score_change": abs(change)
+                    })
+                previous = scores[i]
+            self.burst_counts.append(len(self.burst_events))
+
+    # 以下のスライスの要素はキャッシュと共有されるため、呼び出し側で変更しないこと
+
+    def vibe_scores_until(self, block_index: int) -> List[dict]:
+        """ブロックblock_indexまでの vibe_scores（[{"time", "score"}, ...]、存在しないブロックを除く）"""
+        return self.vibe_scores[:self.processed_counts[block_index]]
+
+    def average_until(self, block_index: int) -> float:
+        """ブロックblock_indexまでの平均 vibe_score"""
+        count = self.processed_counts[block_index]
+        return self.cumulative_sums[block_index] / count if count else 0
+
+    def burst_events_until(self, block_index: int) -> List[dict]:
+        """ブロックblock_indexまでのバーストイベント"""
+        return self.burst_events[:self.burst_counts[block_index]]
+
+
+class DayTemplateCache:
+    """(persona_id, date) をキーにした DayTemplate のキャッシュ
+
+    日付が変わった時点で前日以前のエントリを破棄する。
+    バックフィル等で過去日が大量に入っても max_entries を超えた分は古い順に破棄する。
+    """
+
+    def __init__(self, build: Callable[[str, str], DayTemplate], today: Callable[[], str], max_entries: int = 256):
+        self._build = build
+        self._today = today
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[tuple, DayTemplate]" = OrderedDict()
+        self._current_date: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, persona_id: str, date: str) -> DayTemplate:
+        self._evict_on_rollover()
+        key = (persona_id, date)
+        template = self._entries.get(key)
+        if template is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return template
+
+        self.misses += 1
+        template = self._build(persona_id, date)
+        self._entries[key] = template
+        if len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+        return template
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evict_on_rollover(self) -> None:
+        today = self._today()
+        if today == self._current_date:
+            return
+        self._current_date = today
+        for key in [k for k in self._entries if k[1] < today]:
+            del self._entries[key]
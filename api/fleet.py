@@ -0,0 +1,88 @@
+"""
+フリートモード: 1ペルソナあたり多数の仮想デバイスを生成する
+
+仮想デバイスのIDはペルソナIDと連番から決定的に導出し（uuid5）、
+デバイスごとのスコアのオフセットもデバイスIDから決定的に求める。
+日ごとのばらつき（スコアの揺らぎ・起床/就寝のずれ・summary等の入れ替え）は (デバイスID, 日付) から
+variation.vary で全デバイス×48ブロック分を numpy 配列で一括計算する。
+"""
+
+import uuid
+from functools import lru_cache
+
+import numpy as np
+
+from persona_engine import PersonaTable
+from score_engine import summarize
+from timezones import block_index as get_block_index
+from variation import day_seeds, vary
+
+# 仮想デバイスID導出用の名前空間（固定値。変更すると全仮想デバイスのIDが変わる）
+FLEET_NAMESPACE = uuid.UUID("6f1c2a4e-3b7d-5e8f-9a0b-1c2d3e4f5a6b")
+
+SCORE_OFFSET_RANGE = 8  # デバイスごとのスコアオフセット [-8, 8]
+
+
+def fleet_device_id(persona_id: str, index: int) -> str:
+    """仮想デバイスのdevice_id（同じペルソナ・連番なら常に同じ値）"""
+    return str(uuid.uuid5(FLEET_NAMESPACE, f"{persona_id}/{index}"))
+
+
+class Fleet:
+    """1ペルソナ分の仮想デバイス群（日付によらない部分）"""
+
+    def __init__(self, persona_id: str, size: int):
+        self.persona_id = persona_id
+        self.size = size
+        self.device_ids = [fleet_device_id(persona_id, i) for i in range(size)]
+
+        # デバイスIDの下位64bitを種にして、デバイスごとのスコアオフセットを決める
+        seeds = np.array([uuid.UUID(d).int & 0xFFFFFFFFFFFFFFFF for d in self.device_ids], dtype=np.uint64)
+        self.score_offsets = (seeds % np.uint64(2 * SCORE_OFFSET_RANGE + 1)).astype(np.int64) - SCORE_OFFSET_RANGE
+
+
+class FleetDay:
+    """仮想デバイス群の1日分の事前計算済み配列（すべて devices × 48）"""
+
+    def __init__(self, fleet: Fleet, table: PersonaTable, date: str, variation: bool = True):
+        self.fleet = fleet
+        self.date = date
+        self.device_ids = fleet.device_ids
+
+        day = vary(table, day_seeds(fleet.device_ids, date), fleet.score_offsets, enabled=variation)
+        self.routine_index = day.routine_index  # 各ブロックで参照するルーティンのブロック番号
+        self.choice = day.choice  # spot_options の何番目を使うか
+        self.spot_scores = day.spot_scores
+        self.daily_scores = day.daily_scores
+
+        # 夏時間で存在しないブロックを除いたブロック番号と、ブロックiまでのその件数
+        skipped = np.array(get_block_index(table.timezone, date).skipped, dtype=bool)
+        self.blocks = np.flatnonzero(~skipped)
+        self.processed_counts = np.cumsum(~skipped).tolist()
+
+        # daily_results用の累積平均・変化量・バースト判定（全デバイス一括、存在するブロックの列だけで計算するため
+        # バーストは直前の存在するブロックと比べる。summary の列番号は blocks の添字）
+        self.summary = summarize(self.daily_scores[:, self.blocks])
+
+    def processed_count(self, block_index: int) -> int:
+        """ブロックblock_indexまでの存在するブロック数（daily_results の processed_count）"""
+        return self.processed_counts[block_index]
+
+    def block_averages(self, block_index: int) -> np.ndarray:
+        """全デバイスのブロックblock_indexまでの平均スコア"""
+        count = self.processed_count(block_index)
+        if not count:
+            return np.zeros(self.fleet.size)
+        return self.summary.averages[:, count - 1]
+
+
+@lru_cache(maxsize=16)
+def get_fleet(persona_id: str, size: int) -> Fleet:
+    """Fleetを取得（同じペルソナ・台数ならキャッシュを再利用）"""
+    return Fleet(persona_id, size)
+
+
+@lru_cache(maxsize=16)
+def get_fleet_day(table: PersonaTable, size: int, date: str, variation: bool = True) -> FleetDay:
+    """FleetDayを取得（同じペルソナ・台数・日付ならキャッシュを再利用）"""
+    return FleetDay(get_fleet(table.persona_id, size), table, date, variation)
@@ -0,0 +1,153 @@
+"""
+生成したブロックのライブ配信（Server-Sent Events）
+
+/generate 等で生成・保存したブロックごとのイベント（spot_results と daily_results の差分）を購読者に配る。
+
+- イベントは発行時に1回だけSSEのフレーム（bytes）に直列化し、全購読者で同じオブジェクトを共有する
+- 購読者は persona_id / device_id で絞り込める。発行時は索引から該当する購読者だけを引き、購読者全体は走査しない
+- 購読者ごとのキューは上限付き。遅いクライアントのキューがあふれたら古いイベントから捨て、
+  次に送るときに lagged イベントで捨てた件数を知らせる（発行側は待たされない）
+- 購読者がいないイベントは wants() で判定して、組み立て自体を省略できる
+"""
+
+import asyncio
+from collections import deque
+from typing import AsyncIterator, Dict, Optional, Set
+
+from metrics import LIVE_EVENTS_TOTAL
+from serialization import dumps
+
+KEEPALIVE_FRAME = b": keepalive\n\n"
+
+
+class LiveFeedFull(Exception):
+    """購読者数が上限に達している"""
+
+
+def sse_frame(event: str, data: bytes, event_id: Optional[int] = None) -> bytes:
+    """SSEの1イベント分（data はJSON。改行を含まないこと）"""
+    head = b"event: " + event.encode() + b"\n"
+    if event_id is not None:
+        head = b"id: " + str(event_id).encode() + b"\n" + head
+    return head + b"data: " + data + b"\n\n"
+
+
+class Subscription:
+    """1クライアント分の購読（上限付きのキュー）"""
+
+    __slots__ = ("persona_id", "device_id", "max_queue", "queue", "dropped", "_ready")
+
+    def __init__(self, persona_id: Optional[str], device_id: Optional[str], max_queue: int):
+        self.persona_id = persona_id
+        self.device_id = device_id
+        self.max_queue = max_queue
+        self.queue: deque = deque()
+        self.dropped = 0  # まだクライアントに知らせていない、捨てたイベントの件数
+        self._ready = asyncio.Event()
+
+    def matches(self, persona_id: str, device_id: str) -> bool:
+        return ((self.persona_id is None or self.persona_id == persona_id)
+                and (self.device_id is None or self.device_id == device_id))
+
+    def push(self, frame: bytes) -> bool:
+        """フレームを積む（あふれたら最も古いものを捨てて False）"""
+        dropped = len(self.queue) >= self.max_queue
+        if dropped:
+            self.queue.popleft()
+            self.dropped += 1
+        self.queue.append(frame)
+        self._ready.set()
+        return not dropped
+
+    async def frames(self, heartbeat: float) -> AsyncIterator[bytes]:
+        """送信するバイト列を順に返す（溜まっている分はまとめて1回で返す）
+
+        heartbeat 秒イベントがなければ keepalive のコメント行を返す（プロキシに切断されないように）。
+        """
+        while True:
+            if not self.queue:
+                self._ready.clear()
+                try:
+                    await asyncio.wait_for(self._ready.wait(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield KEEPALIVE_FRAME
+                    continue
+            chunks = []
+            if self.dropped:
+                chunks.append(sse_frame("lagged", dumps({"dropped": self.dropped})))
+                self.dropped = 0
+            chunks.extend(self.queue)
+            self.queue.clear()
+            yield b"".join(chunks)
+
+
+class Broadcaster:
+    """購読者へのファンアウト（イベントループ内から呼ぶこと）"""
+
+    def __init__(self, max_queue: int = 256, max_subscribers: int = 10000):
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+        self._all: Set[Subscription] = set()  # 絞り込みなし
+        self._by_persona: Dict[str, Set[Subscription]] = {}
+        self._by_device: Dict[str, Set[Subscription]] = {}  # device_id 指定（persona_id も指定なら発行時に確認）
+        self._count = 0
+        self._sequence = 0
+        self.published = 0
+
+    @property
+    def subscribers(self) -> int:
+        return self._count
+
+    def subscribe(self, persona_id: Optional[str] = None, device_id: Optional[str] = None) -> Subscription:
+        if self._count >= self.max_subscribers:
+            raise LiveFeedFull(f"Too many live feed subscribers (max {self.max_subscribers})")
+        subscription = Subscription(persona_id, device_id, self.max_queue)
+        self._index_for(subscription).add(subscription)
+        self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        index = self._index_for(subscription)
+        if subscription in index:
+            index.discard(subscription)
+            self._count -= 1
+            self._prune(subscription)
+
+    def wants(self, persona_id: str, device_id: str) -> bool:
+        """このデバイスのイベントを受け取る購読者がいるか"""
+        return bool(self._all or self._by_persona.get(persona_id) or self._by_device.get(device_id))
+
+    def publish(self, persona_id: str, device_id: str, event: str, payload: dict) -> int:
+        """イベントを1回だけ直列化して、該当する購読者のキューに積む。積んだ購読者数を返す"""
+        targets = [s for s in self._by_device.get(device_id, ()) if s.matches(persona_id, device_id)]
+        targets.extend(self._by_persona.get(persona_id, ()))
+        targets.extend(self._all)
+        if not targets:
+            return 0
+
+        self._sequence += 1
+        self.published += 1
+        frame = sse_frame(event, dumps(payload), self._sequence)
+        dropped = 0
+        for subscription in targets:
+            if not subscription.push(frame):
+                dropped += 1
+        LIVE_EVENTS_TOTAL.inc(len(targets) - dropped, result="queued")
+        if dropped:
+            LIVE_EVENTS_TOTAL.inc(dropped, result="dropped")
+        return len(targets)
+
+    def _index_for(self, subscription: Subscription) -> Set[Subscription]:
+        if subscription.device_id is not None:
+            return self._by_device.setdefault(subscription.device_id, set())
+        if subscription.persona_id is not None:
+            return self._by_persona.setdefault(subscription.persona_id, set())
+        return self._all
+
+    def _prune(self, subscription: Subscription) -> None:
+        """空になった索引のエントリを削除（wants() が空集合を見ないように）"""
+        if subscription.device_id is not None and not self._by_device.get(subscription.device_id):
+            self._by_device.pop(subscription.device_id, None)
+        elif subscription.device_id is None and subscription.persona_id is not None \
+                and not self._by_persona.get(subscription.persona_id):
+            self._by_persona.pop(subscription.persona_id, None)
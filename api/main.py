@@ -9,19 +9,128 @@ Demo Data Generator API
 - カタログとして複数ユーザーのデモデータ管理
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime, timezone, timedelta
-from supabase import create_client, Client
+from contextlib import asynccontextmanager
+import asyncio
+import hashlib
+import itertools
 import os
+import time
+from functools import lru_cache
+
+import numpy as np
+
+from daily_aggregator import DailyAggregator
+from day_templates import DayTemplate, DayTemplateCache, burst_time_str
+from fleet import fleet_device_id, get_fleet, get_fleet_day
+from live_feed import Broadcaster, LiveFeedFull
+from metrics import GENERATE_TOTAL, REGISTRY, STAGE_SECONDS, Gauge, InFlightMiddleware
+from persona_engine import BUILTIN_PERSONA_DIR, load_personas
+from profiling import RequestProfiler
+from records import WriteIndex, dedupe_latest
+from serialization import FastJSONResponse, dumps, iter_ndjson, loads
+from simulation import SimulationFull, Simulations
+from sinks import Sink, create_sink
+from spool import SpoolSink
+from summaries import get_summary_template
+from supabase_pool import SupabasePool
+from timezones import EarliestDate, block_index as get_block_index, current_blocks
+from variation import day_seeds, vary
+from write_queue import WriteQueue
+
+# 環境変数
+SUPABASE_URL = os.environ.get("SUPABASE_URL") or os.environ.get("VITE_SUPABASE_URL")
+SUPABASE_KEY = os.environ.get("SUPABASE_KEY") or os.environ.get("VITE_SUPABASE_KEY")
+SUPABASE_POOL_SIZE = int(os.environ.get("SUPABASE_POOL_SIZE", "4"))  # 0でプール無効（毎回create_client）
+MAX_BATCH_ITEMS = int(os.environ.get("MAX_BATCH_ITEMS", "1000"))  # /generate/batch の最大件数
+MAX_BACKFILL_DAYS = int(os.environ.get("MAX_BACKFILL_DAYS", "366"))  # /backfill の最大日数
+UPSERT_CHUNK_SIZE = int(os.environ.get("UPSERT_CHUNK_SIZE", "500"))  # 複数行upsertの1回あたりの件数
+MAX_FLEET_DEVICES = int(os.environ.get("MAX_FLEET_DEVICES", "10000"))  # フリートモードの最大仮想デバイス数
+PREVIEW_MAX_AGE = int(os.environ.get("PREVIEW_MAX_AGE", "300"))  # /preview の Cache-Control max-age（秒）
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")  # リクエスト単位のプロファイリングを許可するトークン（空で無効）
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "/tmp/demo-generator-profiles")  # 計測結果（.prof）の保存先
+PERSONA_DIR = os.environ.get("PERSONA_DIR", "")  # 追加のペルソナ定義ファイルのディレクトリ（同じIDなら組み込みの定義を上書き）
+DAY_VARIATION = os.environ.get("DAY_VARIATION", "1") != "0"  # 日ごとのばらつき（0で無効、毎日ペルソナ定義どおりの1日）
+SINK = os.environ.get("SINK", "supabase")  # 出力先（supabase / ndjson:<dir> / parquet:<dir> / sqlite:<file>）
+WRITE_INDEX_MAX_ENTRIES = int(os.environ.get("WRITE_INDEX_MAX_ENTRIES", "100000"))  # 内容が同じ書き込みを省略するためのハッシュの保持件数（0で無効）
+SPOOL_PATH = os.environ.get("SPOOL_PATH", "")  # 先行書き込みスプールのSQLiteファイル（空で無効）
+SPOOL_MAX_ROWS = int(os.environ.get("SPOOL_MAX_ROWS", "100000"))  # スプールの未送信件数の上限
+WRITE_QUEUE_WINDOW_MS = int(os.environ.get("WRITE_QUEUE_WINDOW_MS", "0"))  # 書き込みを合流させる時間窓（0で無効）
+WRITE_QUEUE_MAX_PENDING = int(os.environ.get("WRITE_QUEUE_MAX_PENDING", "5000"))  # この件数に達したら時間窓を待たずに書き出す
+LIVE_FEED_QUEUE_SIZE = int(os.environ.get("LIVE_FEED_QUEUE_SIZE", "256"))  # /live の購読者ごとの未送信イベントの上限（あふれたら古い順に捨てる）
+LIVE_FEED_MAX_SUBSCRIBERS = int(os.environ.get("LIVE_FEED_MAX_SUBSCRIBERS", "10000"))  # /live の同時購読者数の上限
+LIVE_FEED_HEARTBEAT = float(os.environ.get("LIVE_FEED_HEARTBEAT", "15"))  # /live でイベントがないときのkeepaliveの間隔（秒）
+MAX_SIMULATIONS = int(os.environ.get("MAX_SIMULATIONS", "4"))  # 同時に実行できる /simulate の数
+MAX_SIMULATION_SPEED = float(os.environ.get("MAX_SIMULATION_SPEED", "100000"))  # /simulate の最大倍速
+
+# Supabaseクライアントプール（起動時に生成し、アプリ終了まで使い回す）
+supabase_pool = SupabasePool(SUPABASE_URL, SUPABASE_KEY, size=SUPABASE_POOL_SIZE)
+
+# 生成レコードの出力先（デフォルトはSupabase、ndjson:/parquet:/sqlite: でファイル出力）
+sink = create_sink(SINK, supabase_pool, UPSERT_CHUNK_SIZE)
+# X-Profile ヘッダー / ?profile= で指定したリクエストだけを cProfile で計測する
+profiler = RequestProfiler(PROFILE_TOKEN, PROFILE_DIR)
+
+# 主キーごとに最後に書き込んだ内容のハッシュ（同じ内容の再書き込みを省略する）
+write_index = WriteIndex(max_entries=WRITE_INDEX_MAX_ENTRIES)
+# スプール有効時は、まずローカルのジャーナルに書き、バックグラウンドで出力先に送る
+# デッドレターに移した行は書き込めていないので、write_index からも消す
+spool = SpoolSink(sink, SPOOL_PATH, max_rows=SPOOL_MAX_ROWS, batch_size=UPSERT_CHUNK_SIZE,
+                  on_dead_letter=write_index.forget) if SPOOL_PATH else None
+sink = spool or sink
+if spool is not None:
+    REGISTRY.register(Gauge("demo_generator_spool_depth", "Records waiting in the write-ahead spool")).set_function(lambda: spool.depth)
+    REGISTRY.register(Gauge("demo_generator_spool_dead_letter", "Spooled records rejected by the sink")).set_function(
+        lambda: spool.dead_letter
+    )
+if WRITE_QUEUE_WINDOW_MS > 0:
+    # 書き込みを時間窓ごとにまとめ、同じ主キーの更新は後勝ちで1件にする
+    sink = WriteQueue(sink, window=WRITE_QUEUE_WINDOW_MS / 1000, max_pending=WRITE_QUEUE_MAX_PENDING)
+
+# 生成したブロックのライブ配信（GET /live）。イベントは1回だけ直列化して全購読者に配る
+broadcaster = Broadcaster(max_queue=LIVE_FEED_QUEUE_SIZE, max_subscribers=LIVE_FEED_MAX_SUBSCRIBERS)
+REGISTRY.register(Gauge("demo_generator_live_subscribers", "Live feed subscribers currently connected")).set_function(
+    lambda: broadcaster.subscribers
+)
+
+# 早送りシミュレーション（POST /simulate）。仮想時計で指定日のブロックを順に生成・保存する
+simulations = Simulations(max_running=MAX_SIMULATIONS)
+REGISTRY.register(Gauge("demo_generator_simulations_running", "Simulations currently running")).set_function(
+    lambda: simulations.running
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """起動時にSupabaseクライアントを生成し、終了時に閉じる"""
+    if supabase_pool.configured:
+        try:
+            await supabase_pool.open()
+        except Exception as e:
+            # 起動は継続し、/health で degraded を返す
+            print(f"Failed to open Supabase pool: {e}")
+    try:
+        await sink.open()
+    except Exception as e:
+        print(f"Failed to open sink: {e}")
+    yield
+    await simulations.stop_all()
+    await sink.close()
+    await supabase_pool.close()
+
 
 # FastAPIアプリ
 app = FastAPI(
     title="WatchMe Demo Data Generator API",
     description="デモユーザーのdashboard_summaryデータを動的に生成",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # CORS設定
@@ -32,48 +141,14 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# /live（SSE）の購読は接続中ずっと続くため数えない（購読者数は demo_generator_live_subscribers）
+app.add_middleware(InFlightMiddleware, exclude_paths=("/live",))
 
-# 環境変数
-SUPABASE_URL = os.environ.get("SUPABASE_URL") or os.environ.get("VITE_SUPABASE_URL")
-SUPABASE_KEY = os.environ.get("SUPABASE_KEY") or os.environ.get("VITE_SUPABASE_KEY")
-
-
-# ペルソナ定義
-PERSONAS = {
-    "child_5yo": {
-        "name": "5歳男児（幼稚園年長）",
-        "device_id": "a1b2c3d4-e5f6-4a5b-8c9d-0e1f2a3b4c5d",  # デモ用UUID
-        "description": "白幡幼稚園の年長さん、趣味はマインクラフト",
-        "profile": {
-            "age": 5,
-            "gender": "male",
-            "occupation": "幼稚園年長",
-            "hobbies": ["マインクラフト", "ブロック遊び"]
-        }
-    },
-    "adult_30s": {
-        "name": "30代会社員（男性）",
-        "device_id": "00000000-0000-0000-0001-000000000002",  # デモ用UUID
-        "description": "IT企業勤務、在宅ワーク中心",
-        "profile": {
-            "age": 35,
-            "gender": "male",
-            "occupation": "会社員（エンジニア）",
-            "hobbies": ["プログラミング", "読書", "ゲーム"]
-        }
-    },
-    "elderly_70s": {
-        "name": "70代高齢者（女性）",
-        "device_id": "00000000-0000-0000-0001-000000000003",  # デモ用UUID
-        "description": "退職後、趣味の園芸を楽しむ",
-        "profile": {
-            "age": 72,
-            "gender": "female",
-            "occupation": "退職",
-            "hobbies": ["園芸", "散歩", "読書"]
-        }
-    }
-}
+# ペルソナ定義（personas/*.json と PERSONA_DIR の定義ファイルを起動時に48ブロックの配列へコンパイル）
+PERSONA_TABLES = load_personas([BUILTIN_PERSONA_DIR, PERSONA_DIR])
+PERSONAS = {persona_id: table.info for persona_id, table in PERSONA_TABLES.items()}
+PERSONA_TIMEZONES = sorted({table.timezone for table in PERSONA_TABLES.values()})
+earliest_persona_date = EarliestDate(PERSONA_TIMEZONES)
 
 
 # リクエスト/レスポンスモデル
@@ -83,12 +158,37 @@ class GenerateRequest(BaseModel):
     time_block: Optional[str] = None  # HH-MM形式、省略時は現在時刻
 
 
+class GenerateBatchRequest(BaseModel):
+    items: List[GenerateRequest] = Field(..., min_length=1, max_length=MAX_BATCH_ITEMS)
+
+
+class FleetGenerateRequest(GenerateRequest):
+    devices: int = Field(..., ge=1, le=MAX_FLEET_DEVICES)  # 仮想デバイス数
+
+
+class BackfillRequest(BaseModel):
+    persona_id: str
+    start_date: str  # YYYY-MM-DD形式
+    end_date: Optional[str] = None  # YYYY-MM-DD形式、省略時は start_date の1日のみ
+
+
+class SimulationRequest(BaseModel):
+    persona_ids: List[str] = Field(..., min_length=1)
+    date: Optional[str] = None  # YYYY-MM-DD形式、省略時は各ペルソナのタイムゾーンでの今日
+    from_block: str = "00-00"  # HH-MM形式
+    to_block: str = "23-30"  # HH-MM形式
+    speed: float = Field(1000, gt=0, le=MAX_SIMULATION_SPEED)  # 倍速（1000なら1ブロック1.8秒）
+    reset: bool = False  # 開始前にその日の集計状態とdaily_resultsをリセットする
+    devices: Optional[int] = Field(None, ge=1, le=MAX_FLEET_DEVICES)  # 指定時はフリートの仮想デバイスで生成
+
+
 class PersonaInfo(BaseModel):
     persona_id: str
     name: str
     device_id: str
     description: str
     profile: dict
+    timezone: str
 
 
 # ユーティリティ関数
@@ -98,384 +198,117 @@ def get_jst_time():
     return datetime.now(jst)
 
 
-def calculate_time_block(jst_time: datetime) -> tuple:
-    """現在時刻から時刻ブロック番号と文字列を計算"""
-    block_index = (jst_time.hour * 2) + (1 if jst_time.minute >= 30 else 0)
-    block_str = f"{jst_time.hour:02d}-{'30' if jst_time.minute >= 30 else '00'}"
-    return block_index, block_str
+def tick(now: Optional[datetime] = None) -> dict:
+    """1ティック分の現在ブロック {タイムゾーン: (ローカル日付, ブロック番号)}
+
+    ペルソナのタイムゾーンごとに1回だけ計算し、デバイスごとには datetime を作らない。
+    """
+    return current_blocks(now or get_jst_time(), PERSONA_TIMEZONES)
+
+
+def earliest_local_date() -> str:
+    """最も遅れているタイムゾーンの今日（これより前の日付のキャッシュ・集計状態を破棄する）"""
+    return earliest_persona_date(get_jst_time())
 
 
 def generate_vibe_scores_until(block_index: int, persona_id: str) -> List:
     """ペルソナと時刻に応じたvibe_scoresを生成（48ブロック、現在時刻以降はnull）"""
-
-    if persona_id == "child_5yo":
-        # 5歳児の1日のパターン（48ブロック = 24時間）
-        base_pattern = [
-            # 00:00-06:30 (0-12): 睡眠中 -5〜+5
-            0, -2, -3, -5, -2, 0, 2, 3, 5, 2, 0, -2, 3,
-            # 07:00-08:30 (13-16): 起床・朝食 ピーク
-            10, 25, 30, 35,
-            # 09:00-11:30 (17-22): 午前活動（幼稚園）
-            20, 15, 25, 30, 20, 15,
-            # 12:00-13:30 (23-26): 昼食 ピーク
-            35, 40, 35, 30,
-            # 14:00-16:30 (27-32): 午後活動（遊び）
-            25, 20, 30, 25, 20, 15,
-            # 17:00-18:30 (33-36): 夕方（少し疲れ）
-            10, 5, 0, -5,
-            # 19:00-20:30 (37-40): 夕食・家族時間 ピーク
-            20, 30, 35, 25,
-            # 21:00-23:30 (41-47): 就寝準備〜睡眠 下降
-            15, 10, 5, 0, -2, -3, -5, 0
-        ]
-    else:
-        # 他のペルソナは後で実装
-        base_pattern = [0] * 48
+    base_pattern = PERSONA_TABLES[persona_id].daily_scores
 
     # 48ブロック全体を作成し、現在時刻以降をnullにする
-    result = []
-    for i in range(48):
-        if i <= block_index:
-            result.append(base_pattern[i])
-        else:
-            result.append(None)
-
-    return result
+    return [base_pattern[i] if i <= block_index else None for i in range(48)]
 
 
 def generate_behavior_summary(block_index: int, persona_id: str) -> dict:
-    """behavior_summary用のデータを生成"""
-    if persona_id != "child_5yo":
-        # child_5yo以外は空データを返す
-        return {
-            "summary_ranking": [],
-            "time_blocks": {}
-        }
-
-    # 一般的な子供の行動イベントパターン
-    all_events = [
-        {"event": "話し声", "category": "voice", "priority": True},
-        {"event": "子供の話し声", "category": "voice", "priority": True},
-        {"event": "赤ちゃんの喃語", "category": "voice", "priority": True},
-        {"event": "歌声", "category": "voice", "priority": True},
-        {"event": "沸騰する音", "category": "daily_life", "priority": True},
-        {"event": "Water sounds", "category": "daily_life", "priority": True},
-        {"event": "Dishes", "category": "daily_life", "priority": True},
-        {"event": "食器棚の開閉", "category": "daily_life", "priority": True},
-        {"event": "低周波ノイズ", "category": "other", "priority": False},
-        {"event": "動物", "category": "other", "priority": False},
-        {"event": "室内（小部屋）", "category": "other", "priority": False},
-        {"event": "音楽", "category": "other", "priority": False},
-    ]
-
-    # 時間帯ごとのイベントパターン（48ブロック）
-    time_blocks = {}
-    for i in range(48):
-        hour = i // 2
-        minute = "30" if i % 2 == 1 else "00"
-        block_key = f"{hour:02d}-{minute}"
-
-        # 現在時刻以降はスキップ（後でnullにする）
-        if i > block_index:
-            continue
-
-        # 時間帯に応じたイベント
-        events = []
-
-        # 睡眠時間（00:00-06:30）
-        if 0 <= i <= 12:
-            events = [{"count": 3 + (i % 3), "event": "低周波ノイズ"}]
-        # 朝の準備（07:00-08:30）
-        elif 13 <= i <= 16:
-            events = [
-                {"count": 1, "event": "食器棚の開閉"},
-                {"count": 2, "event": "話し声"},
-                {"count": 1, "event": "Water sounds"}
-            ]
-        # 登園・活動時間（09:00-11:30）
-        elif 17 <= i <= 22:
-            events = [
-                {"count": 6, "event": "話し声"},
-                {"count": 2 + (i % 2), "event": "子供の話し声"}
-            ]
-        # 昼食時間（12:00-13:30）
-        elif 23 <= i <= 26:
-            events = [
-                {"count": 6, "event": "話し声"},
-                {"count": 2, "event": "Dishes"},
-                {"count": 1, "event": "食器棚の開閉"}
-            ]
-        # 午後の活動（14:00-16:30）
-        elif 27 <= i <= 32:
-            events = [
-                {"count": 4 + (i % 3), "event": "話し声"},
-                {"count": 2, "event": "動物"}
-            ]
-        # 夕方（17:00-18:30）
-        elif 33 <= i <= 36:
-            events = [
-                {"count": 5, "event": "Water sounds"},
-                {"count": 2, "event": "音楽"},
-                {"count": 1, "event": "Dishes"}
-            ]
-        # 夕食・家族時間（19:00-20:30）
-        elif 37 <= i <= 40:
-            events = [
-                {"count": 6, "event": "話し声"},
-                {"count": 2, "event": "Dishes"},
-                {"count": 2, "event": "室内（小部屋）"}
-            ]
-        # 就寝準備（21:00-23:30）
-        else:
-            events = [
-                {"count": 3, "event": "歌声"},
-                {"count": 2, "event": "低周波ノイズ"}
-            ]
-
-        time_blocks[block_key] = events
-
-    # summary_rankingを生成（全イベントの集計）
-    summary_ranking = []
-    event_counts = {}
-
-    for block_events in time_blocks.values():
-        for event_data in block_events:
-            event_name = event_data["event"]
-            if event_name not in event_counts:
-                event_counts[event_name] = 0
-            event_counts[event_name] += event_data["count"]
-
-    # ランキング形式に変換
-    for event_name, count in sorted(event_counts.items(), key=lambda x: x[1], reverse=True):
-        event_info = next((e for e in all_events if e["event"] == event_name),
-                         {"category": "other", "priority": False})
-        summary_ranking.append({
-            "count": count,
-            "event": event_name,
-            "category": event_info["category"],
-            "priority": event_info["priority"]
-        })
-
-    return {
-        "summary_ranking": summary_ranking,
-        "time_blocks": time_blocks
-    }
+    """behavior_summary用のデータを生成（ペルソナごとの事前計算済みデータから返す）"""
+    return get_summary_template(PERSONA_TABLES[persona_id]).behavior_summary(block_index)
 
 
 def generate_emotion_graph(block_index: int, persona_id: str) -> List:
-    """emotion_opensmile_summary用の感情グラフを生成（48ブロック）"""
-    if persona_id != "child_5yo":
-        # child_5yo以外は空配列を返す
-        return []
+    """emotion_opensmile_summary用の感情グラフを生成（現在ブロックまで）"""
+    return get_summary_template(PERSONA_TABLES[persona_id]).emotion_graph_until(block_index)
 
-    # 8感情のベースパターン（joy, fear, anger, trust, disgust, sadness, surprise, anticipation）
-    # 子供の1日の感情パターン
-    emotion_patterns = []
-
-    for i in range(48):
-        hour = i // 2
-        minute = "30" if i % 2 == 1 else "00"
-        time_str = f"{hour:02d}:{minute}"
-
-        # 時間帯に応じた感情スコア
-        # 睡眠時間（00:00-06:30）
-        if 0 <= i <= 12:
-            emotions = {"joy": 10, "fear": 0, "anger": 5, "trust": 5, "disgust": 1, "sadness": 0, "surprise": 2, "anticipation": 3}
-        # 起床時間（07:00-08:30）
-        elif 13 <= i <= 16:
-            emotions = {"joy": 5, "fear": 1, "anger": 2, "trust": 4, "disgust": 0, "sadness": 3, "surprise": 2, "anticipation": 3}
-        # 活動時間（09:00-11:30）
-        elif 17 <= i <= 22:
-            emotions = {"joy": 10, "fear": 0, "anger": 0, "trust": 5, "disgust": 0, "sadness": 2, "surprise": 2, "anticipation": 3}
-        # 昼食時間（12:00-13:30）
-        elif 23 <= i <= 26:
-            emotions = {"joy": 7, "fear": 2, "anger": 5, "trust": 3, "disgust": 1, "sadness": 8, "surprise": 2, "anticipation": 2}
-        # 午後の活動（14:00-16:30）
-        elif 27 <= i <= 32:
-            emotions = {"joy": 0, "fear": 0, "anger": 10, "trust": 0, "disgust": 2, "sadness": 0, "surprise": 0, "anticipation": 0}
-        # 夕方（17:00-18:30）
-        elif 33 <= i <= 36:
-            emotions = {"joy": 10, "fear": 1, "anger": 5, "trust": 5, "disgust": 2, "sadness": 2, "surprise": 2, "anticipation": 4}
-        # 夕食・家族時間（19:00-20:30）
-        elif 37 <= i <= 40:
-            emotions = {"joy": 0, "fear": 0, "anger": 10, "trust": 0, "disgust": 2, "sadness": 0, "surprise": 0, "anticipation": 0}
-        # 就寝準備（21:00-23:30）
-        else:
-            emotions = {"joy": 10, "fear": 1, "anger": 3, "trust": 5, "disgust": 1, "sadness": 5, "surprise": 2, "anticipation": 3}
-
-        # 現在時刻以降はnullにする
-        if i <= block_index:
-            emotion_data = {**emotions, "time": time_str}
-            emotion_patterns.append(emotion_data)
-        else:
-            # 将来的にはnullを入れる予定だが、配列なので要素自体を追加しない
-            pass
-
-    return emotion_patterns
-
-
-# 5歳児の1日のルーティン（48ブロック分のスタティックデータ）
-CHILD_5YO_DAILY_ROUTINE = [
-    # 00:00-00:30 (0)
-    {"summary": "深夜、静かに睡眠中。", "behavior": "睡眠", "vibe_score": 0, "emotion": "中立"},
-    # 00:30-01:00 (1)
-    {"summary": "深夜、静かに睡眠中。", "behavior": "睡眠", "vibe_score": 0, "emotion": "中立"},
-    # 01:00-01:30 (2)
-    {"summary": "深夜、静かに睡眠中。", "behavior": "睡眠", "vibe_score": 0, "emotion": "中立"},
-    # 01:30-02:00 (3)
-    {"summary": "深夜、静かに睡眠中。", "behavior": "睡眠", "vibe_score": 0, "emotion": "中立"},
-    # 02:00-02:30 (4)
-    {"summary": "深夜、静かに睡眠中。", "behavior": "睡眠", "vibe_score": 0, "emotion": "中立"},
-    # 02:30-03:00 (5)
-    {"summary": "深夜、静かに睡眠中。", "behavior": "睡眠", "vibe_score": 0, "emotion": "中立"},
-    # 03:00-03:30 (6)
-    {"summary": "深夜、静かに睡眠中。", "behavior": "睡眠", "vibe_score": 0, "emotion": "中立"},
-    # 03:30-04:00 (7)
-    {"summary": "深夜、静かに睡眠中。", "behavior": "睡眠", "vibe_score": 0, "emotion": "中立"},
-    # 04:00-04:30 (8)
-    {"summary": "早朝、静かに睡眠中。", "behavior": "睡眠", "vibe_score": 0, "emotion": "中立"},
-    # 04:30-05:00 (9)
-    {"summary": "早朝、静かに睡眠中。", "behavior": "睡眠", "vibe_score": 0, "emotion": "中立"},
-    # 05:00-05:30 (10)
-    {"summary": "早朝、静かに睡眠中。", "behavior": "睡眠", "vibe_score": 0, "emotion": "中立"},
-    # 05:30-06:00 (11)
-    {"summary": "早朝、静かに睡眠中。", "behavior": "睡眠", "vibe_score": 0, "emotion": "中立"},
-    # 06:00-06:30 (12)
-    {"summary": "早朝、まだ睡眠中だが、そろそろ起床の時間。", "behavior": "睡眠", "vibe_score": 0, "emotion": "中立"},
-    # 06:30-07:00 (13)
-    {"summary": "起床時刻。目覚めてゆっくりと起き上がる様子。", "behavior": "準備", "vibe_score": 10, "emotion": "中立"},
-    # 07:00-07:30 (14)
-    {"summary": "朝の準備が始まる。着替えや洗面を行っている。", "behavior": "準備, 着替え, 歯磨き", "vibe_score": 20, "emotion": "中立"},
-    # 07:30-08:00 (15)
-    {"summary": "朝食の時間。家族と一緒に食事をしている。", "behavior": "食事, 家族団らん", "vibe_score": 35, "emotion": "喜び, 中立"},
-    # 08:00-08:30 (16)
-    {"summary": "朝食後、幼稚園の準備を整えている。", "behavior": "準備", "vibe_score": 30, "emotion": "中立"},
-    # 08:30-09:00 (17)
-    {"summary": "幼稚園へ向かう時間。移動中または登園準備。", "behavior": "移動, 準備", "vibe_score": 25, "emotion": "中立"},
-    # 09:00-09:30 (18)
-    {"summary": "幼稚園に到着。友達と遊び始める。", "behavior": "遊び, 友達と遊ぶ", "vibe_score": 40, "emotion": "喜び"},
-    # 09:30-10:00 (19)
-    {"summary": "午前の活動時間。園での遊びや学習活動に参加。", "behavior": "遊び, 学習", "vibe_score": 35, "emotion": "喜び, 中立"},
-    # 10:00-10:30 (20)
-    {"summary": "午前中、友達と元気に遊んでいる。", "behavior": "遊び, 友達と遊ぶ", "vibe_score": 40, "emotion": "喜び"},
-    # 10:30-11:00 (21)
-    {"summary": "午前の活動が続く。ブロック遊びなどに夢中。", "behavior": "遊び", "vibe_score": 35, "emotion": "喜び, 中立"},
-    # 11:00-11:30 (22)
-    {"summary": "昼食前の活動。少しずつお腹が空いてくる時間。", "behavior": "遊び, 準備", "vibe_score": 30, "emotion": "中立"},
-    # 11:30-12:00 (23)
-    {"summary": "給食の準備。手を洗い、配膳を待っている。", "behavior": "準備, 待機", "vibe_score": 25, "emotion": "中立"},
-    # 12:00-12:30 (24)
-    {"summary": "給食の時間。友達と一緒に楽しく食事。", "behavior": "食事, 友達と遊ぶ", "vibe_score": 45, "emotion": "喜び"},
-    # 12:30-13:00 (25)
-    {"summary": "給食後、ゆっくりと休憩時間。", "behavior": "休憩", "vibe_score": 30, "emotion": "中立"},
-    # 13:00-13:30 (26)
-    {"summary": "午後の活動開始前の準備時間。", "behavior": "準備, 休憩", "vibe_score": 25, "emotion": "中立"},
-    # 13:30-14:00 (27)
-    {"summary": "午後の活動。園庭で外遊びや運動。", "behavior": "遊び, 運動", "vibe_score": 40, "emotion": "喜び"},
-    # 14:00-14:30 (28)
-    {"summary": "午後の活動が続く。友達と元気に遊ぶ。", "behavior": "遊び, 友達と遊ぶ", "vibe_score": 40, "emotion": "喜び"},
-    # 14:30-15:00 (29)
-    {"summary": "降園準備の時間。荷物をまとめている。", "behavior": "準備, 片付け", "vibe_score": 25, "emotion": "中立"},
-    # 15:00-15:30 (30)
-    {"summary": "幼稚園から帰宅。家に向かう移動中。", "behavior": "移動", "vibe_score": 20, "emotion": "中立"},
-    # 15:30-16:00 (31)
-    {"summary": "帰宅後、おやつの時間。少し休憩。", "behavior": "食事, 休憩", "vibe_score": 35, "emotion": "喜び, 中立"},
-    # 16:00-16:30 (32)
-    {"summary": "自由時間。マインクラフトで遊び始める。", "behavior": "ゲーム, 遊び", "vibe_score": 50, "emotion": "喜び"},
-    # 16:30-17:00 (33)
-    {"summary": "マインクラフトに夢中。楽しく遊んでいる。", "behavior": "ゲーム", "vibe_score": 55, "emotion": "喜び"},
-    # 17:00-17:30 (34)
-    {"summary": "引き続きゲームや遊びを楽しんでいる。", "behavior": "ゲーム, 遊び", "vibe_score": 50, "emotion": "喜び"},
-    # 17:30-18:00 (35)
-    {"summary": "夕方の時間。少し疲れが見え始める。", "behavior": "休憩, 遊び", "vibe_score": 30, "emotion": "中立"},
-    # 18:00-18:30 (36)
-    {"summary": "夕食の準備時間。家族が集まり始める。", "behavior": "待機, 準備", "vibe_score": 25, "emotion": "中立"},
-    # 18:30-19:00 (37)
-    {"summary": "夕食の時間。家族で食卓を囲む。", "behavior": "食事, 家族団らん", "vibe_score": 45, "emotion": "喜び"},
-    # 19:00-19:30 (38)
-    {"summary": "夕食後、家族とゆっくり過ごす時間。", "behavior": "家族団らん, 会話", "vibe_score": 40, "emotion": "喜び"},
-    # 19:30-20:00 (39)
-    {"summary": "お風呂の時間。入浴の準備と入浴。", "behavior": "入浴, 準備", "vibe_score": 35, "emotion": "喜び, 中立"},
-    # 20:00-20:30 (40)
-    {"summary": "お風呂上がり。就寝準備を始める。", "behavior": "準備, 歯磨き", "vibe_score": 25, "emotion": "中立"},
-    # 20:30-21:00 (41)
-    {"summary": "就寝前のリラックスタイム。絵本を読んだりテレビを見る。", "behavior": "休憩, 読書, テレビ", "vibe_score": 20, "emotion": "中立"},
-    # 21:00-21:30 (42)
-    {"summary": "就寝時刻。布団に入り、眠りにつく準備。", "behavior": "睡眠, 準備", "vibe_score": 10, "emotion": "中立"},
-    # 21:30-22:00 (43)
-    {"summary": "就寝。静かに眠りについている。", "behavior": "睡眠", "vibe_score": 0, "emotion": "中立"},
-    # 22:00-22:30 (44)
-    {"summary": "夜、静かに睡眠中。", "behavior": "睡眠", "vibe_score": 0, "emotion": "中立"},
-    # 22:30-23:00 (45)
-    {"summary": "夜、静かに睡眠中。", "behavior": "睡眠", "vibe_score": 0, "emotion": "中立"},
-    # 23:00-23:30 (46)
-    {"summary": "夜、静かに睡眠中。", "behavior": "睡眠", "vibe_score": 0, "emotion": "中立"},
-    # 23:30-00:00 (47)
-    {"summary": "深夜、静かに睡眠中。", "behavior": "睡眠", "vibe_score": 0, "emotion": "中立"},
-]
 
+def describe_burst_event(persona_id: str, block_index: int, change: int) -> str:
+    """burst_eventsの説明文を生成"""
+    return PERSONA_TABLES[persona_id].describe_burst(block_index, change)
 
-def generate_spot_result_record(persona_id: str, date: str, block_index: int, block_str: str) -> dict:
-    """spot_results table record generation"""
-    if persona_id != "child_5yo":
-        raise ValueError(f"Only 'child_5yo' is currently supported")
 
-    persona = PERSONAS[persona_id]
+def build_day_template(persona_id: str, date: str) -> DayTemplate:
+    """ペルソナ×日付の1日テンプレートを構築（キャッシュミス時のみ呼ばれる）
 
-    # Get data for the current block from 48-block daily routine
-    if block_index < 0 or block_index >= 48:
-        raise ValueError(f"Invalid block_index: {block_index}")
+    (device_id, 日付) ごとのばらつきはここで1回だけ計算し、テンプレートと一緒にキャッシュする。
+    バーストの説明文は、起床・就寝のずれを反映した参照先ブロックのものを使う。
+    """
+    table = PERSONA_TABLES[persona_id]
+    day = vary(table, day_seeds([table.device_id], date), enabled=DAY_VARIATION).device_day(table)
+    return DayTemplate(
+        persona_id, date, day.daily_scores,
+        lambda i, change: table.describe_burst(day.routine_index[i], change), day, table.timezone
+    )
 
-    routine_data = CHILD_5YO_DAILY_ROUTINE[block_index]
 
-    # Current time (JST)
-    now = get_jst_time()
+# 1日テンプレートのキャッシュ（全タイムゾーンで日付が変わったら前日以前のエントリを破棄）
+day_template_cache = DayTemplateCache(build_day_template, today=earliest_local_date)
 
-    # Calculate recorded_at timestamp (beginning of the time block)
-    hour = block_index // 2
-    minute = 30 if block_index % 2 == 1 else 0
-    recorded_at_jst = datetime(
-        int(date.split('-')[0]),
-        int(date.split('-')[1]),
-        int(date.split('-')[2]),
-        hour,
-        minute,
-        0,
-        tzinfo=timezone(timedelta(hours=9))
-    )
+# daily_resultsの集計状態（device_id × local_date ごと、1ティックごとに差分だけ適用）
+daily_aggregator = DailyAggregator(today=earliest_local_date)
 
-    # Convert to UTC for recorded_at
-    recorded_at_utc = recorded_at_jst.astimezone(timezone.utc)
 
-    # Local time (keep JST)
-    local_time = recorded_at_jst
+def build_spot_record(device_id: str, date: str, recorded_at: str, local_time: str,
+                      summary: str, behavior: str, emotion: str, vibe_score: int, created_at: str) -> dict:
+    """spot_results record layout (shared by the single-device and fleet paths)"""
 
     # Generate profile_result JSONB structure (matching production data format)
     profile_result = {
-        "summary": routine_data["summary"],
-        "behavior": routine_data["behavior"],
-        "vibe_score": routine_data["vibe_score"],
-        "emotion": routine_data["emotion"]
+        "summary": summary,
+        "behavior": behavior,
+        "vibe_score": vibe_score,
+        "emotion": emotion
     }
 
     # spot_results record
-    record = {
-        "device_id": persona["device_id"],
-        "recorded_at": recorded_at_utc.isoformat(),
-        "vibe_score": routine_data["vibe_score"],
+    return {
+        "device_id": device_id,
+        "recorded_at": recorded_at,
+        "vibe_score": vibe_score,
         "profile_result": profile_result,
-        "created_at": now.isoformat(),
+        "created_at": created_at,
         "llm_model": "demo-generator-static-data",
-        "summary": routine_data["summary"],
-        "behavior": routine_data["behavior"],
-        "emotion": routine_data["emotion"],
+        "summary": summary,
+        "behavior": behavior,
+        "emotion": emotion,
         "local_date": date,
-        "local_time": local_time.isoformat(),
+        "local_time": local_time,
         "daily_aggregator_status": None,
         "daily_aggregator_processed_at": None
     }
 
-    return record
+
+def generate_spot_result_record(persona_id: str, date: str, block_index: int, block_str: str) -> dict:
+    """spot_results table record generation"""
+    table = PERSONA_TABLES.get(persona_id)
+    if not table:
+        raise ValueError(f"Unknown persona: {persona_id}")
+
+    # Get data for the current block from the compiled 48-block routine
+    if block_index < 0 or block_index >= 48:
+        raise ValueError(f"Invalid block_index: {block_index}")
+
+    template = day_template_cache.get(persona_id, date)
+    if template.skipped[block_index]:
+        raise ValueError(f"Time block {block_str} does not exist on {date} in {table.timezone} (DST gap)")
+    day = template.day
+
+    # Current time (JST)
+    now = get_jst_time()
+
+    return build_spot_record(
+        table.device_id, date,
+        template.recorded_at_utc[block_index], template.local_times[block_index],
+        day.summaries[block_index], day.behaviors[block_index], day.emotions[block_index],
+        day.spot_scores[block_index], now.isoformat()
+    )
 
 
 def generate_prompt(persona_id: str, date: str, block_index: int) -> str:
@@ -508,71 +341,40 @@ def generate_daily_result_record(persona_id: str, date: str, block_index: int, b
     if not persona:
         raise ValueError(f"Unknown persona: {persona_id}")
 
-    # Get vibe scores until current block (simple array)
-    vibe_scores_simple = generate_vibe_scores_until(block_index, persona_id)
-
-    # Convert vibe_scores to daily_results format: [{"time": "ISO8601", "score": value}, ...]
-    vibe_scores = []
-    for i in range(len(vibe_scores_simple)):
-        if vibe_scores_simple[i] is not None:
-            hour = i // 2
-            minute = 30 if i % 2 == 1 else 0
-            time_jst = datetime(
-                int(date.split('-')[0]),
-                int(date.split('-')[1]),
-                int(date.split('-')[2]),
-                hour,
-                minute,
-                0,
-                tzinfo=timezone(timedelta(hours=9))
-            )
-            vibe_scores.append({
-                "time": time_jst.isoformat(),
-                "score": vibe_scores_simple[i]
-            })
-
-    # Calculate average vibe_score
-    valid_scores = [item["score"] for item in vibe_scores]
-    average_vibe_score = sum(valid_scores) / len(valid_scores) if valid_scores else 0
-
-    # Generate burst_events (significant changes)
-    burst_events = []
-    for i in range(1, len(vibe_scores_simple)):
-        if vibe_scores_simple[i] is not None and vibe_scores_simple[i-1] is not None:
-            change = vibe_scores_simple[i] - vibe_scores_simple[i-1]
-            # Detect changes >= 15 or zero-crossing
-            if abs(change) >= 15 or (vibe_scores_simple[i-1] * vibe_scores_simple[i] < 0):
-                hour = i // 2
-                minute = 30 if i % 2 == 1 else 0
-                time_str = f"{hour:02d}:{minute:02d}"
-
-                # Generate event description
-                if persona_id == "child_5yo":
-                    if i == 14:
-                        event = "Morning wake-up and preparation led to mood elevation"
-                    elif i == 24:
-                        event = "Lunch time at kindergarten significantly improved mood"
-                    elif i == 13:
-                        event = "Mood improved upon waking up"
-                    else:
-                        if change > 0:
-                            event = "Mood improved during this period"
-                        else:
-                            event = "Mood became calmer during this period"
-                else:
-                    event = "Mood change detected"
+    if block_index < 0 or block_index >= 48:
+        raise ValueError(f"Invalid block_index: {block_index}")
 
-                burst_events.append({
-                    "time": time_str,
-                    "event": event,
-                    "score_change": abs(change)
-                })
+    # Incremental aggregation: only the blocks since the previous tick are applied
+    template = day_template_cache.get(persona_id, date)
+    state = daily_aggregator.advance(
+        persona["device_id"], date, block_index,
+        template.scores, template.local_times,
+        lambda i, change: describe_burst_event(persona_id, template.day.routine_index[i], change),
+        template.skipped
+    )
+    # Copies, because the running state keeps growing after this record is built
+    vibe_scores = list(state.vibe_scores)
+    average_vibe_score = state.average
+    burst_events = list(state.burst_events)
 
-    # Generate summary (Japanese)
-    if persona_id == "child_5yo":
-        summary = f"{date}は朝の静かな時間帯から始まり、日中にかけて感情の変動が見られました。起床時や園での活動時間に気分が上昇し、午後の遊び時間で活発な様子が続きました。全体として安定した一日でした。"
-    else:
-        summary = f"{persona['name']}のデモデータ（{block_str}時点）"
+    # Current time
+    now = get_jst_time()
+
+    return build_daily_record(
+        persona_id, persona["device_id"], date, state.count, block_str,
+        vibe_scores, average_vibe_score, burst_events, now.isoformat()
+    )
+
+
+def build_daily_record(persona_id: str, device_id: str, date: str, processed_count: int, block_str: str,
+                       vibe_scores: List[dict], average_vibe_score: float, burst_events: List[dict],
+                       timestamp: str) -> dict:
+    """daily_results record layout (shared by the single-device and fleet paths)
+
+    processed_count is the number of blocks aggregated so far (DST-gap blocks are not counted).
+    """
+    # Generate summary (Japanese, from the persona spec's daily_summary)
+    summary = PERSONA_TABLES[persona_id].daily_summary_text(date, block_str)
 
     # Generate behavior (comma-separated, can be empty)
     # For demo data, leave it empty as in the CSV sample
@@ -582,12 +384,9 @@ def generate_daily_result_record(persona_id: str, date: str, block_index: int, b
     # For demo data, leave it empty as in the CSV sample
     profile_result = {}
 
-    # Current time
-    now = get_jst_time()
-
     # daily_results record
-    record = {
-        "device_id": persona["device_id"],
+    return {
+        "device_id": device_id,
         "local_date": date,
         "vibe_score": average_vibe_score,
         "summary": summary,
@@ -595,14 +394,228 @@ def generate_daily_result_record(persona_id: str, date: str, block_index: int, b
         "profile_result": profile_result,
         "vibe_scores": vibe_scores,
         "burst_events": burst_events,
-        "processed_count": block_index + 1,
+        "processed_count": processed_count,
         "last_time_block": block_str if block_str else "",
         "llm_model": "demo-generator-static-data",
-        "created_at": now.isoformat(),
-        "updated_at": now.isoformat()
+        "created_at": timestamp,
+        "updated_at": timestamp
+    }
+
+
+def build_summary_records(persona_id: str, device_id: str, date: str, block_index: int, block_str: str,
+                          timestamp: str) -> tuple:
+    """behavior_summary / emotion_opensmile_summary records (1 row per device and day, cumulative)"""
+    behavior = generate_behavior_summary(block_index, persona_id)
+    behavior_record = {
+        "device_id": device_id,
+        "local_date": date,
+        "summary_ranking": behavior["summary_ranking"],
+        "time_blocks": behavior["time_blocks"],
+        "last_time_block": block_str,
+        "created_at": timestamp,
+        "updated_at": timestamp
+    }
+    emotion_record = {
+        "device_id": device_id,
+        "local_date": date,
+        "emotion_graph": generate_emotion_graph(block_index, persona_id),
+        "last_time_block": block_str,
+        "created_at": timestamp,
+        "updated_at": timestamp
     }
+    return behavior_record, emotion_record
+
+
+def generate_fleet_block_records(persona_id: str, devices: int, date: str, block_index: int, block_str: str) -> tuple:
+    """仮想デバイス群の1ブロック分のレコードを一括生成し、(spot_records, daily_records) を返す
+
+    スコア・平均・バースト判定は FleetDay の numpy 配列から全デバイス分をまとめて取り出す。
+    """
+    if block_index < 0 or block_index >= 48:
+        raise ValueError(f"Invalid block_index: {block_index}")
+
+    table = PERSONA_TABLES[persona_id]
+    fleet = get_fleet_day(table, devices, date, DAY_VARIATION)
+    template = day_template_cache.get(persona_id, date)
+    now_iso = get_jst_time().isoformat()
+
+    # 全デバイス分の列をまとめて取り出す（daily_results は夏時間で存在しないブロックを除いた列から）
+    processed_count = fleet.processed_count(block_index)
+    blocks = fleet.blocks[:processed_count]
+    spot_scores = fleet.spot_scores[:, block_index].tolist()
+    routine_indexes = fleet.routine_index[:, block_index].tolist()
+    choices = fleet.choice[:, block_index].tolist()
+    averages = fleet.block_averages(block_index).tolist()
+    daily_prefixes = fleet.daily_scores[:, blocks].tolist()
+
+    # バーストは (デバイス, 列) の組で取り出してデバイスごとに振り分ける（列はブロック番号に戻す）
+    burst_events = [[] for _ in range(devices)]
+    rows, cols = np.nonzero(fleet.summary.bursts[:, :processed_count])
+    changes = fleet.summary.changes[rows, cols].tolist()
+    burst_blocks = blocks[cols]
+    burst_routine_indexes = fleet.routine_index[rows, burst_blocks].tolist()
+    for row, block, change, routine_index in zip(rows.tolist(), burst_blocks.tolist(), changes, burst_routine_indexes):
+        burst_events[row].append({
+            "time": burst_time_str(block),
+            "event": describe_burst_event(persona_id, routine_index, change),
+            "score_change": abs(change)
+        })
+
+    recorded_at = template.recorded_at_utc[block_index]
+    local_time = template.local_times[block_index]
+    times = [template.local_times[i] for i in blocks.tolist()]
+
+    spot_records = []
+    daily_records = []
+    for i, device_id in enumerate(fleet.device_ids):
+        summary, behavior, emotion = table.spot_options[routine_indexes[i]][choices[i]]
+        spot_records.append(build_spot_record(
+            device_id, date, recorded_at, local_time, summary, behavior, emotion, spot_scores[i], now_iso
+        ))
+        daily_records.append(build_daily_record(
+            persona_id, device_id, date, processed_count, block_str,
+            [{"time": t, "score": score} for t, score in zip(times, daily_prefixes[i])],
+            averages[i], burst_events[i], now_iso
+        ))
+
+    return spot_records, daily_records
+
+
+def block_index_to_str(block_index: int) -> str:
+    """ブロック番号を HH-MM 形式に変換"""
+    return f"{block_index // 2:02d}-{'30' if block_index % 2 == 1 else '00'}"
+
+
+@lru_cache(maxsize=256)
+def render_preview(persona_id: str, date: str, start: int, end: int) -> tuple:
+    """プレビュー用のレコードをJSONにして (ETag, 本文) を返す
+
+    1日テンプレートのスライスから組み立てるだけで、集計状態（daily_aggregator）や
+    Supabaseには触れない。created_at / updated_at は各ブロックの開始時刻に固定し、
+    同じ入力なら常に同じ本文（=同じETag）になるようにする。
+    """
+    table = PERSONA_TABLES[persona_id]
+    template = day_template_cache.get(persona_id, date)
+    day = template.day
+    spot_records = []
+    daily_records = []
+    for i in range(start, end + 1):
+        block_str = block_index_to_str(i)
+        local_time = template.local_times[i]
+        if not template.skipped[i]:
+            spot_records.append(build_spot_record(
+                table.device_id, date, template.recorded_at_utc[i], local_time,
+                day.summaries[i], day.behaviors[i], day.emotions[i], day.spot_scores[i], local_time
+            ))
+        daily_records.append(build_daily_record(
+            persona_id, table.device_id, date, template.processed_counts[i], block_str,
+            template.vibe_scores_until(i), template.average_until(i), template.burst_events_until(i), local_time
+        ))
+
+    body = dumps({
+        "persona_id": persona_id,
+        "device_id": table.device_id,
+        "date": date,
+        "from_block": block_index_to_str(start),
+        "to_block": block_index_to_str(end),
+        "spot_results": spot_records,
+        "daily_results": daily_records,
+    })
+    etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+    return etag, body
+
+
+def iter_backfill_days(persona_id: str, start_date: str, end_date: str):
+    """期間内の各日について (date, 48件のspot_results, 最終ブロックのdaily_results) を順に返す
+
+    daily_resultsは1日の最終状態（23-30時点）だけを1回計算する。
+    夏時間で存在しないブロックの spot_results は作らない。
+    """
+    day = datetime.strptime(start_date, "%Y-%m-%d").date()
+    last_day = datetime.strptime(end_date, "%Y-%m-%d").date()
+    while day <= last_day:
+        date = str(day)
+        skipped = day_template_cache.get(persona_id, date).skipped
+        spot_records = [
+            generate_spot_result_record(persona_id, date, i, block_index_to_str(i))
+            for i in range(48) if not skipped[i]
+        ]
+        daily_record = generate_daily_result_record(persona_id, date, 47, block_index_to_str(47))
+        yield date, spot_records, daily_record
+        day += timedelta(days=1)
+
+
+async def save_records(spot_records: List[dict], daily_records: List[dict], wait: bool = True,
+                       output: Optional[Sink] = None) -> dict:
+    """spot_results / daily_results をシンクに書き込み、テーブルごとの実際の書き込み件数を返す"""
+    return await save_tables({"spot_results": spot_records, "daily_results": daily_records}, wait=wait, output=output)
+
+
+async def save_tables(records_by_table: dict, wait: bool = True, output: Optional[Sink] = None) -> dict:
+    """{テーブル名: レコード一覧} をシンクに書き込み、テーブルごとの実際の書き込み件数を返す
+
+    前回書き込んだ内容と同じレコード（created_at / updated_at を除く）は書き込まない。
+    書き込みキュー有効時は wait=False ならキューに積んだ時点で返り、wait=True ならこのレコードを含むバッチの
+    書き出し完了まで待つ（他の呼び出し元のバッチは待たず、その失敗も返さない）。
+    """
+    output = output or sink
+    changed = {table: write_index.changed(table, records) for table, records in records_by_table.items()}
+    with STAGE_SECONDS.time(stage="save"):
+        results = await asyncio.gather(*(output.write(table, records) for table, (records, _) in changed.items()))
+        pending = {result for result in results if isinstance(result, asyncio.Future)}
+        if wait:
+            if pending:
+                await asyncio.gather(*(asyncio.shield(future) for future in pending))
+            else:
+                await output.sync()
+    # 書き込みに失敗した場合は記録しない（リトライ時に省略されないように）
+    entries = [entry for _, table_entries in changed.values() for entry in table_entries]
+    if wait or not pending:
+        write_index.remember(entries)
+    else:
+        # 書き込みキューに積んだだけの場合は、書き出しに成功した時点で記録する
+        asyncio.gather(*pending).add_done_callback(lambda batch: remember_if_written(batch, entries))
+    return {table: len(records) for table, (records, _) in changed.items()}
+
+
+def remember_if_written(batch: asyncio.Future, entries: List[tuple]) -> None:
+    """書き込みキューのバッチを書き出せた場合だけ、書き込んだ内容のハッシュを記録する"""
+    if not batch.cancelled() and batch.exception() is None:
+        write_index.remember(entries)
+
 
-    return record
+def count_skipped(written: dict, *record_lists: List[dict]) -> int:
+    """save_records() で内容が同じため省略した件数"""
+    return sum(len(records) for records in record_lists) - sum(written.values())
+
+
+async def run_backfill(persona_ids: List[str], start_date: str, end_date: str,
+                       chunk_size: int = UPSERT_CHUNK_SIZE, output: Optional[Sink] = None) -> dict:
+    """期間内の全ブロックを生成し、chunk_size件ずつシンク（デフォルトはSupabase）に書き込む"""
+    output = output or sink
+    spot_buffer = []
+    daily_buffer = []
+    totals = {"days": 0, "spot_results_written": 0, "daily_results_written": 0, "writes_skipped": 0}
+
+    async def flush():
+        written = await save_records(spot_buffer, daily_buffer, wait=False, output=output)
+        totals["spot_results_written"] += written["spot_results"]
+        totals["daily_results_written"] += written["daily_results"]
+        totals["writes_skipped"] += count_skipped(written, spot_buffer, daily_buffer)
+        spot_buffer.clear()
+        daily_buffer.clear()
+
+    for persona_id in persona_ids:
+        for date, spot_records, daily_record in iter_backfill_days(persona_id, start_date, end_date):
+            spot_buffer.extend(spot_records)
+            daily_buffer.append(daily_record)
+            totals["days"] += 1
+            if len(spot_buffer) >= chunk_size:
+                await flush()
+    await flush()
+    await output.sync()
+
+    return totals
 
 
 # APIエンドポイント
@@ -613,14 +626,54 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "personas": "/personas",
-            "generate": "/generate"
+            "generate": "/generate",
+            "generate_batch": "/generate/batch",
+            "backfill": "/backfill",
+            "generate_fleet": "/generate/fleet",
+            "preview": "/preview",
+            "behavior_summary": "/behavior_summary",
+            "emotion_graph": "/emotion_graph",
+            "generate_summaries": "/generate/summaries",
+            "live": "/live",
+            "simulate": "/simulate",
+            "spool": "/spool",
+            "metrics": "/metrics"
         }
     }
 
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": get_jst_time().isoformat()}
+    pool_status = supabase_pool.status()
+    # 認証情報があるのにプールが開いていない場合は degraded
+    status = "healthy" if (pool_status["open"] or not pool_status["configured"]) else "degraded"
+    return {"status": status, "timestamp": get_jst_time().isoformat(), "supabase": pool_status, "sink": sink.status(),
+            "write_index": write_index.status()}
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus形式のメトリクス"""
+    return Response(content=REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/profiles/{profile_id}")
+async def download_profile(profile_id: str, http_request: Request):
+    """保存済みの計測結果（cProfile形式）をダウンロード（トークンが必要）"""
+    if not profiler.authorized(http_request.headers.get("x-profile") or http_request.query_params.get("profile")):
+        raise HTTPException(status_code=403, detail="Profiling is disabled or the token is invalid")
+    path = profiler.path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile '{profile_id}' not found")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
+
+
+@app.get("/spool")
+async def spool_status():
+    """先行書き込みスプールの状態（未送信件数・再試行状況）"""
+    if spool is None:
+        raise HTTPException(status_code=404, detail="Spool is not enabled (set SPOOL_PATH)")
+    return spool.status()
 
 
 @app.get("/personas", response_model=List[PersonaInfo])
@@ -632,77 +685,667 @@ async def list_personas():
             name=p["name"],
             device_id=p["device_id"],
             description=p["description"],
-            profile=p["profile"]
+            profile=p["profile"],
+            timezone=p["timezone"]
         )
         for pid, p in PERSONAS.items()
     ]
 
 
-@app.post("/generate")
-async def generate_and_save(request: GenerateRequest):
-    """Generate demo data and save to Supabase (spot_results + daily_results)"""
-
-    # Supabase connection check
-    if not SUPABASE_URL or not SUPABASE_KEY:
-        raise HTTPException(status_code=500, detail="Supabase credentials not configured")
+def validate_persona(persona_id: str) -> None:
+    """ペルソナの存在を確認（なければHTTPException）"""
 
     # Persona validation
-    if request.persona_id not in PERSONAS:
-        raise HTTPException(status_code=404, detail=f"Persona '{request.persona_id}' not found")
+    if persona_id not in PERSONAS:
+        raise HTTPException(status_code=404, detail=f"Persona '{persona_id}' not found")
+
+
+def parse_time_block(time_block: str) -> int:
+    """HH-MM 形式の時刻ブロックをブロック番号に変換（不正・00-00〜23-30 の範囲外ならHTTPException）"""
+    try:
+        hour, minute = map(int, time_block.split('-'))
+    except:
+        raise HTTPException(status_code=400, detail="Invalid time_block format. Use HH-MM")
+    block_index = (hour * 2) + (1 if minute >= 30 else 0)
+    if not 0 <= hour < 24 or not 0 <= minute < 60:
+        raise HTTPException(status_code=400, detail=f"Invalid time_block {time_block} (00-00 to 23-30)")
+    return block_index
+
+
+def validate_date(date: str) -> None:
+    """YYYY-MM-DD 形式の日付か確認（なければHTTPException）
+
+    datetime.fromisoformat は 20250105 や 2025-W02-1 も受け付けるが、日付の文字列はそのまま
+    local_date・キャッシュのキー・日ごとのばらつきの種になるため、同じ日の表記を1つに限る。
+    """
+    try:
+        valid = str(datetime.strptime(date, "%Y-%m-%d").date()) == date
+    except ValueError:
+        valid = False
+    if not valid:
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+
+
+def validate_backfill_range(start_date: str, end_date: str) -> int:
+    """バックフィルの期間を検証し、日数を返す（/backfill と backfill.py で共通、不正ならHTTPException）"""
+    validate_date(start_date)
+    validate_date(end_date)
+    days = (datetime.strptime(end_date, "%Y-%m-%d") - datetime.strptime(start_date, "%Y-%m-%d")).days + 1
+    if days < 1:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    if days > MAX_BACKFILL_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range too long (max {MAX_BACKFILL_DAYS} days)")
+    return days
+
 
-    # Only child_5yo is supported for now
-    if request.persona_id != "child_5yo":
-        raise HTTPException(status_code=400, detail=f"Only 'child_5yo' is currently supported")
+def persona_label(persona_id: str) -> str:
+    """メトリクスのラベル用（未知のIDでラベルの種類が増えないようにする）"""
+    return persona_id if persona_id in PERSONAS else "unknown"
+
+
+def resolve_generate_target(request: GenerateRequest, blocks: dict) -> tuple:
+    """リクエストを検証し、(date, block_index, block_str) を返す
+
+    blocks は tick() の値。日付・時刻の省略時はペルソナのタイムゾーンでの現在ブロックを使う。
+    """
+
+    validate_persona(request.persona_id)
+    tz_name = PERSONA_TABLES[request.persona_id].timezone
+    today, current = blocks[tz_name]
 
     # Determine date and time
-    jst_now = get_jst_time()
-    date = request.date or str(jst_now.date())
+    date = request.date or today
+    validate_date(date)
 
     if request.time_block:
         # Manual time block specification
-        try:
-            hour, minute = map(int, request.time_block.split('-'))
-            block_index = (hour * 2) + (1 if minute >= 30 else 0)
-            block_str = request.time_block
-        except:
-            raise HTTPException(status_code=400, detail="Invalid time_block format. Use HH-MM")
+        block_index = parse_time_block(request.time_block)
+        block_str = request.time_block
+    else:
+        # Auto-calculate from current time (local time of the persona's timezone)
+        block_index = current
+        block_str = block_index_to_str(current)
+
+    # 夏時間で存在しないブロック
+    if get_block_index(tz_name, date).skipped[block_index]:
+        raise HTTPException(
+            status_code=400, detail=f"Time block {block_str} does not exist on {date} in {tz_name} (DST gap)"
+        )
+
+    return date, block_index, block_str
+
+
+def summarize_generated(persona_id: str, date: str, block_str: str, spot_record: dict, daily_record: dict) -> dict:
+    """生成結果のレスポンス用サマリー"""
+    return {
+        "persona_id": persona_id,
+        "device_id": spot_record["device_id"],
+        "date": date,
+        "time_block": block_str,
+        "spot_recorded_at": spot_record["recorded_at"],
+        "spot_vibe_score": spot_record["vibe_score"],
+        "daily_vibe_score": daily_record["vibe_score"],
+        "daily_processed_count": daily_record["processed_count"],
+    }
+
+
+def live_block_event(persona_id: str, date: str, block_str: str, spot_record: dict, daily_record: dict,
+                     delta: dict) -> dict:
+    """ライブ配信の block イベント（spot_results 1件と、daily_results の前回からの差分）"""
+    return {
+        "persona_id": persona_id,
+        "device_id": spot_record["device_id"],
+        "date": date,
+        "time_block": block_str,
+        "spot_result": spot_record,
+        "daily_delta": {
+            "vibe_score": daily_record["vibe_score"],
+            "processed_count": daily_record["processed_count"],
+            "last_time_block": daily_record["last_time_block"],
+            "vibe_scores": delta["vibe_scores"],
+            "burst_events": delta["burst_events"],
+        },
+    }
+
+
+def aggregator_delta(device_id: str, date: str) -> dict:
+    """直前の generate_daily_result_record で追加された vibe_scores / burst_events"""
+    return daily_aggregator.get(device_id, date).last_delta
+
+
+def publish_blocks(events: List[dict]) -> None:
+    """保存が済んだブロックのイベントを配信する"""
+    for event in events:
+        broadcaster.publish(event["persona_id"], event["device_id"], "block", event)
+
+
+@app.get("/preview")
+async def preview(
+    http_request: Request,
+    persona_id: str,
+    date: Optional[str] = None,
+    from_block: str = "00-00",
+    to_block: Optional[str] = None
+):
+    """生成されるレコードを保存せずに返す（dry-run、Supabase不要）
+
+    同じ入力には同じ本文とETagを返す。If-None-Match が一致すれば 304。
+    プロファイリング時はキャッシュを使わずに組み立て、本文に profile を追加する。
+    """
+    validate_persona(persona_id)
+
+    today, current = tick()[PERSONA_TABLES[persona_id].timezone]
+    date = date or today
+    validate_date(date)
+    start = parse_time_block(from_block)
+    if to_block:
+        end = parse_time_block(to_block)
+    elif date == today:
+        end = current
     else:
-        # Auto-calculate from current time
-        block_index, block_str = calculate_time_block(jst_now)
+        end = 47
+    if not (0 <= start <= end <= 47):
+        raise HTTPException(status_code=400, detail="Invalid block range (00-00 <= from_block <= to_block <= 23-30)")
+
+    if profiler.requested(http_request):
+        async def render():
+            return loads(render_preview.__wrapped__(persona_id, date, start, end)[1])
+        result, profile = await profiler.run(render)
+        return FastJSONResponse({**result, "profile": profile}, headers={"Cache-Control": "no-store"})
+
+    etag, body = render_preview(persona_id, date, start, end)
+
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={PREVIEW_MAX_AGE}"}
+    if http_request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def resolve_summary_target(persona_id: str, date: Optional[str], time_block: Optional[str]) -> tuple:
+    """/behavior_summary /emotion_graph /generate/summaries の対象を検証し、(date, block_index, block_str) を返す"""
+    return resolve_generate_target(GenerateRequest(persona_id=persona_id, date=date, time_block=time_block), tick())
+
 
+@app.get("/behavior_summary")
+async def behavior_summary(persona_id: str, date: Optional[str] = None, time_block: Optional[str] = None):
+    """behavior_summary (event ranking and per-block events) up to the given block, without saving
+
+    Served from per-persona precomputed data (the events do not depend on the date).
+    """
+    date, block_index, block_str = resolve_summary_target(persona_id, date, time_block)
+    summary = generate_behavior_summary(block_index, persona_id)
+    return {
+        "persona_id": persona_id,
+        "device_id": PERSONAS[persona_id]["device_id"],
+        "date": date,
+        "time_block": block_str,
+        **summary,
+    }
+
+
+@app.get("/emotion_graph")
+async def emotion_graph(persona_id: str, date: Optional[str] = None, time_block: Optional[str] = None):
+    """emotion_opensmile_summary graph (8 emotions per block) up to the given block, without saving"""
+    date, block_index, block_str = resolve_summary_target(persona_id, date, time_block)
+    return {
+        "persona_id": persona_id,
+        "device_id": PERSONAS[persona_id]["device_id"],
+        "date": date,
+        "time_block": block_str,
+        "emotion_graph": generate_emotion_graph(block_index, persona_id),
+    }
+
+
+@app.post("/generate")
+async def generate_and_save(request: GenerateRequest, http_request: Request, wait: bool = False):
+    """Generate demo data and save to Supabase (spot_results + daily_results)
+
+    With the write queue enabled, `?wait=true` waits until the records are flushed.
+    With PROFILE_TOKEN set, `X-Profile: <token>` (or `?profile=<token>`) adds a `profile` section.
+    """
+    if profiler.requested(http_request):
+        result, profile = await profiler.run(lambda: generate_one(request, wait))
+        return {**result, "profile": profile}
+    return await generate_one(request, wait)
+
+
+async def generate_one(request: GenerateRequest, wait: bool) -> dict:
+    """1件の生成と保存（/generate の本体）"""
+    started = time.perf_counter()
+    result = "failure"
     try:
-        # Generate spot_results record
-        spot_record = generate_spot_result_record(request.persona_id, date, block_index, block_str)
-
-        # Generate daily_results record (cumulative)
-        daily_record = generate_daily_result_record(request.persona_id, date, block_index, block_str)
-
-        # Save to Supabase
-        supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-        # UPSERT to spot_results (primary key: device_id + recorded_at)
-        result1 = supabase.table("spot_results").upsert(spot_record).execute()
-
-        # UPSERT to daily_results (primary key: device_id + local_date)
-        # This will overwrite the existing record for the same date (cumulative update)
-        result2 = supabase.table("daily_results").upsert(daily_record).execute()
-
-        return {
-            "success": True,
-            "persona_id": request.persona_id,
-            "device_id": spot_record["device_id"],
-            "date": date,
-            "time_block": block_str,
-            "spot_recorded_at": spot_record["recorded_at"],
-            "spot_vibe_score": spot_record["vibe_score"],
-            "daily_vibe_score": daily_record["vibe_score"],
-            "daily_processed_count": daily_record["processed_count"],
-            "tables_updated": ["spot_results", "daily_results"],
-            "message": "Demo data generated and saved successfully to spot_results and daily_results"
-        }
+        # Output (Supabase) connection check
+        if not sink.configured:
+            raise HTTPException(status_code=500, detail="Supabase credentials not configured")
+
+        date, block_index, block_str = resolve_generate_target(request, tick())
+
+        try:
+            # Generate spot_results record
+            with STAGE_SECONDS.time(stage="build_spot_record"):
+                spot_record = generate_spot_result_record(request.persona_id, date, block_index, block_str)
+
+            # Generate daily_results record (cumulative)
+            with STAGE_SECONDS.time(stage="build_daily_record"):
+                daily_record = generate_daily_result_record(request.persona_id, date, block_index, block_str)
+
+            # Live feed event (only built when someone is subscribed)
+            live_events = []
+            if broadcaster.wants(request.persona_id, spot_record["device_id"]):
+                live_events.append(live_block_event(
+                    request.persona_id, date, block_str, spot_record, daily_record,
+                    aggregator_delta(spot_record["device_id"], date)
+                ))
+
+            # Save to the sink (Supabase: async clients borrowed from the startup pool)
+            # Both writes run concurrently, so latency is the slower of the two writes
+            # spot_results: primary key device_id + recorded_at
+            # daily_results: primary key device_id + local_date (overwrites the same date, cumulative update)
+            written = await save_records([spot_record], [daily_record], wait=wait)
+            publish_blocks(live_events)
+
+            result = "success"
+            return {
+                "success": True,
+                **summarize_generated(request.persona_id, date, block_str, spot_record, daily_record),
+                "tables_updated": ["spot_results", "daily_results"],
+                "writes_skipped": count_skipped(written, [spot_record], [daily_record]),
+                "message": "Demo data generated and saved successfully to spot_results and daily_results"
+            }
+
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error generating demo data: {str(e)}")
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage="generate_request")
+        GENERATE_TOTAL.inc(endpoint="generate", persona_id=persona_label(request.persona_id), result=result)
+
+
+@app.post("/generate/batch")
+async def generate_batch_and_save(request: GenerateBatchRequest, http_request: Request, wait: bool = False,
+                                  format: Optional[str] = Query(None, pattern="^(json|ndjson)$")):
+    """Generate demo data for many (persona, date, time_block) items in one round trip
+
+    All records are written as one multi-row upsert per table.
+    Invalid items are reported in `errors` and skipped; valid items are still saved.
+    With the write queue enabled, `?wait=true` waits until the records are flushed.
+    With `?format=ndjson` (or `Accept: application/x-ndjson`) the response is streamed as NDJSON:
+    one `result` / `error` line per item, then one `summary` line.
+    """
+
+    # Output (Supabase) connection check
+    if not sink.configured:
+        raise HTTPException(status_code=500, detail="Supabase credentials not configured")
+
+    # 全項目の現在ブロックをタイムゾーンごとに1回だけ求める
+    blocks = tick()
+    spot_records = []
+    daily_records = []
+    results = []
+    errors = []
+    live_events = []
+
+    for index, item in enumerate(request.items):
+        try:
+            date, block_index, block_str = resolve_generate_target(item, blocks)
+            with STAGE_SECONDS.time(stage="build_spot_record"):
+                spot_record = generate_spot_result_record(item.persona_id, date, block_index, block_str)
+            with STAGE_SECONDS.time(stage="build_daily_record"):
+                daily_record = generate_daily_result_record(item.persona_id, date, block_index, block_str)
+        except HTTPException as e:
+            errors.append({"index": index, "persona_id": item.persona_id, "status_code": e.status_code, "detail": e.detail})
+            GENERATE_TOTAL.inc(endpoint="generate_batch", persona_id=persona_label(item.persona_id), result="failure")
+            continue
+        except ValueError as e:
+            errors.append({"index": index, "persona_id": item.persona_id, "status_code": 400, "detail": str(e)})
+            GENERATE_TOTAL.inc(endpoint="generate_batch", persona_id=persona_label(item.persona_id), result="failure")
+            continue
+
+        spot_records.append(spot_record)
+        daily_records.append(daily_record)
+        results.append(summarize_generated(item.persona_id, date, block_str, spot_record, daily_record))
+        if broadcaster.wants(item.persona_id, spot_record["device_id"]):
+            live_events.append(live_block_event(
+                item.persona_id, date, block_str, spot_record, daily_record,
+                aggregator_delta(spot_record["device_id"], date)
+            ))
+
+    # The same daily row may appear several times (e.g. several blocks of one day); the last one wins
+    spot_records = dedupe_latest("spot_results", spot_records)
+    daily_records = dedupe_latest("daily_results", daily_records)
+
+    written = {"spot_results": 0, "daily_results": 0}
+    try:
+        if results:
+            written = await save_records(spot_records, daily_records, wait=wait)
+            publish_blocks(live_events)
+        outcome = "success"
+    except Exception as e:
+        outcome = "failure"
+        raise HTTPException(status_code=500, detail=f"Error saving demo data: {str(e)}")
+    finally:
+        for item in results:
+            GENERATE_TOTAL.inc(endpoint="generate_batch", persona_id=item["persona_id"], result=outcome)
+
+    summary = {
+        "success": not errors,
+        "requested": len(request.items),
+        "generated": len(results),
+        "spot_results_written": written["spot_results"],
+        "daily_results_written": written["daily_results"],
+        "writes_skipped": count_skipped(written, spot_records, daily_records),
+        "tables_updated": ["spot_results", "daily_results"] if results else [],
+    }
+    if format == "ndjson" or (format is None and "application/x-ndjson" in http_request.headers.get("accept", "")):
+        # 全体を1つの文字列にせず、一定行数ずつ書き出す
+        lines = itertools.chain(
+            ({"type": "result", **item} for item in results),
+            ({"type": "error", **error} for error in errors),
+            ({"type": "summary", **summary},),
+        )
+        return StreamingResponse(iter_ndjson(lines), media_type="application/x-ndjson")
+    # jsonable_encoder を通さずに直接シリアライズする（中身は dict / list / str / 数値のみ）
+    return FastJSONResponse({**summary, "results": results, "errors": errors})
+
+
+@app.post("/generate/summaries")
+async def generate_summaries(request: GenerateRequest, wait: bool = False):
+    """Save behavior_summary and emotion_opensmile_summary rows (1 row per device and day, cumulative)
+
+    The tables are optional: create them in Supabase (or use a file sink) before calling this.
+    """
+    if not sink.configured:
+        raise HTTPException(status_code=500, detail="Supabase credentials not configured")
+
+    date, block_index, block_str = resolve_summary_target(request.persona_id, request.date, request.time_block)
+    timestamp = get_jst_time().isoformat()
+    behavior_record, emotion_record = build_summary_records(
+        request.persona_id, PERSONAS[request.persona_id]["device_id"], date, block_index, block_str, timestamp
+    )
+    try:
+        written = await save_tables(
+            {"behavior_summary": [behavior_record], "emotion_opensmile_summary": [emotion_record]}, wait=wait
+        )
+    except Exception as e:
+        GENERATE_TOTAL.inc(endpoint="generate_summaries", persona_id=request.persona_id, result="failure")
+        raise HTTPException(status_code=500, detail=f"Error saving summary data: {str(e)}")
+    GENERATE_TOTAL.inc(endpoint="generate_summaries", persona_id=request.persona_id, result="success")
+
+    return {
+        "success": True,
+        "persona_id": request.persona_id,
+        "date": date,
+        "time_block": block_str,
+        "behavior_summary_written": written["behavior_summary"],
+        "emotion_opensmile_summary_written": written["emotion_opensmile_summary"],
+        "writes_skipped": count_skipped(written, [behavior_record], [emotion_record]),
+        "summary_ranking_events": len(behavior_record["summary_ranking"]),
+        "tables_updated": ["behavior_summary", "emotion_opensmile_summary"],
+    }
+
+
+def fleet_live_events(persona_id: str, date: str, block_index: int, block_str: str,
+                      spot_records: List[dict], daily_records: List[dict]) -> List[dict]:
+    """フリートの購読されているデバイス分のイベント（差分は今回のブロックの分だけ）"""
+    if not broadcaster.subscribers:
+        return []
+    burst_time = burst_time_str(block_index)
+    return [
+        live_block_event(persona_id, date, block_str, spot_record, daily_record, {
+            "vibe_scores": daily_record["vibe_scores"][block_index:block_index + 1],
+            "burst_events": [b for b in daily_record["burst_events"][-1:] if b["time"] == burst_time],
+        })
+        for spot_record, daily_record in zip(spot_records, daily_records)
+        if broadcaster.wants(persona_id, spot_record["device_id"])
+    ]
+
+
+@app.get("/live")
+async def live_feed(persona_id: Optional[str] = None, device_id: Optional[str] = None):
+    """Server-Sent Events stream of generated blocks (`event: block`)
+
+    Each event carries the new spot_results record and the daily_results delta
+    (vibe_scores / burst_events added since the previous block) for one device.
+    Filter with `persona_id` and/or `device_id` (fleet devices included).
+    Slow clients never hold up generation: when a client's queue is full the oldest
+    events are dropped and an `event: lagged` with the dropped count is sent instead.
+    """
+    if persona_id is not None:
+        validate_persona(persona_id)
+    try:
+        subscription = broadcaster.subscribe(persona_id, device_id)
+    except LiveFeedFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    async def stream():
+        try:
+            yield b"retry: 3000\n\n"
+            async for chunk in subscription.frames(LIVE_FEED_HEARTBEAT):
+                yield chunk
+        finally:
+            # クライアントの切断時（ジェネレーターのキャンセル）も購読を解除する
+            broadcaster.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/fleet/{persona_id}/devices")
+async def list_fleet_devices(persona_id: str, devices: int = Query(..., ge=1, le=MAX_FLEET_DEVICES)):
+    """仮想デバイスのdevice_id一覧（連番順、常に同じ値）"""
+    if persona_id not in PERSONAS:
+        raise HTTPException(status_code=404, detail=f"Persona '{persona_id}' not found")
+    return {
+        "persona_id": persona_id,
+        "devices": devices,
+        "device_ids": [fleet_device_id(persona_id, i) for i in range(devices)]
+    }
+
+
+@app.post("/generate/fleet")
+async def generate_fleet_and_save(request: FleetGenerateRequest, wait: bool = False):
+    """Generate one block for N virtual devices of a persona and save in chunked bulk upserts
+
+    With the write queue enabled, `?wait=true` waits until the records are flushed.
+    """
+
+    # Output (Supabase) connection check
+    if not sink.configured:
+        raise HTTPException(status_code=500, detail="Supabase credentials not configured")
+
+    date, block_index, block_str = resolve_generate_target(request, tick())
+
+    try:
+        started = time.perf_counter()
+        spot_records, daily_records = generate_fleet_block_records(
+            request.persona_id, request.devices, date, block_index, block_str
+        )
+        generation_ms = (time.perf_counter() - started) * 1000
+        STAGE_SECONDS.observe(generation_ms / 1000, stage="build_fleet")
+
+        written = await save_records(spot_records, daily_records, wait=wait)
+        publish_blocks(fleet_live_events(request.persona_id, date, block_index, block_str, spot_records, daily_records))
+    except Exception as e:
+        GENERATE_TOTAL.inc(request.devices, endpoint="generate_fleet", persona_id=persona_label(request.persona_id), result="failure")
+        raise HTTPException(status_code=500, detail=f"Error generating fleet data: {str(e)}")
+    GENERATE_TOTAL.inc(request.devices, endpoint="generate_fleet", persona_id=persona_label(request.persona_id), result="success")
+
+    return {
+        "success": True,
+        "persona_id": request.persona_id,
+        "devices": request.devices,
+        "date": date,
+        "time_block": block_str,
+        "spot_results_written": written["spot_results"],
+        "daily_results_written": written["daily_results"],
+        "writes_skipped": count_skipped(written, spot_records, daily_records),
+        "generation_ms": round(generation_ms, 1),
+        "tables_updated": ["spot_results", "daily_results"],
+    }
+
+
+@app.post("/backfill")
+async def backfill_and_save(request: BackfillRequest):
+    """Generate whole days (48 spot_results + final daily_results per day) and save in chunked bulk upserts"""
 
+    # Output (Supabase) connection check
+    if not sink.configured:
+        raise HTTPException(status_code=500, detail="Supabase credentials not configured")
+
+    validate_persona(request.persona_id)
+
+    end_date = request.end_date or request.start_date
+    validate_backfill_range(request.start_date, end_date)
+
+    try:
+        totals = await run_backfill([request.persona_id], request.start_date, end_date)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error generating demo data: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error backfilling demo data: {str(e)}")
+
+    return {
+        "success": True,
+        "persona_id": request.persona_id,
+        "start_date": request.start_date,
+        "end_date": end_date,
+        **totals,
+        "tables_updated": ["spot_results", "daily_results"],
+    }
+
+
+async def simulate_blocks(targets: List[tuple], devices: Optional[int], first_block: int, last_block: int) -> dict:
+    """シミュレーションの1ティック: 各 (ペルソナ, 日付) の first_block〜last_block を生成して1回で保存する
+
+    通常は1ブロックずつ。遅れて複数ブロックをまとめて生成した場合も daily_results は最後のブロックの分だけ書き込む。
+    """
+    spot_records = []
+    daily_records = []
+    live_events = []
+    generated = {}
+    with STAGE_SECONDS.time(stage="simulate_tick"):
+        for persona_id, date in targets:
+            skipped = day_template_cache.get(persona_id, date).skipped
+            for block_index in range(first_block, last_block + 1):
+                if skipped[block_index]:
+                    continue
+                block_str = block_index_to_str(block_index)
+                if devices:
+                    spots, dailies = generate_fleet_block_records(persona_id, devices, date, block_index, block_str)
+                    live_events.extend(fleet_live_events(persona_id, date, block_index, block_str, spots, dailies))
+                else:
+                    spot_record = generate_spot_result_record(persona_id, date, block_index, block_str)
+                    daily_record = generate_daily_result_record(persona_id, date, block_index, block_str)
+                    spots, dailies = [spot_record], [daily_record]
+                    if broadcaster.wants(persona_id, spot_record["device_id"]):
+                        live_events.append(live_block_event(
+                            persona_id, date, block_str, spot_record, daily_record,
+                            aggregator_delta(spot_record["device_id"], date)
+                        ))
+                spot_records.extend(spots)
+                daily_records.extend(dailies)
+                generated[persona_id] = generated.get(persona_id, 0) + len(spots)
+
+        written = await save_records(spot_records, dedupe_latest("daily_results", daily_records), wait=False)
+    publish_blocks(live_events)
+    for persona_id, count in generated.items():
+        GENERATE_TOTAL.inc(count, endpoint="simulate", persona_id=persona_id, result="success")
+    return written
+
+
+async def reset_simulation_day(targets: List[tuple], devices: Optional[int]) -> None:
+    """シミュレーション開始前に、その日の集計状態を捨てて daily_results を0ブロックの状態で上書きする
+
+    spot_results は削除しない（シンクはupsertのみ）。同じ日付の再生なら、到達したブロックから同じ内容で上書きされる。
+    """
+    timestamp = get_jst_time().isoformat()
+    daily_records = []
+    live_events = []
+    for persona_id, date in targets:
+        device_ids = get_fleet(persona_id, devices).device_ids if devices else [PERSONAS[persona_id]["device_id"]]
+        for device_id in device_ids:
+            daily_aggregator.reset(device_id, date)
+            daily_records.append(build_daily_record(persona_id, device_id, date, 0, "", [], 0, [], timestamp))
+            if broadcaster.wants(persona_id, device_id):
+                live_events.append({"persona_id": persona_id, "device_id": device_id, "date": date})
+    await save_records([], daily_records, wait=True)
+
+    # ダッシュボードにその日の表示を消させる
+    for event in live_events:
+        broadcaster.publish(event["persona_id"], event["device_id"], "reset", event)
+
+
+def get_simulation(simulation_id: str):
+    simulation = simulations.get(simulation_id)
+    if simulation is None:
+        raise HTTPException(status_code=404, detail=f"Simulation '{simulation_id}' not found")
+    return simulation
+
+
+@app.post("/simulate")
+async def start_simulation(request: SimulationRequest):
+    """Replay blocks of a day on a virtual clock running `speed` times faster than real time
+
+    Every tick goes through the same cached generation path and sink as /generate, and is
+    published on /live. Returns immediately; poll `GET /simulate/{simulation_id}` for progress.
+    With `reset`, the day's aggregation state and daily_results row are reset before the first block.
+    """
+    if not sink.configured:
+        raise HTTPException(status_code=500, detail="Supabase credentials not configured")
+
+    persona_ids = list(dict.fromkeys(request.persona_ids))
+    for persona_id in persona_ids:
+        validate_persona(persona_id)
+    from_block = parse_time_block(request.from_block)
+    to_block = parse_time_block(request.to_block)
+    if not 0 <= from_block <= to_block < 48:
+        raise HTTPException(status_code=400, detail="from_block must not be after to_block (00-00 to 23-30)")
+    if request.date:
+        validate_date(request.date)
+
+    blocks = tick()
+    targets = [(persona_id, request.date or blocks[PERSONA_TABLES[persona_id].timezone][0]) for persona_id in persona_ids]
+    try:
+        simulation = simulations.start(
+            from_block, to_block, request.speed,
+            step=lambda first, last: simulate_blocks(targets, request.devices, first, last),
+            reset=(lambda: reset_simulation_day(targets, request.devices)) if request.reset else None,
+            params={
+                "persona_ids": persona_ids,
+                "dates": dict(targets),
+                "devices": request.devices,
+                "reset": request.reset,
+                "from_block": block_index_to_str(from_block),
+                "to_block": block_index_to_str(to_block),
+            },
+        )
+    except SimulationFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return {"success": True, **simulation.status()}
+
+
+@app.get("/simulate")
+async def list_simulations():
+    """Running and recently finished simulations"""
+    return {
+        "running": simulations.running,
+        "max_running": simulations.max_running,
+        "simulations": [s.status() for s in simulations.list()],
+    }
+
+
+@app.get("/simulate/{simulation_id}")
+async def simulation_status(simulation_id: str):
+    """Progress of one simulation (virtual time, blocks done, lag behind the virtual clock)"""
+    return get_simulation(simulation_id).status()
+
+
+@app.delete("/simulate/{simulation_id}")
+async def stop_simulation(simulation_id: str):
+    """Stop a running simulation (blocks already generated stay saved)"""
+    simulation = get_simulation(simulation_id)
+    await simulation.stop()
+    return simulation.status()
 
 
 if __name__ == "__main__":
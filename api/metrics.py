@@ -0,0 +1,240 @@
+"""
+Prometheus形式のメトリクス（GET /metrics）
+
+prometheus_client には依存せず、カウンター・ゲージ・ヒストグラムだけを最小限で実装する。
+記録はラベルのタプルをキーにした dict の更新だけなので、本番で常時有効にしても負荷は小さい。
+（イベントループ上から呼ぶ前提で、ロックは取らない）
+"""
+
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# 処理段階ごとのレイテンシ用（秒）
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# リクエスト本文のサイズ用（バイト）
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(_Metric):
+    """値を inc/dec/set するゲージ。set_function() で出力時に値を取得することもできる（ラベルなしのみ）"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[tuple, float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        self._values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self._function = function
+
+    def value(self, **labels) -> float:
+        if self._function is not None:
+            return self._function()
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        if self._function is not None:
+            return [f"{self.name} {_format_value(self._function())}"]
+        values = self._values or ({(): 0} if not self.labelnames else {})
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram: "Histogram", labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # ラベルごとに [バケットごとの件数（累積前）..., +Inf], 合計
+        self._values: Dict[tuple, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1][0] += value
+
+    def time(self, **labels) -> _Timer:
+        """with ブロックの所要時間（秒）を記録する"""
+        return _Timer(self, labels)
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = 'le="{}"'.format("+Inf" if bound == float("inf") else repr(float(bound)))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total[0])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheusのテキスト形式（version 0.0.4）"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "demo_generator_stage_seconds",
+    "Latency of each stage of the generate path in seconds",
+    ["stage"],
+))
+GENERATE_TOTAL = REGISTRY.register(Counter(
+    "demo_generator_generate_total",
+    "Generated items by endpoint, persona and result",
+    ["endpoint", "persona_id", "result"],
+))
+UPSERT_TOTAL = REGISTRY.register(Counter(
+    "demo_generator_upsert_requests_total",
+    "Upsert requests sent to Supabase by table and result",
+    ["table", "result"],
+))
+UPSERT_ROWS_TOTAL = REGISTRY.register(Counter(
+    "demo_generator_upsert_rows_total",
+    "Rows sent to Supabase by table and result",
+    ["table", "result"],
+))
+PAYLOAD_BYTES = REGISTRY.register(Histogram(
+    "demo_generator_upsert_payload_bytes",
+    "Request body size of Supabase upserts in bytes",
+    ["table"],
+    buckets=SIZE_BUCKETS,
+))
+LIVE_EVENTS_TOTAL = REGISTRY.register(Counter(
+    "demo_generator_live_events_total",
+    "Live feed events by result (queued for a subscriber, or dropped because its queue was full)",
+    ["result"],
+))
+IN_FLIGHT = REGISTRY.register(Gauge(
+    "demo_generator_in_flight_requests",
+    "HTTP requests currently being handled",
+))
+
+
+class InFlightMiddleware:
+    """処理中のHTTPリクエスト数を IN_FLIGHT に反映するASGIミドルウェア
+
+    exclude_paths のパス（接続しっぱなしのストリーミング等）は数えない。
+    """
+
+    def __init__(self, app, exclude_paths: Sequence[str] = ()):
+        self.app = app
+        self.exclude_paths = frozenset(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            IN_FLIGHT.dec()
@@ -0,0 +1,315 @@
+"""
+データ駆動のペルソナ定義
+
+ペルソナは personas/*.json（PyYAML があれば *.yaml / *.yml も可）に時間帯の区間として定義し、
+起動時に48ブロック分の配列（PersonaTable）にコンパイルする。生成処理はこの配列を
+ブロック番号で引くだけなので、ペルソナの数や定義の細かさによらず1リクエストあたりのコストは同じ。
+
+定義ファイルの形式（from / to は区間の最初と最後のブロック、両端を含む。区間は00-00〜23-30を隙間なく覆う）:
+
+    {
+      "persona_id": "child_5yo",
+      "extends": "child_base",            # 任意。指定したペルソナの定義を引き継ぎ、書いたキーだけ上書き
+      "abstract": false,                   # true なら extends 用の土台としてだけ使い、ペルソナとしては公開しない
+      "name": "...", "device_id": "...", "description": "...", "profile": {...},
+      "timezone": "Asia/Tokyo",            # 任意。デバイスのタイムゾーン（IANA名、夏時間の扱いは timezones.py）
+      "daily_summary": "{date}は...",      # daily_results.summary（{date} {name} {block_str} を置換）
+      "routine": [                         # spot_results の summary / behavior / emotion / vibe_score
+        {"from": "00-00", "to": "06-00", "summary": "...", "behavior": "...", "emotion": "...", "vibe_score": 0,
+         "alternatives": [{"summary": "...", "behavior": "..."}]}     # 任意。日によって入れ替わる候補（省略したキーは元の値）
+      ],
+      "vibe_pattern": [                    # daily_results の vibe_scores
+        {"from": "00-00", "to": "06-00", "vibe_score": [0, -2, ...]}   # 数値なら区間内で同じ値
+      ],
+      "events": [                          # behavior_summary（count_mod: 件数に (ブロック番号 % count_mod) を加える）
+        {"from": "00-00", "to": "06-00", "events": [{"event": "低周波ノイズ", "count": 3, "count_mod": 3}]}
+      ],
+      "event_metadata": {"話し声": ["voice", true]},                     # イベントのカテゴリと優先度
+      "emotions": [{"from": "00-00", "to": "06-00", "emotions": {"joy": 10, ...}}],
+      "bursts": {"labels": {"06-30": "..."}, "up": "...", "down": "..."}, # burst_events の説明文
+      "variation": {"jitter": 4, "swap_rate": 0.2, "anchors": ["06-30", "21-00"], "shift": 2}  # 日ごとのばらつき（variation.py）
+    }
+
+"label" キーは読みやすさのためのもので、コンパイル時には無視する。
+"""
+
+import json
+import os
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from timezones import DEFAULT_TIMEZONE, get_zone
+
+BLOCKS_PER_DAY = 48
+
+# 組み込みのペルソナ定義
+BUILTIN_PERSONA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "personas")
+
+EMOTION_KEYS = ("joy", "fear", "anger", "trust", "disgust", "sadness", "surprise", "anticipation")
+DEFAULT_EVENT_METADATA = ("other", False)
+DEFAULT_DAILY_SUMMARY = "{name}のデモデータ（{block_str}時点）"
+DEFAULT_BURST_LABEL = "Mood change detected"
+DEFAULT_JITTER = 3
+DEFAULT_SWAP_RATE = 0.2
+
+SPEC_EXTENSIONS = (".json", ".yaml", ".yml")
+
+
+class PersonaSpecError(Exception):
+    """ペルソナ定義が不正な場合のエラー"""
+
+
+class VariationSettings:
+    """日ごとのばらつきの設定（variation.vary が使う）
+
+    jitter: スコアの揺らぎの幅 [-jitter, jitter]
+    swap_rate: alternatives があるブロックで候補に入れ替える確率
+    anchors: 起床・就寝など、日によって前後にずれるブロック（昇順）
+    shift: anchors のずれの幅（ブロック数、[-shift, shift]）
+    """
+
+    __slots__ = ("jitter", "swap_rate", "anchors", "shift")
+
+    def __init__(self, jitter: int = 0, swap_rate: float = 0.0, anchors: Tuple[int, ...] = (), shift: int = 0):
+        self.jitter = jitter
+        self.swap_rate = swap_rate
+        self.anchors = anchors
+        self.shift = shift
+
+
+# ばらつきなし（DAY_VARIATION=0 のとき）
+NO_VARIATION = VariationSettings()
+
+
+class PersonaTable:
+    """1ペルソナ分のコンパイル済みデータ（ブロックごとの値を配列で持つ）
+
+    文字列は sys.intern で共有するため、同じ文言を使うペルソナがいくつあっても実体は1つ。
+    配列の要素はすべてのリクエストで共有されるため、呼び出し側で変更しないこと。
+    """
+
+    __slots__ = (
+        "persona_id", "info", "timezone", "daily_summary",
+        "summaries", "behaviors", "emotions", "spot_scores", "daily_scores", "spot_options", "variation",
+        "events", "event_metadata", "emotion_graph", "burst_up", "burst_down",
+    )
+
+    def __init__(self, spec: dict, source: str = "<spec>"):
+        self.persona_id = _required(spec, "persona_id", source)
+        self.info = {
+            "name": _required(spec, "name", source),
+            "device_id": _required(spec, "device_id", source),
+            "description": spec.get("description", ""),
+            "profile": spec.get("profile", {}),
+            "timezone": spec.get("timezone", DEFAULT_TIMEZONE),
+        }
+        self.timezone = self.info["timezone"]
+        try:
+            get_zone(self.timezone)
+        except ValueError as e:
+            raise PersonaSpecError(f"{source}: {e}")
+        self.daily_summary = sys.intern(spec.get("daily_summary", DEFAULT_DAILY_SUMMARY))
+
+        routine = _expand(spec.get("routine"), source, "routine")
+        if routine is None:
+            raise PersonaSpecError(f"{source}: 'routine' is required")
+        self.summaries = tuple(sys.intern(segment["summary"]) for segment, _ in routine)
+        self.behaviors = tuple(sys.intern(segment["behavior"]) for segment, _ in routine)
+        self.emotions = tuple(sys.intern(segment["emotion"]) for segment, _ in routine)
+        self.spot_scores = tuple(_score(segment, offset, source) for segment, offset in routine)
+        # ブロックごとの (summary, behavior, emotion) の候補。先頭が元の値、以降が alternatives
+        self.spot_options = tuple(
+            ((summary, behavior, emotion),) + tuple(
+                (sys.intern(alternative.get("summary", summary)),
+                 sys.intern(alternative.get("behavior", behavior)),
+                 sys.intern(alternative.get("emotion", emotion)))
+                for alternative in segment.get("alternatives", ())
+            )
+            for (segment, _), summary, behavior, emotion in zip(routine, self.summaries, self.behaviors, self.emotions)
+        )
+
+        # vibe_pattern を省略した場合は routine の vibe_score を使う
+        pattern = _expand(spec.get("vibe_pattern"), source, "vibe_pattern") or routine
+        self.daily_scores = tuple(_score(segment, offset, source) for segment, offset in pattern)
+
+        # behavior_summary のブロックごとのイベント（件数はここで確定させる）
+        events = _expand(spec.get("events"), source, "events")
+        self.events: Optional[Tuple[List[dict], ...]] = None
+        if events is not None:
+            self.events = tuple(
+                [
+                    {"count": event["count"] + (i % event["count_mod"] if event.get("count_mod") else 0),
+                     "event": sys.intern(event["event"])}
+                    for event in segment["events"]
+                ]
+                for i, (segment, _) in enumerate(events)
+            )
+        self.event_metadata: Dict[str, Tuple[str, bool]] = {
+            sys.intern(name): (sys.intern(value[0]), bool(value[1]))
+            for name, value in spec.get("event_metadata", {}).items()
+        }
+
+        emotions = _expand(spec.get("emotions"), source, "emotions")
+        self.emotion_graph: Optional[Tuple[dict, ...]] = None
+        if emotions is not None:
+            self.emotion_graph = tuple(
+                {**{key: segment["emotions"].get(key, 0) for key in EMOTION_KEYS},
+                 "time": f"{i // 2:02d}:{'30' if i % 2 else '00'}"}
+                for i, (segment, _) in enumerate(emotions)
+            )
+
+        # burst_events の説明文（ブロックごとに、上昇時 / 下降時）
+        bursts = spec.get("bursts", {})
+        labels = {_block(key, source): sys.intern(value) for key, value in bursts.get("labels", {}).items()}
+        up = sys.intern(bursts.get("up", DEFAULT_BURST_LABEL))
+        down = sys.intern(bursts.get("down", DEFAULT_BURST_LABEL))
+        self.burst_up = tuple(labels.get(i, up) for i in range(BLOCKS_PER_DAY))
+        self.burst_down = tuple(labels.get(i, down) for i in range(BLOCKS_PER_DAY))
+
+        self.variation = _variation(spec.get("variation", {}), source)
+
+    @property
+    def device_id(self) -> str:
+        return self.info["device_id"]
+
+    @property
+    def name(self) -> str:
+        return self.info["name"]
+
+    def describe_burst(self, block_index: int, change: int) -> str:
+        """burst_events の説明文"""
+        return self.burst_up[block_index] if change > 0 else self.burst_down[block_index]
+
+    def event_info(self, event: str) -> Tuple[str, bool]:
+        """イベントの (カテゴリ, 優先度)"""
+        return self.event_metadata.get(event, DEFAULT_EVENT_METADATA)
+
+    def daily_summary_text(self, date: str, block_str: str) -> str:
+        return self.daily_summary.format(date=date, name=self.info["name"], block_str=block_str)
+
+
+def _required(spec: dict, key: str, source: str):
+    if key not in spec:
+        raise PersonaSpecError(f"{source}: '{key}' is required")
+    return spec[key]
+
+
+def _block(value: str, source: str) -> int:
+    """HH-MM 形式をブロック番号に変換"""
+    try:
+        hour, minute = map(int, value.split("-"))
+    except (AttributeError, ValueError):
+        raise PersonaSpecError(f"{source}: invalid time block {value!r} (use HH-MM)")
+    if not (0 <= hour <= 23 and minute in (0, 30)):
+        raise PersonaSpecError(f"{source}: invalid time block {value!r} (use HH-00 or HH-30)")
+    return hour * 2 + minute // 30
+
+
+def _expand(segments: Optional[list], source: str, key: str) -> Optional[List[Tuple[dict, int]]]:
+    """区間の一覧を、ブロックごとの (区間, 区間内の位置) 48件に展開する"""
+    if segments is None:
+        return None
+    blocks: List[Tuple[dict, int]] = []
+    for segment in segments:
+        start = _block(segment.get("from"), source)
+        end = _block(segment.get("to"), source)
+        if start != len(blocks) or end < start:
+            raise PersonaSpecError(
+                f"{source}: '{key}' segment {segment.get('from')}..{segment.get('to')} must start at "
+                f"{len(blocks) // 2:02d}-{'30' if len(blocks) % 2 else '00'} and must not end before it starts"
+            )
+        blocks.extend((segment, offset) for offset in range(end - start + 1))
+    if len(blocks) != BLOCKS_PER_DAY:
+        raise PersonaSpecError(f"{source}: '{key}' segments must cover 00-00 to 23-30")
+    return blocks
+
+
+def _score(segment: dict, offset: int, source: str) -> int:
+    value = segment.get("vibe_score")
+    if isinstance(value, list):
+        if offset >= len(value):
+            raise PersonaSpecError(
+                f"{source}: segment {segment.get('from')}..{segment.get('to')} needs one vibe_score per block"
+            )
+        return value[offset]
+    if value is None:
+        raise PersonaSpecError(f"{source}: segment {segment.get('from')}..{segment.get('to')} has no vibe_score")
+    return value
+
+
+def _variation(spec: dict, source: str) -> VariationSettings:
+    anchors = tuple(sorted(_block(value, source) for value in spec.get("anchors", ())))
+    shift = spec.get("shift", 0)
+    # ずれた後も anchors の順序が入れ替わらず、日付の境目（00-00 / 23-30）をまたがないこと
+    bounds = (-shift,) + anchors + (BLOCKS_PER_DAY - 1 + shift,)
+    if shift < 0 or any(b - a <= 2 * shift for a, b in zip(bounds, bounds[1:])):
+        raise PersonaSpecError(
+            f"{source}: 'variation' anchors must be more than 2 * shift ({shift}) blocks apart "
+            f"and from 00-00 / 23-30"
+        )
+    swap_rate = spec.get("swap_rate", DEFAULT_SWAP_RATE)
+    if not 0 <= swap_rate <= 1:
+        raise PersonaSpecError(f"{source}: 'variation.swap_rate' must be between 0 and 1")
+    return VariationSettings(spec.get("jitter", DEFAULT_JITTER), swap_rate, anchors, shift)
+
+
+def _read_spec(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".json"):
+            return json.load(f)
+        try:
+            import yaml
+        except ImportError:
+            raise PersonaSpecError(f"{path}: YAML persona specs require PyYAML (pip install pyyaml)")
+        return yaml.safe_load(f)
+
+
+def spec_files(directories: Iterable[str]) -> List[str]:
+    """ディレクトリ内の定義ファイル（ファイル名順）"""
+    paths = []
+    for directory in directories:
+        if directory and os.path.isdir(directory):
+            paths.extend(
+                os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                if name.endswith(SPEC_EXTENSIONS)
+            )
+    return paths
+
+
+def load_personas(directories: List[str]) -> Dict[str, PersonaTable]:
+    """定義ファイルを読み込んでコンパイルする（後のディレクトリの同じ persona_id が優先）"""
+    specs: Dict[str, Tuple[dict, str]] = {}
+    for path in spec_files(directories):
+        spec = _read_spec(path)
+        if not isinstance(spec, dict):
+            raise PersonaSpecError(f"{path}: a persona spec must be an object")
+        specs[_required(spec, "persona_id", path)] = (spec, path)
+
+    resolved: Dict[str, dict] = {}
+
+    def resolve(persona_id: str, chain: tuple) -> dict:
+        if persona_id in resolved:
+            return resolved[persona_id]
+        if persona_id not in specs:
+            raise PersonaSpecError(f"{specs[chain[-1]][1]}: unknown persona in 'extends': {persona_id}")
+        if persona_id in chain:
+            raise PersonaSpecError(f"{specs[persona_id][1]}: circular 'extends'")
+        own, _ = specs[persona_id]
+        spec = own
+        if "extends" in own:
+            spec = {**resolve(own["extends"], chain + (persona_id,)), **own}
+            del spec["extends"]
+            # abstract は引き継がない
+            spec["abstract"] = own.get("abstract", False)
+        resolved[persona_id] = spec
+        return spec
+
+    tables = {
+        persona_id: PersonaTable(resolve(persona_id, ()), path)
+        for persona_id, (spec, path) in specs.items() if not spec.get("abstract")
+    }
+    if not tables:
+        # 定義ファイルがデプロイされていない場合など。起動時に失敗させる（全リクエストが404になる状態で起動しない）
+        searched = ", ".join(d for d in directories if d) or "(none)"
+        raise PersonaSpecError(f"No persona specs found in {searched}")
+    return tables
@@ -0,0 +1,101 @@
+"""
+リクエスト単位のプロファイリング（オプトイン）
+
+PROFILE_TOKEN を設定した環境でのみ有効。ヘッダー `X-Profile: <token>` または
+クエリ `?profile=<token>` を付けたリクエストだけを cProfile で計測し、処理時間の大きい関数
+（ホットスポット）をレスポンスに含める。計測結果は .prof ファイルとしても保存し、
+GET /profiles/{profile_id} でダウンロードできる（snakeviz / pstats で閲覧）。
+
+cProfile はスレッド単位で動くため、計測中に await している間は同じイベントループ上の
+他のリクエストの処理も含まれる。計測は1リクエストずつ順番に行う。
+"""
+
+import asyncio
+import cProfile
+import hmac
+import os
+import pstats
+import uuid
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from serialization import dumps
+
+
+class RequestProfiler:
+    def __init__(self, token: str, directory: str, top: int = 25, max_files: int = 50):
+        self.token = token
+        self.directory = directory
+        self.top = top
+        self.max_files = max_files
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token)
+
+    def authorized(self, value: Optional[str]) -> bool:
+        return self.enabled and value is not None and hmac.compare_digest(value, self.token)
+
+    def requested(self, request) -> bool:
+        """このリクエストを計測するか（トークンが一致する場合のみ）"""
+        if not self.enabled:
+            return False
+        return self.authorized(request.headers.get("x-profile") or request.query_params.get("profile"))
+
+    async def run(self, fn: Callable[[], Awaitable[dict]]) -> Tuple[dict, dict]:
+        """fn() の実行とJSONシリアライズを計測し、(fn() の結果, 計測結果) を返す"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                result = await fn()
+                dumps(result)
+            finally:
+                profiler.disable()
+        return result, self._report(profiler)
+
+    def path(self, profile_id: str) -> Optional[str]:
+        """保存済みの計測結果ファイルのパス（存在しなければ None）"""
+        if not profile_id.isalnum():
+            return None
+        path = os.path.join(self.directory, f"{profile_id}.prof")
+        return path if os.path.exists(path) else None
+
+    def _report(self, profiler: cProfile.Profile) -> dict:
+        stats = pstats.Stats(profiler)
+        profile_id = uuid.uuid4().hex
+        os.makedirs(self.directory, exist_ok=True)
+        stats.dump_stats(os.path.join(self.directory, f"{profile_id}.prof"))
+        self._prune()
+        return {
+            "profile_id": profile_id,
+            "download": f"/profiles/{profile_id}",
+            "total_ms": round(stats.total_tt * 1000, 3),
+            "hotspots": self._hotspots(stats),
+        }
+
+    def _hotspots(self, stats: pstats.Stats) -> List[dict]:
+        """自身の処理時間（tottime）の大きい順に top 件"""
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:self.top]
+        return [
+            {
+                "function": name,
+                "location": f"{os.path.basename(filename)}:{line}",
+                "calls": calls,
+                "tottime_ms": round(tottime * 1000, 3),
+                "cumtime_ms": round(cumtime * 1000, 3),
+            }
+            for (filename, line, name), (_, calls, tottime, cumtime, _) in rows
+        ]
+
+    def _prune(self) -> None:
+        """古い計測結果ファイルを削除し、max_files 件までにする"""
+        files = [os.path.join(self.directory, f) for f in os.listdir(self.directory) if f.endswith(".prof")]
+        files.sort(key=os.path.getmtime)
+        for path in files[:-self.max_files]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,143 @@
+"""
+生成レコードの共通定義
+spot_results / daily_results（と任意の behavior_summary / emotion_opensmile_summary）の
+主キー・列定義と、複数行upsert用のヘルパー
+"""
+
+import hashlib
+from collections import OrderedDict
+from typing import Iterable, List, Tuple
+
+from serialization import dumps
+
+# テーブルごとの主キー（Supabase側のPRIMARY KEYと一致させる）
+PRIMARY_KEYS = {
+    "spot_results": ("device_id", "recorded_at"),
+    "daily_results": ("device_id", "local_date"),
+    "behavior_summary": ("device_id", "local_date"),
+    "emotion_opensmile_summary": ("device_id", "local_date"),
+}
+
+# テーブルごとの列（build_spot_record / build_daily_record のキー順）と型
+COLUMNS = {
+    "spot_results": {
+        "device_id": "text",
+        "recorded_at": "text",
+        "vibe_score": "integer",
+        "profile_result": "json",
+        "created_at": "text",
+        "llm_model": "text",
+        "summary": "text",
+        "behavior": "text",
+        "emotion": "text",
+        "local_date": "text",
+        "local_time": "text",
+        "daily_aggregator_status": "text",
+        "daily_aggregator_processed_at": "text",
+    },
+    "daily_results": {
+        "device_id": "text",
+        "local_date": "text",
+        "vibe_score": "real",
+        "summary": "text",
+        "behavior": "text",
+        "profile_result": "json",
+        "vibe_scores": "json",
+        "burst_events": "json",
+        "processed_count": "integer",
+        "last_time_block": "text",
+        "llm_model": "text",
+        "created_at": "text",
+        "updated_at": "text",
+    },
+    "behavior_summary": {
+        "device_id": "text",
+        "local_date": "text",
+        "summary_ranking": "json",
+        "time_blocks": "json",
+        "last_time_block": "text",
+        "created_at": "text",
+        "updated_at": "text",
+    },
+    "emotion_opensmile_summary": {
+        "device_id": "text",
+        "local_date": "text",
+        "emotion_graph": "json",
+        "last_time_block": "text",
+        "created_at": "text",
+        "updated_at": "text",
+    },
+}
+
+
+# 書き込みのたびに変わる列（内容が同じかどうかの判定では無視する）
+VOLATILE_COLUMNS = ("created_at", "updated_at")
+
+
+def primary_key(table: str, record: dict) -> tuple:
+    """レコードの主キー値をタプルで返す"""
+    return tuple(record[k] for k in PRIMARY_KEYS[table])
+
+
+def dedupe_latest(table: str, records: Iterable[dict]) -> List[dict]:
+    """主キーが重複するレコードを後勝ちで1件にまとめる
+
+    PostgreSQLの ON CONFLICT DO UPDATE は1回の文で同じ行を2度更新できないため、
+    複数行upsertの前に必ず通す。順序は各主キーの最初の出現位置を保つ。
+    """
+    latest = {}
+    for record in records:
+        latest[primary_key(table, record)] = record
+    return list(latest.values())
+
+
+def content_hash(record: dict) -> bytes:
+    """VOLATILE_COLUMNS を除いたレコード内容のハッシュ"""
+    content = {k: v for k, v in record.items() if k not in VOLATILE_COLUMNS}
+    return hashlib.blake2b(dumps(content, sort_keys=True), digest_size=16).digest()
+
+
+class WriteIndex:
+    """主キーごとに、最後に書き込んだレコード内容のハッシュを保持する
+
+    内容が前回と同じレコード（同じブロックの再送、リトライ、同じ期間のバックフィルのやり直しなど）は
+    書き込みを省略できる。max_entries を超えたら古いものから捨てる（LRU）。max_entries=0 で無効。
+    """
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self.skipped = 0
+        self._hashes: "OrderedDict[tuple, bytes]" = OrderedDict()
+
+    def changed(self, table: str, records: List[dict]) -> Tuple[List[dict], List[tuple]]:
+        """前回の書き込みから内容が変わったレコードと、remember() に渡す (主キー, ハッシュ) を返す"""
+        if not self.max_entries:
+            return records, []
+        changed = []
+        entries = []
+        for record in records:
+            key = (table, *primary_key(table, record))
+            digest = content_hash(record)
+            if self._hashes.get(key) == digest:
+                self._hashes.move_to_end(key)
+                continue
+            changed.append(record)
+            entries.append((key, digest))
+        self.skipped += len(records) - len(changed)
+        return changed, entries
+
+    def remember(self, entries: List[tuple]) -> None:
+        """書き込みに成功したレコードのハッシュを記録"""
+        for key, digest in entries:
+            self._hashes[key] = digest
+            self._hashes.move_to_end(key)
+        while len(self._hashes) > self.max_entries:
+            self._hashes.popitem(last=False)
+
+    def forget(self, table: str, records: List[dict]) -> None:
+        """書き込めなかったレコードのハッシュを捨てる（同じ内容の次の書き込みが省略されないように）"""
+        for record in records:
+            self._hashes.pop((table, *primary_key(table, record)), None)
+
+    def status(self) -> dict:
+        return {"entries": len(self._hashes), "max_entries": self.max_entries, "skipped": self.skipped}
@@ -0,0 +1,68 @@
+"""
+vibe_score の集計エンジン（numpy ベクトル化版）
+
+スコアを (デバイス × 48ブロック) のマスク付き配列で保持し、
+累積平均・差分・|変化| >= 15 の閾値判定・ゼロ交差の判定を全デバイス分まとめて計算する。
+マスクされた要素は、スカラー版の None（未到来ブロック）と同じ扱いになる。
+"""
+
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+BURST_THRESHOLD = 15
+
+
+class ScoreSummary:
+    """summarize() の計算結果（すべて devices × 48 の配列）"""
+
+    __slots__ = ("scores", "valid", "counts", "sums", "averages", "changes", "bursts")
+
+    def __init__(self, scores, valid, counts, sums, averages, changes, bursts):
+        self.scores = scores  # マスクを0で埋めたスコア（int32）
+        self.valid = valid  # 値があるブロック（bool）
+        self.counts = counts  # ブロックiまでの有効件数
+        self.sums = sums  # ブロックiまでの合計
+        self.averages = averages  # ブロックiまでの平均（有効件数0なら0.0）
+        self.changes = changes  # 直前ブロックからの変化量（先頭列は0）
+        self.bursts = bursts  # バースト判定（直前と現在の両方に値がある場合のみ）
+
+    def burst_events(self, device: int, until: Optional[int] = None) -> List[tuple]:
+        """1デバイスのバースト (ブロック番号, 変化量) の一覧"""
+        row = self.bursts[device] if until is None else self.bursts[device, :until + 1]
+        blocks = np.flatnonzero(row)
+        return list(zip(blocks.tolist(), self.changes[device, blocks].tolist()))
+
+
+def to_masked(rows: Sequence[Sequence[Optional[int]]]) -> np.ma.MaskedArray:
+    """None を含むスコアのリスト群をマスク付き配列に変換"""
+    mask = np.array([[value is None for value in row] for row in rows], dtype=bool)
+    data = np.array([[0 if value is None else value for value in row] for row in rows], dtype=np.int32)
+    return np.ma.MaskedArray(data, mask=mask)
+
+
+def summarize(scores) -> ScoreSummary:
+    """全デバイスの累積平均・変化量・バースト判定を一括計算
+
+    scores はマスク付き配列（または通常の2次元配列）。
+    """
+    scores = np.ma.asarray(scores)
+    if scores.ndim == 1:
+        scores = scores.reshape(1, -1)
+    data = scores.filled(0).astype(np.int32, copy=False)
+    valid = ~np.ma.getmaskarray(scores)
+
+    # bool のまま cumsum すると要素ごとの型変換が入って遅いため、先に整数化する
+    counts = np.cumsum(valid.astype(np.int32), axis=1, dtype=np.int32)
+    sums = np.cumsum(data, axis=1, dtype=np.int32)
+    averages = np.divide(sums, counts, out=np.zeros(sums.shape, dtype=np.float64), where=counts > 0)
+
+    changes = np.zeros_like(data)
+    changes[:, 1:] = data[:, 1:] - data[:, :-1]
+
+    bursts = np.zeros(data.shape, dtype=bool)
+    both_valid = valid[:, 1:] & valid[:, :-1]
+    crossing = (data[:, :-1] * data[:, 1:]) < 0
+    bursts[:, 1:] = both_valid & ((np.abs(changes[:, 1:]) >= BURST_THRESHOLD) | crossing)
+
+    return ScoreSummary(data, valid, counts, sums, averages, changes, bursts)
@@ -0,0 +1,231 @@
+"""
+早送りシミュレーション（デモ用の仮想時計）
+
+実時間の speed 倍で進む仮想時計で、ブロックを from_block から to_block まで順に生成・保存する
+（1ブロック = 30分は、実時間では 1800 / speed 秒。1000倍速なら1.8秒で、1日48ブロックが約86秒）。
+
+- 各ブロックの生成・保存は呼び出し側の step（main.py の simulate_blocks）が行う。
+  1日テンプレートのキャッシュと daily_aggregator の差分適用を通るため、1ブロックの処理時間はブロック番号によらない
+- 各ブロックの期限は開始時点からの経過時間で決める（sleep の誤差が積み重ならない）。
+  処理が遅れて複数のブロックが期限を過ぎていたら、1回の step でまとめて生成・保存して追いつく
+- step が失敗したブロックは次のティック（次のブロックの期限）で、その時点で期限を過ぎたブロックとまとめて再試行する。
+  MAX_CONSECUTIVE_FAILURES 回続けて失敗したら中止する（failed）
+- 期限からの遅れ（lag）と step の処理時間を status() で返す
+"""
+
+import asyncio
+import secrets
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from day_templates import burst_time_str
+
+SECONDS_PER_BLOCK = 30 * 60
+MAX_CONSECUTIVE_FAILURES = 10
+
+# step(first_block, last_block) -> テーブルごとの書き込み件数
+Step = Callable[[int, int], Awaitable[Dict[str, int]]]
+
+
+class SimulationFull(Exception):
+    """実行中のシミュレーション数が上限に達している"""
+
+
+class VirtualClock:
+    """開始時点からの実時間を speed 倍して進む仮想時計（start_block の開始時刻から始まる）"""
+
+    def __init__(self, speed: float, start_block: int, clock: Callable[[], float] = time.monotonic):
+        self.speed = speed
+        self.start_block = start_block
+        self._clock = clock
+        self.started_at = clock()
+
+    def now(self) -> float:
+        return self._clock()
+
+    def due_at(self, block_index: int) -> float:
+        """ブロック block_index を生成すべき実時刻"""
+        return self.started_at + (block_index - self.start_block) * SECONDS_PER_BLOCK / self.speed
+
+    def due_block(self) -> int:
+        """期限を過ぎている最後のブロック"""
+        return self.start_block + int((self.now() - self.started_at) * self.speed // SECONDS_PER_BLOCK)
+
+    def virtual_minutes(self) -> float:
+        """仮想時刻（その日の0時からの分）"""
+        return self.start_block * 30 + (self.now() - self.started_at) * self.speed / 60
+
+
+class Simulation:
+    """1回分のシミュレーション（asyncio のタスクとして実行する）"""
+
+    def __init__(self, simulation_id: str, from_block: int, to_block: int, speed: float, step: Step,
+                 reset: Optional[Callable[[], Awaitable[None]]] = None, params: Optional[dict] = None):
+        self.id = simulation_id
+        self.from_block = from_block
+        self.to_block = to_block
+        self.speed = speed
+        self.params = params or {}
+        self.state = "pending"
+        self.clock: Optional[VirtualClock] = None
+        self.current_block: Optional[int] = None
+        self.blocks_done = 0
+        self.ticks = 0
+        self.catch_up_ticks = 0  # 遅れて2ブロック以上をまとめて生成したティック数
+        self.failed_ticks = 0
+        self.consecutive_failures = 0
+        self.last_error: Optional[str] = None
+        self.written: Dict[str, int] = {}
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.max_step = 0.0
+        self._step_total = 0.0
+        self._step = step
+        self._reset = reset
+        self._task: Optional[asyncio.Task] = None
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        self.state = "running"
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self.running:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            if self.state == "running":
+                # 1回も実行されないままキャンセルされた場合
+                self.state = "cancelled"
+                self.finished_at = time.time()
+
+    async def _run(self) -> None:
+        try:
+            if self._reset is not None:
+                await self._reset()
+            self.clock = clock = VirtualClock(self.speed, self.from_block)
+            next_block = self.from_block
+            while next_block <= self.to_block:
+                delay = clock.due_at(next_block) - clock.now()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                # 遅れていれば期限を過ぎたブロックをまとめて生成する
+                last_block = min(max(clock.due_block(), next_block), self.to_block)
+                self.last_lag = max(0.0, clock.now() - clock.due_at(next_block))
+                self.max_lag = max(self.max_lag, self.last_lag)
+                if await self._tick(next_block, last_block):
+                    next_block = last_block + 1
+                elif self.consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
+                    raise RuntimeError(f"Gave up after {self.consecutive_failures} failed ticks: {self.last_error}")
+                else:
+                    # 失敗したブロックは次のブロックの期限まで待ってから再試行する
+                    await asyncio.sleep(max(0.0, clock.due_at(last_block + 1) - clock.now()))
+            self.state = "completed"
+        except asyncio.CancelledError:
+            self.state = "cancelled"
+            raise
+        except Exception as e:
+            self.state = "failed"
+            self.last_error = str(e)
+        finally:
+            self.finished_at = time.time()
+
+    async def _tick(self, first_block: int, last_block: int) -> bool:
+        """first_block〜last_block を生成・保存する（失敗したら False。ブロックは進めない）"""
+        started = time.perf_counter()
+        try:
+            written = await self._step(first_block, last_block)
+        except Exception as e:
+            self.failed_ticks += 1
+            self.consecutive_failures += 1
+            self.last_error = str(e)
+            succeeded = False
+        else:
+            for table, count in written.items():
+                self.written[table] = self.written.get(table, 0) + count
+            self.consecutive_failures = 0
+            self.blocks_done += last_block - first_block + 1
+            self.current_block = last_block
+            succeeded = True
+        elapsed = time.perf_counter() - started
+        self._step_total += elapsed
+        self.max_step = max(self.max_step, elapsed)
+        self.ticks += 1
+        if last_block > first_block:
+            self.catch_up_ticks += 1
+        return succeeded
+
+    def status(self) -> dict:
+        virtual_time = None
+        if self.clock is not None:
+            # 終了後は最後に生成したブロックの終わりで止める
+            minutes = int(min(self.clock.virtual_minutes(), (self.from_block + self.blocks_done) * 30))
+            virtual_time = f"{minutes // 60:02d}:{minutes % 60:02d}"
+        return {
+            "simulation_id": self.id,
+            "state": self.state,
+            **self.params,
+            "speed": self.speed,
+            "seconds_per_block": round(SECONDS_PER_BLOCK / self.speed, 3),
+            "last_block": burst_time_str(self.current_block) if self.current_block is not None else None,
+            "virtual_time": virtual_time,
+            "blocks_done": self.blocks_done,
+            "blocks_total": self.to_block - self.from_block + 1,
+            "ticks": self.ticks,
+            "catch_up_ticks": self.catch_up_ticks,
+            "failed_ticks": self.failed_ticks,
+            "last_error": self.last_error,
+            "written": dict(self.written),
+            "lag_ms": {"last": round(self.last_lag * 1000, 1), "max": round(self.max_lag * 1000, 1)},
+            "step_ms": {
+                "mean": round(self._step_total / self.ticks * 1000, 2) if self.ticks else None,
+                "max": round(self.max_step * 1000, 2),
+            },
+            "elapsed_s": round((self.finished_at or time.time()) - self.started_at, 2),
+        }
+
+
+class Simulations:
+    """実行中・終了済みのシミュレーション（終了済みは直近 keep_finished 件だけ残す）"""
+
+    def __init__(self, max_running: int = 4, keep_finished: int = 50):
+        self.max_running = max_running
+        self.keep_finished = keep_finished
+        self._simulations: "OrderedDict[str, Simulation]" = OrderedDict()
+
+    @property
+    def running(self) -> int:
+        return sum(1 for s in self._simulations.values() if s.running)
+
+    def start(self, from_block: int, to_block: int, speed: float, step: Step,
+              reset: Optional[Callable[[], Awaitable[None]]] = None, params: Optional[dict] = None) -> Simulation:
+        if self.running >= self.max_running:
+            raise SimulationFull(f"Too many running simulations (max {self.max_running})")
+        simulation = Simulation(secrets.token_hex(6), from_block, to_block, speed, step, reset, params)
+        self._simulations[simulation.id] = simulation
+        simulation.start()
+        self._prune()
+        return simulation
+
+    def get(self, simulation_id: str) -> Optional[Simulation]:
+        return self._simulations.get(simulation_id)
+
+    def list(self) -> List[Simulation]:
+        return list(self._simulations.values())
+
+    async def stop_all(self) -> None:
+        for simulation in self._simulations.values():
+            await simulation.stop()
+
+    def _prune(self) -> None:
+        finished = [k for k, s in self._simulations.items() if not s.running]
+        for key in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._simulations[key]
@@ -0,0 +1,291 @@
+"""
+生成レコードの出力先（シンク）
+
+Supabase 以外に、オフライン検証・CI・ローカルダッシュボード用のファイル出力を選べる。
+どのシンクもバッチ単位で書き込み、レコードを溜め込まない（大きなバックフィルや
+フリート生成でもメモリ使用量は一定）。
+
+シンクの指定（環境変数 SINK / backfill.py の --sink）:
+    supabase              Supabase（デフォルト）
+    ndjson:<ディレクトリ>   <table>.ndjson に1行1レコードで追記
+    parquet:<ディレクトリ>  <table>-<開始時刻>.parquet に列指向で書き込み（pyarrow が必要）
+    sqlite:<ファイル>       spot_results / daily_results テーブルにupsert
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from records import COLUMNS, PRIMARY_KEYS, dedupe_latest
+from serialization import dumps, dumps_str
+
+
+class SinkError(Exception):
+    """シンクの指定・初期化に関するエラー"""
+
+
+class PermanentWriteError(SinkError):
+    """出力先が拒否した書き込み（テーブルがない・列が合わない等。同じ内容を再送しても成功しない）"""
+
+
+class Sink:
+    """出力先の共通インターフェース"""
+
+    name = "sink"
+
+    async def open(self) -> None:
+        pass
+
+    async def write(self, table: str, records: List[dict]) -> None:
+        """レコードを書き込む（WriteQueue はキューに積むだけで、書き出し完了を表す Future を返す）"""
+        raise NotImplementedError
+
+    async def flush(self) -> None:
+        pass
+
+    async def sync(self) -> None:
+        """write() 済みのレコードが書き出されるまで待つ（write() が完了時点で書き出すシンクでは何もしない）"""
+        pass
+
+    async def close(self) -> None:
+        await self.flush()
+
+    def status(self) -> dict:
+        return {"type": self.name}
+
+
+class SupabaseSink(Sink):
+    """Supabase への複数行upsert（chunk_size件ずつ）"""
+
+    name = "supabase"
+
+    def __init__(self, pool, chunk_size: int):
+        self.pool = pool
+        self.chunk_size = chunk_size
+
+    @property
+    def configured(self) -> bool:
+        return self.pool.configured
+
+    async def open(self) -> None:
+        await self.pool.open()
+
+    async def write(self, table: str, records: List[dict]) -> None:
+        if records:
+            await self.pool.upsert(table, records, chunk_size=self.chunk_size)
+
+    async def close(self) -> None:
+        await self.pool.close()
+
+    def status(self) -> dict:
+        return {"type": self.name, **self.pool.status()}
+
+
+class _FileSink(Sink):
+    """ファイル出力の共通処理（書き込みはスレッドで行い、イベントループを止めない）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rows_written: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def configured(self) -> bool:
+        return True
+
+    async def write(self, table: str, records: List[dict]) -> None:
+        if table not in COLUMNS:
+            raise PermanentWriteError(f"Unknown table: {table}")
+        if records:
+            await asyncio.to_thread(self._write_locked, table, records)
+
+    async def flush(self) -> None:
+        await asyncio.to_thread(self._locked, self._flush)
+
+    async def sync(self) -> None:
+        """溜まっている分をファイルに書き出す（ファイルは閉じない）"""
+        await self.flush()
+
+    async def close(self) -> None:
+        await asyncio.to_thread(self._locked, self._close)
+
+    def status(self) -> dict:
+        return {"type": self.name, "path": self.path, "rows_written": dict(self.rows_written)}
+
+    def _write_locked(self, table: str, records: List[dict]) -> None:
+        with self._lock:
+            self._write(table, records)
+            self.rows_written[table] = self.rows_written.get(table, 0) + len(records)
+
+    def _locked(self, fn) -> None:
+        with self._lock:
+            fn()
+
+    def _write(self, table: str, records: List[dict]) -> None:
+        raise NotImplementedError
+
+    def _flush(self) -> None:
+        pass
+
+    def _close(self) -> None:
+        self._flush()
+
+
+class NdjsonSink(_FileSink):
+    """<ディレクトリ>/<table>.ndjson に1行1レコードで追記（ストリーミング）"""
+
+    name = "ndjson"
+
+    def __init__(self, directory: str):
+        super().__init__(directory)
+        self._files = {}
+
+    def _write(self, table: str, records: List[dict]) -> None:
+        f = self._files.get(table)
+        if f is None:
+            os.makedirs(self.path, exist_ok=True)
+            f = self._files[table] = open(os.path.join(self.path, f"{table}.ndjson"), "ab")
+        f.writelines(dumps(record) + b"\n" for record in records)
+
+    def _flush(self) -> None:
+        for f in self._files.values():
+            f.flush()
+
+    def _close(self) -> None:
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+
+
+class ParquetSink(_FileSink):
+    """<ディレクトリ>/<table>-<開始時刻>.parquet に列指向で書き込み
+
+    batch_size 件ごとに1つの row group として書き出す（sync() / flush() では溜まっている分も書き出す）。
+    JSONB列はJSON文字列で保存する。Parquetはフッターを書くまで読めないため、1ファイルが max_file_rows 件に
+    達した時点と close() でファイルを閉じ、次の書き込みは新しいファイル（part）に始める（既存のファイルは上書きしない）。
+    """
+
+    name = "parquet"
+
+    def __init__(self, directory: str, batch_size: int = 10000, max_file_rows: int = 1000000):
+        super().__init__(directory)
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise SinkError("Parquet sink requires pyarrow (pip install pyarrow)")
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self.batch_size = batch_size
+        self.max_file_rows = max_file_rows
+        self._buffers: Dict[str, List[dict]] = {}
+        self._writers = {}
+        self._file_rows: Dict[str, int] = {}  # 書きかけのファイルの件数
+
+    def _schema(self, table: str):
+        types = {"text": self._pa.string(), "json": self._pa.string(), "integer": self._pa.int64(), "real": self._pa.float64()}
+        return self._pa.schema([(column, types[kind]) for column, kind in COLUMNS[table].items()])
+
+    def _write(self, table: str, records: List[dict]) -> None:
+        buffer = self._buffers.setdefault(table, [])
+        buffer.extend(records)
+        if len(buffer) >= self.batch_size:
+            self._write_batch(table)
+
+    def _write_batch(self, table: str) -> None:
+        buffer = self._buffers.get(table)
+        if not buffer:
+            return
+        columns = {}
+        for column, kind in COLUMNS[table].items():
+            if kind == "json":
+                columns[column] = [dumps_str(r.get(column)) for r in buffer]
+            else:
+                columns[column] = [r.get(column) for r in buffer]
+        schema = self._schema(table)
+        writer = self._writers.get(table)
+        if writer is None:
+            os.makedirs(self.path, exist_ok=True)
+            part = f"{table}-{datetime.now():%Y%m%dT%H%M%S%f}.parquet"
+            writer = self._writers[table] = self._pq.ParquetWriter(os.path.join(self.path, part), schema)
+        writer.write_table(self._pa.table(columns, schema=schema))
+        self._file_rows[table] = self._file_rows.get(table, 0) + len(buffer)
+        buffer.clear()
+        if self._file_rows[table] >= self.max_file_rows:
+            writer.close()
+            del self._writers[table]
+            self._file_rows[table] = 0
+
+    def _flush(self) -> None:
+        for table in list(self._buffers):
+            self._write_batch(table)
+
+    def _close(self) -> None:
+        """溜まっている分を書き出して、書きかけのファイルを閉じる"""
+        self._flush()
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+        self._file_rows.clear()
+
+
+class SqliteSink(_FileSink):
+    """ローカルSQLiteファイルの spot_results / daily_results テーブルにupsert
+
+    主キーはSupabaseと同じ（spot_results: device_id + recorded_at, daily_results: device_id + local_date）。
+    JSONB列はJSON文字列（TEXT）で保存する。
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        types = {"text": "TEXT", "json": "TEXT", "integer": "INTEGER", "real": "REAL"}
+        for table, columns in COLUMNS.items():
+            column_defs = ", ".join(f"{column} {types[kind]}" for column, kind in columns.items())
+            keys = ", ".join(PRIMARY_KEYS[table])
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({column_defs}, PRIMARY KEY ({keys}))")
+        self._conn.commit()
+
+    def _write(self, table: str, records: List[dict]) -> None:
+        columns = COLUMNS[table]
+        names = list(columns)
+        keys = PRIMARY_KEYS[table]
+        updates = ", ".join(f"{c} = excluded.{c}" for c in names if c not in keys)
+        sql = (
+            f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' for _ in names)}) "
+            f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {updates}"
+        )
+        rows = [
+            tuple(dumps_str(r.get(c)) if kind == "json" else r.get(c) for c, kind in columns.items())
+            for r in dedupe_latest(table, records)
+        ]
+        self._conn.executemany(sql, rows)
+        self._conn.commit()
+
+    def _close(self) -> None:
+        self._conn.close()
+
+
+def create_sink(spec: Optional[str], pool, chunk_size: int) -> Sink:
+    """シンク指定文字列（例: "ndjson:./out"）からシンクを生成"""
+    kind, _, target = (spec or "supabase").partition(":")
+    kind = kind.strip().lower()
+    if kind == "supabase":
+        return SupabaseSink(pool, chunk_size)
+    if not target:
+        raise SinkError(f"Sink '{kind}' requires a path (e.g. {kind}:./output)")
+    if kind == "ndjson":
+        return NdjsonSink(target)
+    if kind == "parquet":
+        return ParquetSink(target)
+    if kind == "sqlite":
+        return SqliteSink(target)
+    raise SinkError(f"Unknown sink: {kind}")
@@ -0,0 +1,265 @@
+"""
+ローカルの先行書き込みスプール（write-ahead spool）
+
+生成レコードをまずローカルのSQLiteジャーナルに追記し、バックグラウンドのワーカーが
+後段のシンク（通常はSupabase）へ順番に書き出す。Supabaseが遅い・落ちている間も
+生成は成功し、復旧後に溜まった分が再送される。プロセスを再起動しても未送信分は残る。
+
+- 書き出しはテーブルごと。成功したテーブルの行はその場で削除し、失敗したテーブルの行だけを残す
+- 一時的な失敗は指数バックオフ（retry_base 秒から倍々、最大 retry_max 秒）で再試行
+- 出力先が拒否した書き込み（PermanentWriteError: テーブルがない・列が合わない等）は半分ずつに分けて書き直し、
+  単独でも拒否される行だけを再送せずにデッドレター（spool_dead_letter テーブル）に移す
+  （1件の不正な行でスプール全体が止まらず、同じバッチの他の行も巻き込まないように）
+- 未送信件数が max_rows を超える書き込みは SpoolFullError で拒否する（古いデータは捨てない）
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from records import primary_key
+from serialization import dumps_str, loads
+from sinks import PermanentWriteError, Sink
+
+
+class SpoolFullError(Exception):
+    """スプールの上限に達した場合のエラー"""
+
+
+class SpoolSink(Sink):
+    """SQLiteジャーナルを経由して後段のシンクに書き出すシンク"""
+
+    name = "spool"
+
+    def __init__(self, sink: Sink, path: str, max_rows: int = 100000, batch_size: int = 500,
+                 retry_base: float = 0.5, retry_max: float = 60.0,
+                 on_dead_letter: Optional[Callable[[str, List[dict]], None]] = None):
+        self.sink = sink
+        self.path = path
+        self.max_rows = max_rows
+        self.batch_size = batch_size
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.drained = 0
+        self.last_dead_letter_error: Optional[str] = None
+        self.on_dead_letter = on_dead_letter  # デッドレターに移したレコードを (テーブル名, レコード一覧) で通知
+        self.consecutive_failures = 0
+        self.last_error: Optional[str] = None
+        self._next_retry_at: Optional[float] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL + synchronous=NORMAL: コミット済みの行はプロセスが落ちても残る
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS spool ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, table_name TEXT NOT NULL, payload TEXT NOT NULL, enqueued_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS spool_dead_letter ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, table_name TEXT NOT NULL, payload TEXT NOT NULL, "
+            "enqueued_at REAL NOT NULL, failed_at REAL NOT NULL, error TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+        # 前回の未送信分・デッドレターを引き継ぐ
+        self.depth_by_table: Dict[str, int] = dict(
+            self._conn.execute("SELECT table_name, COUNT(*) FROM spool GROUP BY table_name").fetchall()
+        )
+        self.dead_letter_by_table: Dict[str, int] = dict(
+            self._conn.execute("SELECT table_name, COUNT(*) FROM spool_dead_letter GROUP BY table_name").fetchall()
+        )
+        row = self._conn.execute("SELECT enqueued_at FROM spool ORDER BY id LIMIT 1").fetchone()
+        self._oldest_enqueued_at: Optional[float] = row[0] if row else None
+
+    @property
+    def configured(self) -> bool:
+        return self.sink.configured
+
+    @property
+    def depth(self) -> int:
+        return sum(self.depth_by_table.values())
+
+    @property
+    def dead_letter(self) -> int:
+        return sum(self.dead_letter_by_table.values())
+
+    async def open(self) -> None:
+        """ワーカーを起動する（後段のシンクへの接続はワーカーが必要に応じて行う）"""
+        if self._worker is None:
+            self._wakeup = asyncio.Event()
+            self._wakeup.set()
+            self._worker = asyncio.create_task(self._run())
+
+    async def write(self, table: str, records: List[dict]) -> None:
+        if not records:
+            return
+        if self.depth + len(records) > self.max_rows:
+            raise SpoolFullError(f"Spool is full ({self.depth} rows pending, max {self.max_rows})")
+        now = time.time()
+        rows = [(table, dumps_str(record), now) for record in records]
+        await asyncio.to_thread(self._append, rows)
+        self.depth_by_table[table] = self.depth_by_table.get(table, 0) + len(records)
+        if self._oldest_enqueued_at is None:
+            self._oldest_enqueued_at = now
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def wait_drained(self, timeout: float) -> bool:
+        """未送信分がなくなるまで最大 timeout 秒待つ（なくなれば True）"""
+        deadline = time.monotonic() + timeout
+        while self.depth and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        return not self.depth
+
+    async def close(self) -> None:
+        """ワーカーを止めて閉じる（送り切れなかった分はジャーナルに残り、次回起動時に再送）"""
+        if self._worker is not None:
+            if self.depth and not self.consecutive_failures:
+                await self.wait_drained(5.0)
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        await asyncio.to_thread(self._close)
+        await self.sink.close()
+
+    def status(self) -> dict:
+        now = time.time()
+        return {
+            "type": self.name,
+            "path": self.path,
+            "depth": self.depth,
+            "depth_by_table": dict(self.depth_by_table),
+            "max_rows": self.max_rows,
+            "oldest_age_s": round(now - self._oldest_enqueued_at, 1) if self._oldest_enqueued_at else None,
+            "drained": self.drained,
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error,
+            "next_retry_in_s": round(max(0.0, self._next_retry_at - now), 1) if self._next_retry_at else None,
+            "dead_letter": self.dead_letter,
+            "dead_letter_by_table": dict(self.dead_letter_by_table),
+            "last_dead_letter_error": self.last_dead_letter_error,
+            "sink": self.sink.status(),
+        }
+
+    async def _run(self) -> None:
+        """未送信分を batch_size 件ずつ後段のシンクに書き出し続ける"""
+        while True:
+            while not self.depth:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            try:
+                await self._drain_batch()
+            except Exception as e:
+                self.consecutive_failures += 1
+                self.last_error = str(e)
+                delay = min(self.retry_max, self.retry_base * 2 ** (self.consecutive_failures - 1))
+                self._next_retry_at = time.time() + delay
+                print(f"Spool drain failed (attempt {self.consecutive_failures}, retry in {delay:.1f}s): {e}")
+                await asyncio.sleep(delay)
+                try:
+                    # プールが開けていない（起動時にSupabaseが落ちていた）場合に備えて開き直す
+                    await self.sink.open()
+                except Exception:
+                    pass
+            else:
+                self.consecutive_failures = 0
+                self.last_error = None
+                self._next_retry_at = None
+
+    async def _drain_batch(self) -> None:
+        """先頭の batch_size 件をテーブルごとに書き出す（一時的な失敗があれば、他のテーブルを片付けてから送出）"""
+        rows = await asyncio.to_thread(self._read_batch)
+        if not rows:
+            return
+        # テーブルごとに、主キーが同じ行を後勝ちで1件にまとめる（まとめた行のidは一緒に扱う）
+        items_by_table: Dict[str, Dict[tuple, tuple]] = {}
+        for row_id, table, payload in rows:
+            record = loads(payload)
+            items = items_by_table.setdefault(table, {})
+            key = primary_key(table, record)
+            items[key] = (items[key][0] + [row_id] if key in items else [row_id], record)
+        written: List[int] = []
+        rejected: List[tuple] = []  # (table, ids, record, error)
+        results = await asyncio.gather(*(
+            self._write_isolating(table, list(items.values()), written, rejected)
+            for table, items in items_by_table.items()
+        ), return_exceptions=True)
+        failure = next((result for result in results if isinstance(result, BaseException)), None)
+
+        if written or rejected:
+            self._oldest_enqueued_at = await asyncio.to_thread(self._remove, written, rejected, time.time())
+        written_ids = set(written)
+        for row_id, table, _ in rows:
+            if row_id in written_ids:
+                self.depth_by_table[table] -= 1
+                self.drained += 1
+        for table, ids, record, error in rejected:
+            self.depth_by_table[table] -= len(ids)
+            self.dead_letter_by_table[table] = self.dead_letter_by_table.get(table, 0) + len(ids)
+            self.last_dead_letter_error = f"{table}: {error}"
+            print(f"Spool moved {len(ids)} {table} rows to the dead letter table: {error}")
+            if self.on_dead_letter is not None:
+                self.on_dead_letter(table, [record])
+        if failure is not None:
+            raise failure
+
+    async def _write_isolating(self, table: str, items: List[tuple], written: List[int], rejected: List[tuple]) -> None:
+        """items（(ids, record) の一覧）を書き出し、書き出せた行のidを written に、拒否された行を rejected に追加する
+
+        複数行の書き込みが拒否されたら半分ずつに分けて書き直し、単独でも拒否される行だけをデッドレターにする
+        （同じバッチに乗り合わせた無関係な行を巻き込まないように）。一時的な失敗はそのまま送出する。
+        """
+        try:
+            await self.sink.write(table, [record for _, record in items])
+        except PermanentWriteError as e:
+            if len(items) == 1:
+                ids, record = items[0]
+                rejected.append((table, ids, record, str(e)))
+                return
+            middle = len(items) // 2
+            await self._write_isolating(table, items[:middle], written, rejected)
+            await self._write_isolating(table, items[middle:], written, rejected)
+        else:
+            written.extend(row_id for ids, _ in items for row_id in ids)
+
+    def _append(self, rows: list) -> None:
+        with self._lock:
+            self._conn.executemany("INSERT INTO spool (table_name, payload, enqueued_at) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def _read_batch(self) -> list:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, table_name, payload FROM spool ORDER BY id LIMIT ?", (self.batch_size,)
+            ).fetchall()
+
+    def _remove(self, written: List[int], rejected: List[tuple], failed_at: float) -> Optional[float]:
+        """書き出した行を削除し、拒否された行をデッドレターに移して、残りの最古の追加時刻を返す"""
+        with self._lock:
+            for _, ids, _, error in rejected:
+                self._conn.executemany(
+                    "INSERT INTO spool_dead_letter (table_name, payload, enqueued_at, failed_at, error) "
+                    "SELECT table_name, payload, enqueued_at, ?, ? FROM spool WHERE id = ?",
+                    [(failed_at, error, row_id) for row_id in ids]
+                )
+            removed = written + [row_id for _, ids, _, _ in rejected for row_id in ids]
+            self._conn.executemany("DELETE FROM spool WHERE id = ?", [(row_id,) for row_id in removed])
+            self._conn.commit()
+            row = self._conn.execute("SELECT enqueued_at FROM spool ORDER BY id LIMIT 1").fetchone()
+            return row[0] if row else None
+
+    def _close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,105 @@
+"""
+behavior_summary / emotion_graph の事前計算済みキャッシュ
+
+どちらも日付に依存せず、ペルソナとブロックだけで決まる。ペルソナごとに48ブロック分を1回だけ計算し、
+任意ブロック時点のデータは事前計算済みのスナップショット・スライスを返す。
+元になるイベント・感情の定義はペルソナ定義（persona_engine.PersonaTable）にある。
+
+- イベントのカテゴリ・優先度は辞書で引く（O(1)）
+- summary_ranking はブロックを1つ進めるたびに、増えたイベントだけを前に詰めて更新する
+  （毎回全体をソートし直さない）。並びは件数の降順、同数なら先に出現したイベントが前
+"""
+
+from typing import Dict, List
+
+from persona_engine import BLOCKS_PER_DAY, PersonaTable
+
+
+class SummaryTemplate:
+    """1ペルソナ分（48ブロック）の behavior_summary / emotion_graph の事前計算済みデータ"""
+
+    __slots__ = ("persona_id", "rankings", "time_blocks", "emotion_graph")
+
+    def __init__(self, table: PersonaTable):
+        self.persona_id = table.persona_id
+        # rankings[i] / time_blocks[i]: ブロックiまでの summary_ranking / time_blocks
+        self.rankings: List[List[dict]] = []
+        self.time_blocks: List[Dict[str, List[dict]]] = []
+        self.emotion_graph: List[dict] = list(table.emotion_graph or ())
+
+        if table.events is not None:
+            ranking = _IncrementalRanking(table)
+            blocks: Dict[str, List[dict]] = {}
+            for i in range(BLOCKS_PER_DAY):
+                block_events = table.events[i]
+                blocks[f"{i // 2:02d}-{'30' if i % 2 else '00'}"] = block_events
+                ranking.add(block_events)
+                self.time_blocks.append(dict(blocks))
+                self.rankings.append(ranking.snapshot())
+
+    # 以下の戻り値はキャッシュと共有されるため、呼び出し側で変更しないこと
+
+    def behavior_summary(self, block_index: int) -> dict:
+        """ブロックblock_indexまでの behavior_summary"""
+        if not self.rankings:
+            return {"summary_ranking": [], "time_blocks": {}}
+        return {"summary_ranking": self.rankings[block_index], "time_blocks": self.time_blocks[block_index]}
+
+    def emotion_graph_until(self, block_index: int) -> List[dict]:
+        """ブロックblock_indexまでの emotion_graph"""
+        return self.emotion_graph[:block_index + 1]
+
+
+class _IncrementalRanking:
+    """イベントの累計件数ランキング（件数の降順、同数なら先に出現した順）"""
+
+    def __init__(self, table: PersonaTable):
+        self._table = table
+        self._order: List[str] = []          # ランキング順のイベント名
+        self._position: Dict[str, int] = {}  # イベント名 -> _order 内の位置
+        self._counts: Dict[str, int] = {}
+        self._first_seen: Dict[str, int] = {}
+
+    def add(self, block_events: List[dict]) -> None:
+        for event_data in block_events:
+            name = event_data["event"]
+            if name not in self._counts:
+                self._counts[name] = 0
+                self._first_seen[name] = len(self._first_seen)
+                self._position[name] = len(self._order)
+                self._order.append(name)
+            self._counts[name] += event_data["count"]
+            self._promote(self._position[name])
+
+    def _promote(self, position: int) -> None:
+        """件数が増えたイベントを、正しい位置まで前に移動する（件数は増えるだけなので前方向のみ）"""
+        order = self._order
+        name = order[position]
+        key = (self._counts[name], -self._first_seen[name])
+        while position > 0:
+            previous = order[position - 1]
+            if (self._counts[previous], -self._first_seen[previous]) >= key:
+                break
+            order[position] = previous
+            self._position[previous] = position
+            position -= 1
+        order[position] = name
+        self._position[name] = position
+
+    def snapshot(self) -> List[dict]:
+        ranking = []
+        for name in self._order:
+            category, priority = self._table.event_info(name)
+            ranking.append({"count": self._counts[name], "event": name, "category": category, "priority": priority})
+        return ranking
+
+
+_templates: Dict[str, SummaryTemplate] = {}
+
+
+def get_summary_template(table: PersonaTable) -> SummaryTemplate:
+    """ペルソナの SummaryTemplate（初回のみ計算）"""
+    template = _templates.get(table.persona_id)
+    if template is None:
+        template = _templates[table.persona_id] = SummaryTemplate(table)
+    return template
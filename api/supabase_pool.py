@@ -0,0 +1,171 @@
+"""
+Supabaseクライアントプール
+アプリ起動時に非同期クライアントを生成し、プロセスの生存期間中使い回す
+
+create_client をリクエストごとに呼ぶと、HTTPセッションの再構築と
+TLSハンドシェイクが毎回発生するため、起動時に一度だけ生成する。
+upsert は AsyncClient で実行し、イベントループをブロックしない。
+送信する本文は serialization.dumps で組み立てる（postgrest の json= 経由の標準 json を通さない）。
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional, Union
+
+from postgrest.exceptions import APIError, generate_default_error_message
+from postgrest.types import ReturnMethod
+from supabase import acreate_client, AsyncClient
+
+from metrics import PAYLOAD_BYTES, STAGE_SECONDS, UPSERT_ROWS_TOTAL, UPSERT_TOTAL
+from serialization import dumps
+from sinks import PermanentWriteError
+
+# 4xx のうち、設定の修正や時間の経過で成功しうるもの（それ以外の 4xx は PermanentWriteError）
+RETRYABLE_STATUSES = (401, 403, 408, 429)
+
+
+class SupabasePoolError(Exception):
+    """プールが利用できない場合のエラー"""
+
+
+class SupabasePool:
+    """起動時に生成したSupabase非同期クライアントを貸し出すプール
+
+    size はプール内のクライアント数で、同時に実行できる書き込み数の上限になる。
+    size=0 の場合はプールを使わず、acquire() のたびに新しいクライアントを生成する
+    （ベンチマークでの比較用）。
+    """
+
+    def __init__(self, url: Optional[str], key: Optional[str], size: int = 4, acquire_timeout: float = 10.0):
+        self.url = url
+        self.key = key
+        self.size = max(0, size)
+        self.acquire_timeout = acquire_timeout
+        self._clients: Optional["asyncio.Queue[AsyncClient]"] = None
+        self._opened = False
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.url and self.key)
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened
+
+    async def open(self) -> None:
+        """クライアントを生成してプールに格納（起動時に1回だけ呼ぶ）"""
+        if self._opened:
+            return
+        if not self.configured:
+            raise SupabasePoolError("Supabase credentials not configured")
+        self._clients = asyncio.Queue()
+        for _ in range(self.size):
+            self._clients.put_nowait(await _create_client(self.url, self.key))
+        self._opened = True
+
+    async def close(self) -> None:
+        """プール内のクライアントのHTTPセッションを閉じる"""
+        self._opened = False
+        if self._clients is None:
+            return
+        while not self._clients.empty():
+            await _close_client(self._clients.get_nowait())
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[AsyncClient]:
+        """クライアントを1つ借りる（使用後は自動でプールに戻る）"""
+        if not self._opened:
+            raise SupabasePoolError("Supabase pool is not open")
+
+        if self.size == 0:
+            with STAGE_SECONDS.time(stage="client_acquire"):
+                client = await _create_client(self.url, self.key)
+            try:
+                yield client
+            finally:
+                await _close_client(client)
+            return
+
+        try:
+            with STAGE_SECONDS.time(stage="client_acquire"):
+                client = await asyncio.wait_for(self._clients.get(), timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            raise SupabasePoolError(f"No Supabase client available within {self.acquire_timeout}s")
+        try:
+            yield client
+        finally:
+            self._clients.put_nowait(client)
+
+    async def upsert(self, table: str, records: Union[dict, list], chunk_size: Optional[int] = None) -> None:
+        """1テーブルへのupsert（レスポンス本文は不要なので return=minimal）
+
+        chunk_size を指定すると、複数行を chunk_size 件ずつの複数行upsertに分割して
+        並行に送信する（同時実行数はプールサイズで制限される）。
+        """
+        if isinstance(records, list) and chunk_size and len(records) > chunk_size:
+            await asyncio.gather(*(
+                self.upsert(table, records[i:i + chunk_size])
+                for i in range(0, len(records), chunk_size)
+            ))
+            return
+        rows = len(records) if isinstance(records, list) else 1
+        try:
+            async with self.acquire() as client:
+                with STAGE_SECONDS.time(stage=f"upsert_{table}"):
+                    await _execute(client.table(table).upsert(records, returning=ReturnMethod.minimal), records)
+        except Exception:
+            UPSERT_TOTAL.inc(table=table, result="failure")
+            UPSERT_ROWS_TOTAL.inc(rows, table=table, result="failure")
+            raise
+        UPSERT_TOTAL.inc(table=table, result="success")
+        UPSERT_ROWS_TOTAL.inc(rows, table=table, result="success")
+
+    def status(self) -> dict:
+        """/health 用のプール状態"""
+        return {
+            "configured": self.configured,
+            "open": self._opened,
+            "size": self.size,
+            "available": self._clients.qsize() if self._clients is not None else 0,
+        }
+
+
+async def _execute(builder, payload: Union[dict, list]) -> None:
+    """クエリビルダーのリクエストを、本文を dumps() で直列化して送る（本文は返さない）"""
+    response = await builder.session.request(
+        builder.http_method,
+        builder.path,
+        content=dumps(payload),
+        params=builder.params,
+        headers={**builder.headers, "Content-Type": "application/json"},
+    )
+    if not response.is_success:
+        try:
+            error = APIError(response.json())
+        except ValueError:
+            error = APIError(generate_default_error_message(response))
+        if 400 <= response.status_code < 500 and response.status_code not in RETRYABLE_STATUSES:
+            raise PermanentWriteError(f"HTTP {response.status_code}: {error}") from error
+        raise error
+
+
+async def _create_client(url: str, key: str) -> AsyncClient:
+    """クライアントを生成し、送信する本文のサイズを記録するフックを付ける"""
+    client = await acreate_client(url, key)
+    client.postgrest.session.event_hooks["request"].append(_observe_payload)
+    return client
+
+
+async def _observe_payload(request) -> None:
+    if request.method == "POST":
+        PAYLOAD_BYTES.observe(len(request.content), table=request.url.path.rsplit("/", 1)[-1])
+
+
+async def _close_client(client: AsyncClient) -> None:
+    """postgrestのHTTPセッションを閉じる（未使用なら何もしない）"""
+    postgrest = getattr(client, "_postgrest", None)
+    if postgrest is not None:
+        try:
+            await postgrest.aclose()
+        except Exception:
+            pass
@@ -0,0 +1,119 @@
+"""
+タイムゾーンごとの時刻ブロック
+
+(タイムゾーン, 日付) ごとに48ブロックのローカル時刻・UTC時刻を1回だけ計算してキャッシュし（BlockIndex）、
+現在ブロックの判定はキャッシュ済みのブロック開始時刻（エポック秒）の二分探索だけで行う。
+1ティック分の判定（current_blocks）はタイムゾーンごとに1回だけ行い、デバイス数によらない。
+
+夏時間の扱い（ブロックは常にローカルの壁時計で 00-00〜23-30 の48個）:
+- 時計が進む日の存在しない時刻のブロック（例: America/New_York の 02-00 / 02-30）は skipped。
+  現在ブロックとして返さず、spot_results も作らない
+- 時計が戻る日に2回ある時刻のブロックは1回目の時刻を使う。2回目の間は重複区間の最後のブロックのまま進まない
+  （ブロックが戻らないので、集計状態の作り直しや recorded_at の重複が起きない）
+"""
+
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+BLOCKS_PER_DAY = 48
+DEFAULT_TIMEZONE = "Asia/Tokyo"
+
+
+@lru_cache(maxsize=None)
+def get_zone(name: str) -> ZoneInfo:
+    """タイムゾーン名から ZoneInfo を取得（不明な名前は ValueError）"""
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone: {name}")
+
+
+class BlockIndex:
+    """1タイムゾーン×1日の48ブロックの時刻"""
+
+    __slots__ = ("timezone", "date", "local_times", "recorded_at_utc", "utc_starts", "skipped", "repeated")
+
+    def __init__(self, tz_name: str, date: str):
+        zone = get_zone(tz_name)
+        self.timezone = tz_name
+        self.date = date
+
+        midnight = datetime.fromisoformat(date)
+        local = []
+        self.skipped = []
+        self.repeated = []
+        for i in range(BLOCKS_PER_DAY):
+            wall = midnight + timedelta(minutes=30 * i)
+            first = wall.replace(tzinfo=zone)
+            # UTC を経由して同じ壁時計に戻らなければ、夏時間で存在しない時刻
+            skipped = first.astimezone(timezone.utc).astimezone(zone).replace(tzinfo=None) != wall
+            self.skipped.append(skipped)
+            self.repeated.append(not skipped and first.utcoffset() != wall.replace(tzinfo=zone, fold=1).utcoffset())
+            local.append(first)
+
+        self.local_times = [t.isoformat() for t in local]
+        self.recorded_at_utc = [t.astimezone(timezone.utc).isoformat() for t in local]
+
+        # 二分探索用のブロック開始時刻。存在しないブロックは次の存在するブロックと同じ値にして、探索で選ばれないようにする
+        starts = [t.timestamp() for t in local]
+        next_start = (midnight + timedelta(days=1)).replace(tzinfo=zone).timestamp()
+        for i in reversed(range(BLOCKS_PER_DAY)):
+            if self.skipped[i]:
+                starts[i] = next_start
+            next_start = starts[i]
+        self.utc_starts = starts
+
+    def block_at(self, timestamp: float) -> int:
+        """この日のうち、エポック秒 timestamp を含むブロック番号"""
+        return max(bisect_right(self.utc_starts, timestamp) - 1, 0)
+
+
+@lru_cache(maxsize=1024)
+def block_index(tz_name: str, date: str) -> BlockIndex:
+    """(タイムゾーン, 日付) の BlockIndex（初回のみ計算）"""
+    return BlockIndex(tz_name, date)
+
+
+def current_block(now: datetime, tz_name: str) -> Tuple[str, int]:
+    """now 時点の (ローカル日付, ブロック番号)"""
+    date = str(now.astimezone(get_zone(tz_name)).date())
+    return date, block_index(tz_name, date).block_at(now.timestamp())
+
+
+def current_blocks(now: datetime, tz_names: Iterable[str]) -> Dict[str, Tuple[str, int]]:
+    """1ティック分の {タイムゾーン: (ローカル日付, ブロック番号)}（タイムゾーンごとに1回だけ計算する）"""
+    blocks: Dict[str, Tuple[str, int]] = {}
+    for tz_name in tz_names:
+        if tz_name not in blocks:
+            blocks[tz_name] = current_block(now, tz_name)
+    return blocks
+
+
+def earliest_date(now: datetime, tz_names: Iterable[str]) -> str:
+    """now 時点で最も遅れているタイムゾーンのローカル日付（キャッシュの日付切り替え用）"""
+    dates: List[str] = [str(now.astimezone(get_zone(tz_name)).date()) for tz_name in set(tz_names)]
+    return min(dates) if dates else str(now.astimezone(get_zone(DEFAULT_TIMEZONE)).date())
+
+
+class EarliestDate:
+    """earliest_date() を、UTCの15分単位の境目までは前回の値で返す
+
+    どのタイムゾーンもUTCとの差は15分の倍数なので、日付が変わるのはUTCの15分単位の境目だけ。
+    キャッシュの日付切り替え判定はレコードごとに呼ばれるため、毎回タイムゾーン変換をしないようにする。
+    """
+
+    def __init__(self, tz_names: Iterable[str]):
+        self._tz_names = sorted(set(tz_names))
+        self._start = self._end = 0.0
+        self._date = ""
+
+    def __call__(self, now: datetime) -> str:
+        timestamp = now.timestamp()
+        if not self._start <= timestamp < self._end:
+            self._start = timestamp - timestamp % 900
+            self._end = self._start + 900
+            self._date = earliest_date(now, self._tz_names)
+        return self._date
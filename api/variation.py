@@ -0,0 +1,165 @@
+"""
+日ごとのばらつき（device_id × 日付をシードにした決定的な揺らぎ）
+
+ペルソナ定義のままだと毎日まったく同じ1日になるため、(device_id, 日付) ごとに
+- vibe_score の揺らぎ（[-jitter, jitter]、元のスコアの符号は変えない）
+- summary / behavior / emotion の入れ替え（ルーティンの alternatives から swap_rate の確率で選ぶ）
+- 起床・就寝などのずれ（anchors のブロックを [-shift, shift] ずらし、間のブロックは伸縮させる）
+を加える。設定はペルソナ定義の "variation"（persona_engine.VariationSettings）。
+
+乱数は使わず、(device_id, 日付) のハッシュとブロック番号から splitmix64 系のビット混合で導くため、
+同じ日を何度生成しても（プロセスをまたいでも）結果は同じ。upsert の冪等性はこれに依存している。
+全デバイス×48ブロックを numpy 配列で一括計算し、結果は呼び出し側で1日単位にキャッシュする。
+"""
+
+import hashlib
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from persona_engine import BLOCKS_PER_DAY, NO_VARIATION, PersonaTable, VariationSettings
+
+SCORE_MIN, SCORE_MAX = -100, 100
+
+# 用途ごとにハッシュ系列を分けるための値
+_SALT_JITTER = 1
+_SALT_SWAP = 2
+_SALT_SHIFT = 3
+
+_BLOCKS = np.arange(BLOCKS_PER_DAY, dtype=np.int64)
+
+
+def day_seeds(device_ids: Sequence[str], date: str) -> np.ndarray:
+    """(device_id, 日付) ごとのシード（uint64）"""
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(f"{device_id}/{date}".encode(), digest_size=8).digest(), "little")
+         for device_id in device_ids],
+        dtype=np.uint64,
+    )
+
+
+def _mix(seeds: np.ndarray, index: np.ndarray, salt: int) -> np.ndarray:
+    """(デバイス, index) ごとの決定的な64bit値（splitmix64系のビット混合）"""
+    with np.errstate(over="ignore"):
+        x = seeds[:, None] ^ ((index[None, :].astype(np.uint64) + np.uint64(salt << 8)) * np.uint64(0x9E3779B97F4A7C15))
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        x = x ^ (x >> np.uint64(31))
+    return x
+
+
+def _uniform_int(values: np.ndarray, low: int, high: int) -> np.ndarray:
+    """64bit値を [low, high] の整数に変換"""
+    return (values % np.uint64(high - low + 1)).astype(np.int64) + low
+
+
+class DayVariation:
+    """全デバイス×48ブロックの1日分のばらつき（すべて devices × 48 の配列）"""
+
+    __slots__ = ("routine_index", "choice", "spot_scores", "daily_scores")
+
+    def __init__(self, routine_index: np.ndarray, choice: np.ndarray, spot_scores: np.ndarray, daily_scores: np.ndarray):
+        self.routine_index = routine_index  # 各ブロックで参照するルーティンのブロック番号（起床・就寝のずれを反映）
+        self.choice = choice  # spot_options の何番目を使うか（0: 元の値）
+        self.spot_scores = spot_scores
+        self.daily_scores = daily_scores
+
+    def device_day(self, table: PersonaTable, device: int = 0) -> "DeviceDay":
+        """1デバイス分をリストに展開する"""
+        routine_index = self.routine_index[device].tolist()
+        options = [table.spot_options[r][c] for r, c in zip(routine_index, self.choice[device].tolist())]
+        return DeviceDay(
+            routine_index,
+            self.spot_scores[device].tolist(),
+            self.daily_scores[device].tolist(),
+            [option[0] for option in options],
+            [option[1] for option in options],
+            [option[2] for option in options],
+        )
+
+
+class DeviceDay:
+    """1デバイス×1日分のブロックごとの値（レコード生成用に Python のリストで持つ）"""
+
+    __slots__ = ("routine_index", "spot_scores", "daily_scores", "summaries", "behaviors", "emotions")
+
+    def __init__(self, routine_index: List[int], spot_scores: List[int], daily_scores: List[int],
+                 summaries: List[str], behaviors: List[str], emotions: List[str]):
+        self.routine_index = routine_index
+        self.spot_scores = spot_scores
+        self.daily_scores = daily_scores
+        self.summaries = summaries
+        self.behaviors = behaviors
+        self.emotions = emotions
+
+
+def vary(table: PersonaTable, seeds: np.ndarray, score_offsets: Optional[np.ndarray] = None,
+         enabled: bool = True) -> DayVariation:
+    """全デバイス分の1日のばらつきを一括計算する
+
+    seeds は day_seeds() の値、score_offsets はデバイスごとのスコアの底上げ（フリートモード）。
+    enabled=False ならペルソナ定義どおり（score_offsets だけを加える）。
+    """
+    settings = table.variation if enabled else NO_VARIATION
+    devices = len(seeds)
+
+    routine_index = _routine_index(settings, seeds)
+
+    # スコアの揺らぎ。0のブロックは0のまま、それ以外は符号が変わらない範囲でだけ揺らす
+    # （睡眠中などの平坦な区間にゼロ交差のバーストが出ないように）
+    if settings.jitter:
+        jitter = _uniform_int(_mix(seeds, _BLOCKS, _SALT_JITTER), -settings.jitter, settings.jitter)
+    else:
+        jitter = np.zeros((devices, BLOCKS_PER_DAY), dtype=np.int64)
+    offsets = 0 if score_offsets is None else np.asarray(score_offsets)[:, None]
+    spot_scores = _apply(np.asarray(table.spot_scores)[routine_index], jitter, offsets)
+    daily_scores = _apply(np.asarray(table.daily_scores)[routine_index], jitter, offsets)
+
+    # summary / behavior / emotion の入れ替え（確率の判定は整数で行い、環境による差が出ないようにする）
+    option_counts = np.array([len(options) for options in table.spot_options], dtype=np.int64)[routine_index]
+    choice = np.zeros((devices, BLOCKS_PER_DAY), dtype=np.int64)
+    if settings.swap_rate:
+        values = _mix(seeds, _BLOCKS, _SALT_SWAP)
+        threshold = np.uint64(int(settings.swap_rate * 0xFFFF))
+        swap = ((values & np.uint64(0xFFFF)) < threshold) & (option_counts > 1)
+        alternative = ((values >> np.uint64(16)) % np.maximum(option_counts - 1, 1).astype(np.uint64)).astype(np.int64)
+        choice = np.where(swap, alternative + 1, 0)
+
+    return DayVariation(routine_index, choice, spot_scores, daily_scores)
+
+
+def _apply(base: np.ndarray, jitter: np.ndarray, offsets) -> np.ndarray:
+    varied = base + jitter
+    varied = np.where((base == 0) | (varied * base <= 0), base, varied)
+    return np.clip(varied + offsets, SCORE_MIN, SCORE_MAX)
+
+
+def _routine_index(settings: VariationSettings, seeds: np.ndarray) -> np.ndarray:
+    """各ブロックで参照するルーティンのブロック番号（devices × 48）
+
+    anchors を [-shift, shift] ずらし、00-00 / 23-30 と anchors の間は区分線形に伸縮させる
+    （例: 起床が30分遅い日は、深夜〜起床の区間が1ブロック分引き伸ばされる）。
+    """
+    devices = len(seeds)
+    if not settings.anchors or not settings.shift:
+        return np.broadcast_to(_BLOCKS, (devices, BLOCKS_PER_DAY)).copy()
+
+    anchors = np.array(settings.anchors, dtype=np.int64)
+    shifts = _uniform_int(_mix(seeds, np.arange(len(anchors)), _SALT_SHIFT), -settings.shift, settings.shift)
+
+    # ずらした後の位置（dst）と、元のルーティン上の位置（src）。両端は固定
+    last = BLOCKS_PER_DAY - 1
+    dst = np.concatenate([np.zeros((devices, 1), np.int64), anchors[None, :] + shifts,
+                          np.full((devices, 1), last, np.int64)], axis=1)
+    src = np.concatenate([[0], anchors, [last]])
+
+    routine_index = np.zeros((devices, BLOCKS_PER_DAY), dtype=np.int64)
+    blocks = _BLOCKS[None, :]
+    for k in range(len(src) - 1):
+        start, end = dst[:, k:k + 1], dst[:, k + 1:k + 2]
+        # 区間内の位置を src の区間に線形に写す（整数演算で四捨五入）
+        span = end - start
+        mapped = src[k] + (2 * (blocks - start) * (src[k + 1] - src[k]) + span) // (2 * span)
+        in_segment = (blocks >= start) & ((blocks < end) | (k == len(src) - 2))
+        routine_index = np.where(in_segment, mapped, routine_index)
+    return routine_index
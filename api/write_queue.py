@@ -0,0 +1,145 @@
+"""
+書き込みの合流（コアレス）キュー
+
+シンクへの書き込みを window 秒だけ溜めてから、テーブルごとに1回の複数行upsertで書き出す。
+同じ主キーのレコード（例: 同じ日の daily_results の累積更新）は後勝ちで1件にまとめる。
+write() はキューに積むだけですぐ返り、積んだレコードを含むバッチの書き出し完了を表す Future を返す。
+自分のレコードの永続化を待つ場合はその Future を、キュー全体を待つ場合は sync() を await する。
+"""
+
+import asyncio
+from typing import Dict, List, Optional
+
+from records import primary_key
+from sinks import Sink
+
+
+class WriteQueue(Sink):
+    """シンクの前段に置く書き込みキュー（Sink と同じインターフェース）
+
+    - window 秒ごと、または保留件数が max_pending に達した時点で書き出す
+    - 書き出しは1つずつ順番に行う（後の書き込みが先に反映されることはない）
+    - 保留件数が max_pending 以上のときは write() 自体が書き出しを待つ（バックプレッシャー）
+    """
+
+    name = "write_queue"
+
+    def __init__(self, sink: Sink, window: float = 0.05, max_pending: int = 5000):
+        self.sink = sink
+        self.window = window
+        self.max_pending = max_pending
+        self._pending: Dict[str, Dict[tuple, dict]] = {}
+        self._pending_count = 0
+        self._future: Optional[asyncio.Future] = None  # 保留中のバッチの書き出し完了
+        self._inflight: Optional[asyncio.Future] = None  # 書き出し中のバッチの完了
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+        self._lock: Optional[asyncio.Lock] = None
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.records_submitted = 0
+        self.records_written = 0
+
+    @property
+    def configured(self) -> bool:
+        return self.sink.configured
+
+    async def open(self) -> None:
+        await self.sink.open()
+
+    def submit(self, table: str, records: List[dict]) -> asyncio.Future:
+        """レコードをキューに積み、それを含むバッチの書き出し完了を表す Future を返す
+
+        records が空なら完了済みの Future を返す（他の呼び出し元のバッチを待たせない）。
+        """
+        loop = asyncio.get_running_loop()
+        if not records:
+            future = loop.create_future()
+            future.set_result(None)
+            return future
+        if self._future is None:
+            self._future = loop.create_future()
+        pending = self._pending.setdefault(table, {})
+        for record in records:
+            pending[primary_key(table, record)] = record
+        self._pending_count += len(records)
+        self.records_submitted += len(records)
+        if self._timer is None:
+            self._timer = loop.call_later(self.window, self._schedule_flush)
+        return self._future
+
+    async def write(self, table: str, records: List[dict]) -> asyncio.Future:
+        """キューに積み、それを含むバッチの書き出し完了を表す Future を返す"""
+        future = self.submit(table, records)
+        if self._pending_count >= self.max_pending:
+            await self._flush_pending()
+            # 自分で書き出したバッチの失敗はここで返す
+            await asyncio.shield(future)
+        return future
+
+    async def sync(self) -> None:
+        """ここまでに積んだレコードがすべて書き出されるまで待つ（失敗時は例外）
+
+        書き出し中・保留中のバッチだけを待つ。書き出し終えたバッチの失敗は、そのバッチの Future を
+        受け取った呼び出し元に返すので、ここでは返さない。
+        """
+        for future in [self._inflight, self._future]:
+            if future is not None:
+                await asyncio.shield(future)
+
+    async def flush(self) -> None:
+        """保留中のレコードを今すぐ書き出す"""
+        await self._flush_pending()
+        await self.sink.flush()
+
+    async def close(self) -> None:
+        await self._flush_pending()
+        await self.sink.close()
+
+    def status(self) -> dict:
+        return {
+            "type": self.name,
+            "window_ms": round(self.window * 1000, 1),
+            "pending": {table: len(records) for table, records in self._pending.items()},
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "records_submitted": self.records_submitted,
+            "records_written": self.records_written,
+            "sink": self.sink.status(),
+        }
+
+    def _schedule_flush(self) -> None:
+        task = asyncio.ensure_future(self._flush_pending())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush_pending(self) -> None:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._pending_count:
+                return
+
+            batch, future = self._pending, self._future
+            self._pending, self._pending_count, self._future = {}, 0, None
+            self._inflight = future
+            try:
+                await asyncio.gather(*(
+                    self.sink.write(table, list(records.values())) for table, records in batch.items()
+                ))
+                # バッチの Future が完了した時点で、後段のシンクでも永続化されているようにする
+                await self.sink.sync()
+            except Exception as e:
+                self.failed_flushes += 1
+                print(f"Write queue flush failed: {e}")
+                future.set_exception(e)
+                future.exception()  # 待っている呼び出し元がいなくても警告を出さない
+            else:
+                self.flushes += 1
+                self.records_written += sum(len(records) for records in batch.values())
+                future.set_result(None)
+            finally:
+                self._inflight = None
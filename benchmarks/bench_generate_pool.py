@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+POST /generate 1回あたりのレイテンシ（p50/p99）を計測するベンチマーク
+Supabaseクライアントプールあり/なし（SUPABASE_POOL_SIZE=0）を比較する
+
+使用例:
+    python3 benchmarks/bench_generate_pool.py --requests 300 --delay 0.002
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from fake_supabase import FakeSupabase, FAKE_SUPABASE_KEY
+
+
+def percentile(values: list, p: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(p / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def run(main, pool_size: int, n_requests: int) -> dict:
+    from fastapi.testclient import TestClient
+    from supabase_pool import SupabasePool
+
+    main.supabase_pool = SupabasePool(main.SUPABASE_URL, main.SUPABASE_KEY, size=pool_size)
+    latencies = []
+    with TestClient(main.app) as client:
+        for i in range(n_requests):
+            block = i % 48
+            body = {"persona_id": "child_5yo", "date": "2025-10-03", "time_block": f"{block // 2:02d}-{'30' if block % 2 else '00'}"}
+            start = time.perf_counter()
+            response = client.post("/generate", json=body)
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, response.text
+
+    return {
+        "pool_size": pool_size,
+        "requests": n_requests,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(statistics.mean(latencies), 3),
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--delay", type=float, default=0.0, help="代替サーバーの擬似遅延（秒）")
+    args = parser.parse_args()
+
+    fake = FakeSupabase(delay=args.delay).start()
+    os.environ["SUPABASE_URL"] = fake.url
+    os.environ["SUPABASE_KEY"] = FAKE_SUPABASE_KEY
+    import main
+
+    try:
+        for pool_size in (0, 4):
+            fake.connection_count = 0
+            result = run(main, pool_size, args.requests)
+            result["tcp_connections"] = fake.connection_count
+            label = "without pool" if pool_size == 0 else "with pool"
+            print(f"{label:>13}: {result}")
+    finally:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Lambdaトリガーのペルソナ並行呼び出しのベンチマーク
+/generate を一定時間遅延して返すローカルのスタブサーバーに対して lambda_handler を実行し、
+ペルソナ数を増やしたときの実行時間を逐次実行（MAX_CONCURRENCY=1）と比較する
+
+使用例:
+    python3 benchmarks/bench_lambda_fanout.py
+    python3 benchmarks/bench_lambda_fanout.py --personas 1 3 10 30 --delay 0.2 --concurrency 8
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lambda"))
+
+
+class StubGenerator:
+    """POST /demo-generator/generate に delay 秒後に200を返すスタブ（fail に含むペルソナは500）"""
+
+    def __init__(self, delay: float, fail: tuple = ()):
+        self.delay = delay
+        self.fail = set(fail)
+        self.connection_count = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubGenerator":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with stub._lock:
+                    stub.connection_count += 1
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                time.sleep(stub.delay)
+                persona_id = body.get("persona_id")
+                if persona_id in stub.fail:
+                    status, payload = 500, {"detail": "stub failure"}
+                else:
+                    status, payload = 200, {"message": f"Generated for {persona_id}"}
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def run_handler(lambda_function, personas: list, concurrency: int) -> tuple:
+    lambda_function.PERSONAS = personas
+    lambda_function.MAX_CONCURRENCY = concurrency
+    started = time.perf_counter()
+    response = lambda_function.lambda_handler({}, None)
+    return time.perf_counter() - started, response
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--personas", type=int, nargs="+", default=[1, 3, 6, 12])
+    parser.add_argument("--delay", type=float, default=0.2, help="スタブの応答遅延（秒）")
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    stub = StubGenerator(args.delay, fail=("persona_fail",)).start()
+    os.environ["API_BASE_URL"] = stub.url
+    os.environ["USE_BATCH_API"] = "false"
+    import lambda_function
+
+    # 出力されるログは計測の邪魔になるので捨てる
+    devnull = open(os.devnull, "w")
+    stdout = sys.stdout
+
+    # 結果の形式（ペルソナ順・200/500）が逐次実行と一致することを確認
+    sys.stdout = devnull
+    personas = ["child_5yo", "persona_fail", "elderly_70s"]
+    _, sequential = run_handler(lambda_function, personas, 1)
+    _, concurrent = run_handler(lambda_function, personas, args.concurrency)
+    sys.stdout = stdout
+    assert sequential["statusCode"] == concurrent["statusCode"] == 500
+    strip = lambda r: [(x["persona_id"], x["success"]) for x in json.loads(r["body"])["results"]]
+    assert strip(sequential) == strip(concurrent) == [("child_5yo", True), ("persona_fail", False), ("elderly_70s", True)]
+
+    print(f"stub delay: {args.delay * 1000:.0f} ms, concurrency: {args.concurrency}")
+    print(f"{'personas':>8} {'sequential_s':>13} {'concurrent_s':>13} {'speedup':>8}")
+    for count in args.personas:
+        personas = [f"persona_{i}" for i in range(count)]
+        sys.stdout = devnull
+        sequential_s, _ = run_handler(lambda_function, personas, 1)
+        concurrent_s, response = run_handler(lambda_function, personas, args.concurrency)
+        sys.stdout = stdout
+        assert response["statusCode"] == 200
+        print(f"{count:>8} {sequential_s:>13.3f} {concurrent_s:>13.3f} {sequential_s / concurrent_s:>7.1f}x")
+
+    print(f"connections opened: {stub.connection_count}")
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+ライブ配信（live_feed.Broadcaster）のベンチマーク
+
+1. 購読者数ごとの、1イベントを発行する時間（1回だけ直列化して共有）と、
+   購読者ごとに直列化した場合の時間
+2. 読み出さない（遅い）購読者がいる状態での発行時間と、1購読者あたりのキューの最大長
+
+使用例:
+    python3 benchmarks/bench_live_feed.py --subscribers 1 100 1000 10000
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+
+def time_call(fn, repeat: int) -> float:
+    """fn() を repeat 回実行したときの1回あたりの中央値（µs）"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6
+
+
+async def run(args):
+    import main
+    from live_feed import Broadcaster, sse_frame
+    from serialization import dumps
+
+    date = "2025-10-01"
+    spot = main.generate_spot_result_record("child_5yo", date, 20, "10-00")
+    daily = main.generate_daily_result_record("child_5yo", date, 20, "10-00")
+    event = main.live_block_event("child_5yo", date, "10-00", spot, daily, main.aggregator_delta(spot["device_id"], date))
+
+    print(f"{'subscribers':>11} {'shared (us)':>12} {'per-sub (us)':>13}")
+    for count in args.subscribers:
+        broadcaster = Broadcaster(max_queue=args.queue, max_subscribers=count)
+        subscriptions = [broadcaster.subscribe("child_5yo") for _ in range(count)]
+
+        def shared():
+            broadcaster.publish("child_5yo", spot["device_id"], "block", event)
+            for s in subscriptions:
+                s.queue.clear()
+
+        def per_subscriber():
+            for s in subscriptions:
+                s.push(sse_frame("block", dumps(event)))
+                s.queue.clear()
+
+        print(f"{count:>11} {time_call(shared, args.repeat):>12.1f} {time_call(per_subscriber, args.repeat):>13.1f}")
+
+    # 読み出さない購読者: キューは上限で止まり、発行は待たされない
+    count = args.subscribers[-1]
+    broadcaster = Broadcaster(max_queue=args.queue, max_subscribers=count)
+    subscriptions = [broadcaster.subscribe("child_5yo") for _ in range(count)]
+    elapsed = time_call(lambda: broadcaster.publish("child_5yo", spot["device_id"], "block", event), args.repeat)
+    print(f"\nslow subscribers ({count}, never read): {elapsed:.1f} us per publish, "
+          f"max queue {max(len(s.queue) for s in subscriptions)} (limit {args.queue}), "
+          f"dropped per subscriber {subscriptions[0].dropped}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[1, 100, 1000, 10000])
+    parser.add_argument("--queue", type=int, default=256, help="購読者ごとのキューの上限")
+    parser.add_argument("--repeat", type=int, default=50)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+スコア集計エンジンのベンチマーク（スカラー版 vs numpy ベクトル化版）
+平均・バースト判定の結果が一致することを確認したうえで、1 / 100 / 10000 デバイスでの速度を比較する
+
+使用例:
+    python3 benchmarks/bench_score_engine.py
+    python3 benchmarks/bench_score_engine.py --devices 1 100 10000 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from score_engine import summarize, to_masked
+
+
+def scalar_summary(scores: list) -> tuple:
+    """generate_daily_result_record と同じ手順のスカラー実装（None は未到来ブロック）"""
+    valid_scores = [s for s in scores if s is not None]
+    average = sum(valid_scores) / len(valid_scores) if valid_scores else 0
+    bursts = []
+    for i in range(1, len(scores)):
+        if scores[i] is not None and scores[i - 1] is not None:
+            change = scores[i] - scores[i - 1]
+            if abs(change) >= 15 or (scores[i - 1] * scores[i] < 0):
+                bursts.append((i, change))
+    return average, bursts
+
+
+def make_rows(devices: int, seed: int = 0) -> list:
+    """デバイスごとに現在ブロック以降を None にしたランダムなスコア列"""
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(devices):
+        until = rng.randrange(48)
+        rows.append([rng.randint(-40, 60) if i <= until else None for i in range(48)])
+    return rows
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, nargs="+", default=[1, 100, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'devices':>8} {'scalar_ms':>10} {'vector_ms':>10} {'speedup':>8}")
+    for devices in args.devices:
+        rows = make_rows(devices)
+        masked = to_masked(rows)
+
+        # 結果の一致を確認
+        summary = summarize(masked)
+        for d, row in enumerate(rows):
+            average, bursts = scalar_summary(row)
+            assert summary.averages[d, -1] == average, (d, summary.averages[d, -1], average)
+            assert summary.burst_events(d) == bursts, d
+
+        scalar = best_of(lambda: [scalar_summary(row) for row in rows], args.repeat)
+        vector = best_of(lambda: summarize(masked), args.repeat)
+        print(f"{devices:>8} {scalar * 1000:>10.3f} {vector * 1000:>10.3f} {scalar / vector:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main_cli()
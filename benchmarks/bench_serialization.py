@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+JSONシリアライズ（serialization.dumps）のベンチマーク
+
+1. 生成レコード（spot_results / daily_results）と /preview 相当の本文を、標準の json.dumps と
+   serialization.dumps（orjson があれば orjson）で直列化したときの1回あたりの時間
+2. /generate/batch の応答本文を1つにまとめた場合と、NDJSONのチャンクで順に書き出した場合の
+   ピークメモリ（tracemalloc）
+
+使用例:
+    python3 benchmarks/bench_serialization.py --items 10000
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+
+def time_call(fn, repeat: int) -> float:
+    """fn() を repeat 回実行したときの1回あたりの中央値（µs）"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6
+
+
+def peak_bytes(fn) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--items", type=int, default=10000, help="バッチ応答の項目数")
+    args = parser.parse_args()
+
+    import main
+    import serialization
+
+    date = "2025-10-01"
+    spot = main.generate_spot_result_record("child_5yo", date, 47, "23-30")
+    daily = main.generate_daily_result_record("child_5yo", date, 47, "23-30")
+    preview = {
+        "spot_results": [main.generate_spot_result_record("child_5yo", date, i, main.block_index_to_str(i)) for i in range(48)],
+        "daily_results": [daily] * 48,
+    }
+
+    def stdlib(obj):
+        return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+    print(f"serializer: {'orjson' if serialization.orjson is not None else 'json (orjson not installed)'}")
+    print(f"{'payload':<16} {'json (us)':>12} {'dumps (us)':>12} {'speedup':>8}")
+    for name, obj in (("spot_record", spot), ("daily_record", daily), ("preview_day", preview)):
+        before = time_call(lambda: stdlib(obj), args.repeat)
+        after = time_call(lambda: serialization.dumps(obj), args.repeat)
+        print(f"{name:<16} {before:>12.1f} {after:>12.1f} {before / after:>7.1f}x")
+
+    # バッチ応答: 項目ごとのサマリー（/generate/batch の results と同じ形）
+    results = [
+        main.summarize_generated("child_5yo", date, main.block_index_to_str(i % 48), spot, daily)
+        for i in range(args.items)
+    ]
+
+    def whole_body():
+        serialization.dumps({"results": results})
+
+    def streamed_body():
+        for _ in serialization.iter_ndjson({"type": "result", **item} for item in results):
+            pass
+
+    print(f"\nbatch response ({args.items} items), peak memory")
+    print(f"  one JSON body: {peak_bytes(whole_body) / 1e6:8.2f} MB")
+    print(f"  NDJSON chunks: {peak_bytes(streamed_body) / 1e6:8.2f} MB")
+
+
+if __name__ == "__main__":
+    main_cli()
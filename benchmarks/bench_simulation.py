@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+早送りシミュレーション（POST /simulate）のベンチマーク
+APIとSupabase代替サーバーをプロセス内で起動し、倍速ごとに1日分（48ブロック）を再生して、
+1ブロックあたりの処理時間（step）と仮想時計からの遅れ（lag）、遅れてまとめて生成したティック数を出力する。
+step の最大値が1ブロックの持ち時間（1800 / 倍速 秒）より十分小さければ、その倍速で遅れずに再生できる
+
+使用例:
+    python3 benchmarks/bench_simulation.py --speeds 1000 10000 100000
+    python3 benchmarks/bench_simulation.py --speeds 100000 --devices 1000 --delay 0.005
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from fake_supabase import FakeSupabase, FAKE_SUPABASE_KEY
+
+
+async def run(args):
+    import httpx
+    import main
+
+    transport = httpx.ASGITransport(app=main.app)
+    print(f"{'speed':>9} {'budget (ms)':>12} {'wall (s)':>9} {'ticks':>6} {'catch-up':>9} "
+          f"{'step mean/max (ms)':>19} {'lag max (ms)':>13}")
+    async with main.lifespan(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for speed in args.speeds:
+                body = {"persona_ids": args.personas, "date": args.date, "speed": speed, "reset": True}
+                if args.devices:
+                    body["devices"] = args.devices
+                started = time.perf_counter()
+                response = await client.post("/simulate", json=body)
+                assert response.status_code == 200, response.text
+                simulation_id = response.json()["simulation_id"]
+                while True:
+                    status = (await client.get(f"/simulate/{simulation_id}")).json()
+                    if status["state"] != "running":
+                        break
+                    await asyncio.sleep(0.05)
+                wall = time.perf_counter() - started
+                assert status["state"] == "completed", status
+                step = f"{status['step_ms']['mean']}/{status['step_ms']['max']}"
+                print(f"{speed:>9g} {status['seconds_per_block'] * 1000:>12.1f} {wall:>9.2f} {status['ticks']:>6} "
+                      f"{status['catch_up_ticks']:>9} {step:>19} {status['lag_ms']['max']:>13}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--speeds", type=float, nargs="+", default=[10000, 100000, 1000000],
+                        help="倍速（1000倍速は1日分の再生に約86秒かかる）")
+    parser.add_argument("--personas", nargs="+", default=["child_5yo", "adult_30s", "elderly_70s"])
+    parser.add_argument("--date", default="2025-10-03")
+    parser.add_argument("--devices", type=int, default=0, help="フリートの仮想デバイス数（0で各ペルソナのデバイスのみ）")
+    parser.add_argument("--delay", type=float, default=0.0, help="代替サーバーの擬似遅延（秒）")
+    args = parser.parse_args()
+
+    fake = FakeSupabase(delay=args.delay).start()
+    os.environ["SUPABASE_URL"] = fake.url
+    os.environ["SUPABASE_KEY"] = FAKE_SUPABASE_KEY
+    os.environ["MAX_SIMULATION_SPEED"] = str(max(args.speeds))
+    # 同じ日付を繰り返し再生するため、同じ内容の書き込みの省略を無効にする
+    os.environ["WRITE_INDEX_MAX_ENTRIES"] = "0"
+    try:
+        asyncio.run(run(args))
+    finally:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+ジェネレーターとAPIのベンチマークスイート（結果はJSONで保存し、コミット間で比較する）
+
+1. micro:   生成関数の1回あたりの時間（µs）を全ブロック（0〜47）について計測
+            generate_vibe_scores_until / generate_behavior_summary / generate_emotion_graph /
+            generate_spot_result_record / generate_daily_result_record
+            daily は本番と同じく日ごとにブロック0から順に呼んだときの各ブロックの時間
+2. e2e:     POST /generate のスループットとレイテンシ（インメモリのSupabase代替サーバー）
+3. scaling: /generate/batch の件数、/backfill の日数、/generate/fleet の台数ごとの所要時間（最速値）
+
+使用例:
+    python3 benchmarks/bench_suite.py                       # benchmarks/results/<commit>.json に保存
+    python3 benchmarks/bench_suite.py --quick               # 小さいサイズで短時間に実行
+    python3 benchmarks/bench_suite.py --compare benchmarks/results/abc1234.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date as date_cls, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "api"))
+
+from fake_supabase import FakeSupabase, FAKE_SUPABASE_KEY
+
+# 同じ内容の書き込みの省略が効くと計測のたびに結果が変わるため無効にする
+os.environ["WRITE_INDEX_MAX_ENTRIES"] = "0"
+
+BASE_DATE = date_cls(2025, 1, 1)
+
+
+def percentile(values: list, p: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(p / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def day_str(offset: int) -> str:
+    return str(BASE_DATE + timedelta(days=offset))
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def time_call(fn, repeat: int) -> float:
+    """fn() を repeat 回実行したときの1回あたりの中央値（µs）"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6
+
+
+def bench_micro(main, repeat: int, days: int) -> dict:
+    persona_id = "child_5yo"
+    results = {}
+
+    for name, fn in (
+        ("generate_vibe_scores_until", main.generate_vibe_scores_until),
+        ("generate_behavior_summary", main.generate_behavior_summary),
+        ("generate_emotion_graph", main.generate_emotion_graph),
+    ):
+        results[name] = [round(time_call(lambda: fn(block, persona_id), repeat), 3) for block in range(48)]
+
+    # spot は日付ごとのテンプレートを引くだけなので、同じ日の各ブロックを繰り返し呼ぶ
+    date = day_str(0)
+    results["generate_spot_result_record"] = [
+        round(time_call(lambda: main.generate_spot_result_record(persona_id, date, block, main.block_index_to_str(block)), repeat), 3)
+        for block in range(48)
+    ]
+
+    # daily は累積状態を持つため、日ごとにブロック0から順に呼んだときの各ブロックの時間を集める
+    samples = [[] for _ in range(48)]
+    for day in range(days):
+        date = day_str(1 + day)
+        for block in range(48):
+            block_str = main.block_index_to_str(block)
+            start = time.perf_counter()
+            main.generate_daily_result_record(persona_id, date, block, block_str)
+            samples[block].append(time.perf_counter() - start)
+    results["generate_daily_result_record"] = [round(statistics.median(s) * 1e6, 3) for s in samples]
+
+    return {
+        "unit": "us_per_call",
+        "per_block": results,
+        "mean": {name: round(statistics.mean(values), 3) for name, values in results.items()},
+    }
+
+
+async def _post_concurrently(main, path: str, bodies: list, concurrency: int) -> tuple:
+    import httpx
+
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        async def post(body):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(path, json=body)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(post(body) for body in bodies))
+        return time.perf_counter() - started, latencies, errors
+
+
+async def _with_pool(main, coro_fn):
+    await main.supabase_pool.open()
+    try:
+        return await coro_fn()
+    finally:
+        await main.supabase_pool.close()
+
+
+def bench_e2e(main, days: int, concurrency: int) -> dict:
+    """日ごとにブロック0〜47を送る（異なる日は並行）"""
+    bodies = [
+        {"persona_id": "child_5yo", "date": day_str(150 + day), "time_block": main.block_index_to_str(block)}
+        for block in range(48) for day in range(days)
+    ]
+    elapsed, latencies, errors = asyncio.run(
+        _with_pool(main, lambda: _post_concurrently(main, "/generate", bodies, concurrency))
+    )
+    return {
+        "requests": len(bodies),
+        "concurrency": concurrency,
+        "requests_per_s": round(len(bodies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "errors": errors,
+    }
+
+
+def _bench_one(main, path: str, body: dict) -> float:
+    elapsed, _, errors = asyncio.run(_with_pool(main, lambda: _post_concurrently(main, path, [body], 1)))
+    assert errors == 0, (path, body)
+    return elapsed
+
+
+def bench_scaling(main, batch_sizes: list, backfill_days: list, fleet_devices: list, repeat: int) -> dict:
+    """各サイズを repeat 回（毎回別の日付で）実行したうちの最速値"""
+    results = {"batch": [], "backfill": [], "fleet": []}
+
+    def best(path: str, make_body) -> float:
+        return min(_bench_one(main, path, make_body(rep)) for rep in range(repeat))
+
+    for offset, size in enumerate(batch_sizes):
+        elapsed = best("/generate/batch", lambda rep: {"items": [
+            {"persona_id": "child_5yo", "date": day_str(200 + (offset * repeat + rep) * 25 + i // 48),
+             "time_block": main.block_index_to_str(i % 48)}
+            for i in range(size)
+        ]})
+        results["batch"].append({"items": size, "seconds": round(elapsed, 4), "items_per_s": round(size / elapsed, 1)})
+
+    for offset, days in enumerate(backfill_days):
+        def backfill_body(rep):
+            start = BASE_DATE + timedelta(days=1000 + (offset * repeat + rep) * 100)
+            return {"persona_id": "child_5yo", "start_date": str(start), "end_date": str(start + timedelta(days=days - 1))}
+        elapsed = best("/backfill", backfill_body)
+        results["backfill"].append({"days": days, "seconds": round(elapsed, 4), "days_per_s": round(days / elapsed, 1)})
+
+    for offset, devices in enumerate(fleet_devices):
+        elapsed = best("/generate/fleet", lambda rep: {
+            "persona_id": "child_5yo", "devices": devices, "date": day_str(4000 + offset * repeat + rep), "time_block": "12-00"
+        })
+        results["fleet"].append({"devices": devices, "seconds": round(elapsed, 4), "devices_per_s": round(devices / elapsed, 1)})
+
+    return results
+
+
+def flatten(result: dict) -> dict:
+    """比較用に {指標名: (値, 大きいほど良いか)} に平らにする"""
+    flat = {}
+    for name, value in result["micro"]["mean"].items():
+        flat[f"micro.{name}.mean_us"] = (value, False)
+    e2e = result["e2e"]
+    flat["e2e.requests_per_s"] = (e2e["requests_per_s"], True)
+    flat["e2e.p50_ms"] = (e2e["p50_ms"], False)
+    flat["e2e.p99_ms"] = (e2e["p99_ms"], False)
+    for kind, size_key in (("batch", "items"), ("backfill", "days"), ("fleet", "devices")):
+        for row in result["scaling"][kind]:
+            flat[f"scaling.{kind}.{row[size_key]}.seconds"] = (row["seconds"], False)
+    return flat
+
+
+def compare(current: dict, previous: dict, threshold: float) -> int:
+    """前回の結果との比較を表示し、threshold を超えて悪化した指標の数を返す"""
+    before = flatten(previous)
+    after = flatten(current)
+    regressions = 0
+    print(f"\nCompared with {previous['meta']['commit']} (threshold {threshold:.0%})")
+    print(f"{'metric':<48} {'before':>12} {'after':>12} {'change':>8}")
+    for name, (value, higher_is_better) in after.items():
+        if name not in before or not before[name][0]:
+            continue
+        old = before[name][0]
+        change = (value - old) / old
+        worse = -change if higher_is_better else change
+        flag = ""
+        if worse > threshold:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(f"{name:<48} {old:>12.3f} {value:>12.3f} {change:>+7.1%}{flag}")
+    return regressions
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="小さいサイズで短時間に実行")
+    parser.add_argument("--output", help="結果のJSONファイル（省略時は benchmarks/results/<commit>.json）")
+    parser.add_argument("--compare", help="比較する前回の結果のJSONファイル")
+    parser.add_argument("--threshold", type=float, default=0.2, help="悪化とみなす変化率（--compare 用）")
+    args = parser.parse_args()
+
+    if args.quick:
+        config = {"repeat": 20, "daily_days": 10, "e2e_days": 4, "concurrency": 16,
+                  "batch_sizes": [1, 10, 100], "backfill_days": [1, 7], "fleet_devices": [10, 100, 1000], "scaling_repeat": 3}
+    else:
+        config = {"repeat": 200, "daily_days": 100, "e2e_days": 20, "concurrency": 32,
+                  "batch_sizes": [1, 10, 100, 1000], "backfill_days": [1, 7, 30, 90], "fleet_devices": [10, 100, 1000, 10000], "scaling_repeat": 5}
+
+    fake = FakeSupabase().start()
+    os.environ["SUPABASE_URL"] = fake.url
+    os.environ["SUPABASE_KEY"] = FAKE_SUPABASE_KEY
+    os.environ["SINK"] = "supabase"
+    import main
+    import numpy
+
+    try:
+        print("micro ...", flush=True)
+        micro = bench_micro(main, config["repeat"], config["daily_days"])
+        print("e2e ...", flush=True)
+        e2e = bench_e2e(main, config["e2e_days"], config["concurrency"])
+        print("scaling ...", flush=True)
+        scaling = bench_scaling(main, config["batch_sizes"], config["backfill_days"], config["fleet_devices"],
+                                config["scaling_repeat"])
+    finally:
+        fake.stop()
+
+    result = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "numpy": numpy.__version__,
+            "platform": platform.platform(),
+            "config": config,
+        },
+        "micro": micro,
+        "e2e": e2e,
+        "scaling": scaling,
+    }
+
+    output = args.output or os.path.join(BENCH_DIR, "results", f"{result['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+
+    print(json.dumps({"micro_mean_us": micro["mean"], "e2e": e2e, "scaling": scaling}, indent=2))
+    print(f"Saved: {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        if compare(result, previous, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
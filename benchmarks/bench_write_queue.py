@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+書き込みキュー（WRITE_QUEUE_WINDOW_MS）の効果を計測するベンチマーク
+日ごとに全ブロックを順に POST /generate し、複数の日を並行して送ったときの
+Supabase代替サーバーへのHTTPリクエスト数と所要時間をキューなし/ありで比較する。最終的に保存される行がどちらも同じであることも確認する
+
+使用例:
+    python3 benchmarks/bench_write_queue.py --days 28 --delay 0.005 --window-ms 20
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from fake_supabase import FakeSupabase, FAKE_SUPABASE_KEY
+
+IGNORED_COLUMNS = ("created_at", "updated_at")
+
+
+def normalize(rows: list) -> list:
+    return sorted(
+        (tuple(sorted((k, repr(v)) for k, v in row.items() if k not in IGNORED_COLUMNS)) for row in rows)
+    )
+
+
+async def send_all(main, days: int, wait: bool) -> float:
+    import httpx
+
+    transport = httpx.ASGITransport(app=main.app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def post_day(day: int):
+            for block in range(48):
+                body = {"persona_id": "child_5yo", "date": f"2025-10-{day + 1:02d}", "time_block": main.block_index_to_str(block)}
+                response = await client.post("/generate", json=body, params={"wait": str(wait).lower()})
+                assert response.status_code == 200, response.text
+
+        started = time.perf_counter()
+        await asyncio.gather(*(post_day(day) for day in range(days)))
+        await main.sink.flush()
+        return time.perf_counter() - started
+
+
+def run(main, fake, window_ms: int, days: int, wait: bool) -> dict:
+    from sinks import create_sink
+    from write_queue import WriteQueue
+
+    fake.tables.clear()
+    fake.request_count = 0
+    sink = create_sink("supabase", main.supabase_pool, main.UPSERT_CHUNK_SIZE)
+    main.sink = WriteQueue(sink, window=window_ms / 1000) if window_ms else sink
+
+    async def scenario():
+        await main.supabase_pool.open()
+        try:
+            return await send_all(main, days, wait)
+        finally:
+            await main.supabase_pool.close()
+
+    elapsed = asyncio.run(scenario())
+    return {
+        "window_ms": window_ms,
+        "wait": wait,
+        "generate_calls": days * 48,
+        "http_writes": fake.request_count,
+        "elapsed_s": round(elapsed, 3),
+        "rows": {table: len(fake.rows(table)) for table in ("spot_results", "daily_results")},
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=28, help="並行して送る日数（日ごとのブロックは順番に送る）")
+    parser.add_argument("--delay", type=float, default=0.005, help="代替サーバーの擬似遅延（秒）")
+    parser.add_argument("--window-ms", type=int, default=20)
+    args = parser.parse_args()
+
+    fake = FakeSupabase(delay=args.delay).start()
+    os.environ["SUPABASE_URL"] = fake.url
+    os.environ["SUPABASE_KEY"] = FAKE_SUPABASE_KEY
+    # 同じ日付を繰り返し送るため、同じ内容の書き込みの省略を無効にする
+    os.environ["WRITE_INDEX_MAX_ENTRIES"] = "0"
+    import main
+
+    try:
+        baseline = run(main, fake, 0, args.days, wait=False)
+        expected = {table: normalize(fake.rows(table)) for table in ("spot_results", "daily_results")}
+        print(f"   no queue: {baseline}")
+        for wait in (False, True):
+            result = run(main, fake, args.window_ms, args.days, wait=wait)
+            for table, rows in expected.items():
+                assert normalize(fake.rows(table)) == rows, table
+            print(f"write queue: {result}")
+    finally:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main_cli()
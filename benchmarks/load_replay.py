@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+30分スケジュールを仮想時計で早送り再生する負荷生成ツール
+
+EventBridge の30分ごとの起動を待たずに、指定日数分の全ブロック（1日48回）を
+date / time_block を明示したリクエストとして再生する。仮想時計は --speed 倍速で進み
+（--speed 0 は待ちなしで最速）、各ティックのリクエストは --concurrency 件まで並行して送る。
+前のティックの応答を待たずに次のティックを開始する（オープンループ）ため、
+サーバーが追いつかない場合はティックの遅れ（lag）として現れる。
+（--speed 0 では全ティックがほぼ同時に送られるため、同じ日のブロックの順序は保証されない）
+
+エンドポイント:
+    generate  ティックごとに ペルソナ × --devices 件の POST /generate
+              （/generate はペルソナ単位なので、--devices は同じペルソナへの同時リクエスト数になる）
+    batch     ティックごとに ペルソナ × --devices 件をまとめた1回の POST /generate/batch
+    fleet     ティックごとにペルソナ1件につき devices=--devices の POST /generate/fleet
+
+使用例:
+    # 起動中のAPIに対して、2日分を3600倍速（1ティック0.5秒）で再生
+    python3 benchmarks/load_replay.py --url http://localhost:8020 --days 2 --speed 3600
+    # APIとSupabase代替サーバーをプロセス内で起動して最速で再生
+    python3 benchmarks/load_replay.py --in-process --days 7 --speed 0 --endpoint batch --devices 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "api"))
+
+SECONDS_PER_BLOCK = 30 * 60
+
+
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(p / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def block_str(block: int) -> str:
+    return f"{block // 2:02d}-{'30' if block % 2 else '00'}"
+
+
+def tick_requests(endpoint: str, personas: list, devices: int, date: str, block: int) -> list:
+    """1ティック分の (パス, 本文, 生成件数) の一覧"""
+    target = {"date": date, "time_block": block_str(block)}
+    if endpoint == "generate":
+        return [("/generate", {"persona_id": p, **target}, 1) for p in personas for _ in range(devices)]
+    if endpoint == "batch":
+        items = [{"persona_id": p, **target} for p in personas for _ in range(devices)]
+        return [("/generate/batch", {"items": items}, len(items))]
+    return [("/generate/fleet", {"persona_id": p, "devices": devices, **target}, devices) for p in personas]
+
+
+class Replay:
+    def __init__(self, client, concurrency: int):
+        self.client = client
+        self.concurrency = concurrency
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.latencies = []
+        self.statuses = Counter()
+        self.items = 0
+        self.item_errors = 0
+        self.tick_lags = []
+
+    async def send(self, path: str, body: dict, items: int) -> None:
+        async with self.semaphore:
+            start = time.perf_counter()
+            try:
+                response = await self.client.post(path, json=body)
+                status = str(response.status_code)
+            except Exception as e:
+                response = None
+                status = type(e).__name__
+            self.latencies.append(time.perf_counter() - start)
+            self.statuses[status] += 1
+            if status != "200":
+                return
+            if path == "/generate/batch":
+                # バッチは不正な項目があっても200で返るため、項目ごとの結果を数える
+                result = response.json()
+                self.items += result.get("generated", 0)
+                self.item_errors += len(result.get("errors", []))
+            else:
+                self.items += items
+
+    async def run(self, endpoint: str, personas: list, devices: int, start_date: str, days: int, speed: float) -> float:
+        start = datetime.strptime(start_date, "%Y-%m-%d")
+        interval = SECONDS_PER_BLOCK / speed if speed > 0 else 0.0
+        pending = set()
+        started = time.perf_counter()
+
+        tick = 0
+        for day in range(days):
+            date = str((start + timedelta(days=day)).date())
+            for block in range(48):
+                # 仮想時計で tick 番目のブロックが来る実時間まで待つ
+                scheduled = started + tick * interval
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                self.tick_lags.append(max(0.0, time.perf_counter() - scheduled))
+                for path, body, items in tick_requests(endpoint, personas, devices, date, block):
+                    task = asyncio.ensure_future(self.send(path, body, items))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+                tick += 1
+                # 送信待ちが溜まりすぎないように、同時実行数の数倍を超えたら空くのを待つ
+                while len(pending) > self.concurrency * 4 + 64:
+                    await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+        if pending:
+            await asyncio.wait(pending)
+        return time.perf_counter() - started
+
+    def report(self, elapsed: float, simulated_blocks: int) -> dict:
+        requests = sum(self.statuses.values())
+        errors = requests - self.statuses.get("200", 0)
+        return {
+            "elapsed_s": round(elapsed, 3),
+            "simulated_hours": simulated_blocks / 2,
+            "speedup": round(simulated_blocks * SECONDS_PER_BLOCK / elapsed, 1) if elapsed else None,
+            "requests": requests,
+            "requests_per_s": round(requests / elapsed, 1) if elapsed else None,
+            "items_generated": self.items,
+            "items_per_s": round(self.items / elapsed, 1) if elapsed else None,
+            "latency_ms": {
+                "p50": round(percentile(self.latencies, 50) * 1000, 3),
+                "p90": round(percentile(self.latencies, 90) * 1000, 3),
+                "p99": round(percentile(self.latencies, 99) * 1000, 3),
+                "max": round(max(self.latencies, default=0) * 1000, 3),
+            },
+            "errors": errors,
+            "error_rate": round(errors / requests, 4) if requests else 0.0,
+            "item_errors": self.item_errors,
+            "status_counts": dict(self.statuses),
+            "tick_lag_ms": {
+                "p50": round(percentile(self.tick_lags, 50) * 1000, 3),
+                "max": round(max(self.tick_lags, default=0) * 1000, 3),
+            },
+        }
+
+
+async def replay(args) -> dict:
+    import httpx
+
+    fake = None
+    if args.in_process:
+        from fake_supabase import FakeSupabase, FAKE_SUPABASE_KEY
+
+        fake = FakeSupabase(delay=args.fake_delay).start()
+        os.environ["SUPABASE_URL"] = fake.url
+        os.environ["SUPABASE_KEY"] = FAKE_SUPABASE_KEY
+        import main
+
+        lifespan = main.app.router.lifespan_context(main.app)
+        await lifespan.__aenter__()
+        transport = httpx.ASGITransport(app=main.app)
+        base_url = "http://in-process"
+    else:
+        transport = None
+        base_url = args.url
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, transport=transport, limits=limits, timeout=args.timeout) as client:
+            runner = Replay(client, args.concurrency)
+            elapsed = await runner.run(args.endpoint, args.personas, args.devices, args.start_date, args.days, args.speed)
+    finally:
+        if fake is not None:
+            await lifespan.__aexit__(None, None, None)
+            fake.stop()
+
+    return {
+        "config": {
+            "target": "in-process" if args.in_process else args.url,
+            "endpoint": args.endpoint,
+            "personas": args.personas,
+            "devices": args.devices,
+            "start_date": args.start_date,
+            "days": args.days,
+            "speed": args.speed,
+            "concurrency": args.concurrency,
+        },
+        **runner.report(elapsed, args.days * 48),
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="対象APIのベースURL（例: http://localhost:8020）")
+    target.add_argument("--in-process", action="store_true", help="APIとSupabase代替サーバーをこのプロセス内で起動")
+    parser.add_argument("--endpoint", choices=["generate", "batch", "fleet"], default="generate")
+    parser.add_argument("--personas", nargs="+", default=["child_5yo"])
+    parser.add_argument("--devices", type=int, default=1, help="ペルソナあたりのデバイス数")
+    parser.add_argument("--start-date", default="2025-10-01")
+    parser.add_argument("--days", type=int, default=1)
+    parser.add_argument("--speed", type=float, default=0, help="実時間に対する倍率（1800で1ティック1秒、0で待ちなし）")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--fake-delay", type=float, default=0.0, help="--in-process 時の代替サーバーの擬似遅延（秒）")
+    parser.add_argument("--output", help="結果を保存するJSONファイル")
+    args = parser.parse_args()
+
+    result = asyncio.run(replay(args))
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Supabase障害時のスプール（SPOOL_PATH）の動作確認
+代替サーバーを障害状態にして1日分の POST /generate を送り、すべて200で返ることと
+スプールに溜まることを確認する。その後アプリを止め、障害を復旧してから再起動し、
+前回の未送信分も含めて全件がSupabaseに届くこと（最終的な行がスプールなしと同じこと）を確認する
+
+使用例:
+    python3 benchmarks/spool_outage.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from fake_supabase import FakeSupabase, FAKE_SUPABASE_KEY
+
+IGNORED_COLUMNS = ("created_at", "updated_at")
+
+
+def normalize(rows: list) -> list:
+    return sorted(tuple(sorted((k, repr(v)) for k, v in row.items() if k not in IGNORED_COLUMNS)) for row in rows)
+
+
+def use_spool(main, path: str):
+    from sinks import create_sink
+    from spool import SpoolSink
+
+    main.spool = SpoolSink(create_sink("supabase", main.supabase_pool, main.UPSERT_CHUNK_SIZE), path,
+                           retry_base=0.05, retry_max=0.5)
+    main.sink = main.spool
+
+
+def generate_day(client, main, date: str) -> None:
+    for block in range(48):
+        response = client.post("/generate", json={"persona_id": "child_5yo", "date": date, "time_block": main.block_index_to_str(block)})
+        assert response.status_code == 200, response.text
+
+
+def main_cli():
+    from fastapi.testclient import TestClient
+
+    fake = FakeSupabase().start()
+    os.environ["SUPABASE_URL"] = fake.url
+    os.environ["SUPABASE_KEY"] = FAKE_SUPABASE_KEY
+    # 同じ日を2回生成するため、同じ内容の書き込みの省略を無効にする
+    os.environ["WRITE_INDEX_MAX_ENTRIES"] = "0"
+    import main
+
+    try:
+        # スプールなしの結果（期待値）
+        with TestClient(main.app) as client:
+            generate_day(client, main, "2025-10-03")
+        expected = {table: normalize(fake.rows(table)) for table in ("spot_results", "daily_results")}
+        fake.tables.clear()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "spool.db")
+
+            # 障害中: 生成は成功し、スプールに溜まる
+            fake.fail(503)
+            use_spool(main, path)
+            with TestClient(main.app) as client:
+                generate_day(client, main, "2025-10-03")
+                time.sleep(0.3)
+                status = client.get("/spool").json()
+                print(f"during outage: depth={status['depth']} failures={status['consecutive_failures']} last_error={status['last_error']!r}")
+                assert status["depth"] == 96 and status["consecutive_failures"] > 0
+            assert not fake.rows("spot_results")
+
+            # 復旧後に再起動: 前回の未送信分が送られる
+            fake.recover()
+            use_spool(main, path)
+            assert main.spool.depth == 96
+            with TestClient(main.app) as client:
+                started = time.perf_counter()
+                drained = client.portal.call(main.spool.wait_drained, 10)
+                status = client.get("/spool").json()
+                print(f"after recovery: drained={drained} depth={status['depth']} sent={status['drained']} in {time.perf_counter() - started:.2f}s")
+                assert drained and status["depth"] == 0
+
+            for table, rows in expected.items():
+                assert normalize(fake.rows(table)) == rows, table
+            print("OK: all records reached Supabase after the outage")
+    finally:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main_cli()
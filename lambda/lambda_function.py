@@ -8,15 +8,27 @@ EventBridge (Cron)により30分ごとに実行される
 import os
 import json
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
+from requests.adapters import HTTPAdapter
 
 # 環境変数
 API_BASE_URL = os.environ.get("API_BASE_URL", "https://api.hey-watch.me")
 DEMO_GENERATOR_ENDPOINT = f"{API_BASE_URL}/demo-generator"
+# trueの場合、全ペルソナを /generate/batch への1リクエストでまとめて生成する
+USE_BATCH_API = os.environ.get("USE_BATCH_API", "false").lower() == "true"
+# ペルソナごとのAPI呼び出しの最大同時実行数（1で従来どおり逐次実行）
+MAX_CONCURRENCY = max(1, int(os.environ.get("MAX_CONCURRENCY", "8")))
 
 # 生成対象のペルソナリスト
 PERSONAS = ["child_5yo", "adult_30s", "elderly_70s"]
 
+# 全リクエストで共有するHTTPセッション（keep-aliveで接続を再利用）
+# ウォームスタート時はLambdaの実行環境ごと再利用される
+session = requests.Session()
+session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONCURRENCY))
+session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONCURRENCY))
+
 
 def get_jst_time():
     """JSTタイムゾーンで現在時刻を取得"""
@@ -30,7 +42,7 @@ def call_demo_generator_api(persona_id: str) -> dict:
         print(f"Calling Demo Generator API for persona: {persona_id}")
         print(f"URL: {DEMO_GENERATOR_ENDPOINT}/generate")
 
-        response = requests.post(
+        response = session.post(
             f"{DEMO_GENERATOR_ENDPOINT}/generate",
             json={"persona_id": persona_id},
             timeout=30
@@ -72,6 +84,65 @@ def call_demo_generator_api(persona_id: str) -> dict:
         }
 
 
+def call_demo_generator_batch_api(persona_ids: list) -> list:
+    """Demo Generator APIのバッチエンドポイントで全ペルソナをまとめて生成
+
+    戻り値はペルソナごとの結果（call_demo_generator_api と同じ形式）のリスト
+    """
+    try:
+        print(f"Calling Demo Generator batch API for personas: {persona_ids}")
+        print(f"URL: {DEMO_GENERATOR_ENDPOINT}/generate/batch")
+
+        response = session.post(
+            f"{DEMO_GENERATOR_ENDPOINT}/generate/batch",
+            json={"items": [{"persona_id": persona_id} for persona_id in persona_ids]},
+            timeout=30
+        )
+
+        if response.status_code != 200:
+            error_msg = f"API returned status {response.status_code}: {response.text}"
+            print(f"Error: {error_msg}")
+            return [{"success": False, "persona_id": p, "error": error_msg} for p in persona_ids]
+
+        body = response.json()
+        succeeded = {item["persona_id"]: item for item in body.get("results", [])}
+        failed = {item["persona_id"]: item for item in body.get("errors", [])}
+
+        results = []
+        for persona_id in persona_ids:
+            if persona_id in succeeded:
+                print(f"Success: {persona_id}")
+                results.append({"success": True, "persona_id": persona_id, "result": succeeded[persona_id]})
+            else:
+                error = failed.get(persona_id, {})
+                error_msg = f"API returned status {error.get('status_code')}: {error.get('detail')}"
+                print(f"Error: {persona_id} - {error_msg}")
+                results.append({"success": False, "persona_id": persona_id, "error": error_msg})
+        return results
+
+    except requests.Timeout:
+        error_msg = "API timeout after 30 seconds"
+        print(f"Error: {error_msg}")
+        return [{"success": False, "persona_id": p, "error": error_msg} for p in persona_ids]
+
+    except Exception as e:
+        error_msg = f"Exception: {str(e)}"
+        print(f"Error: {error_msg}")
+        return [{"success": False, "persona_id": p, "error": error_msg} for p in persona_ids]
+
+
+def call_demo_generator_api_concurrently(persona_ids: list) -> list:
+    """ペルソナごとの /generate を最大 MAX_CONCURRENCY 件ずつ並行して呼び出す
+
+    戻り値の順序は persona_ids と同じ
+    """
+    workers = min(MAX_CONCURRENCY, len(persona_ids))
+    if workers <= 1:
+        return [call_demo_generator_api(persona_id) for persona_id in persona_ids]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(call_demo_generator_api, persona_ids))
+
+
 def lambda_handler(event, context):
     """
     Lambda関数のメインハンドラー
@@ -85,10 +156,12 @@ def lambda_handler(event, context):
     error_count = 0
 
     # 各ペルソナのデータを生成
-    for persona_id in PERSONAS:
-        result = call_demo_generator_api(persona_id)
-        results.append(result)
+    if USE_BATCH_API:
+        results = call_demo_generator_batch_api(PERSONAS)
+    else:
+        results = call_demo_generator_api_concurrently(PERSONAS)
 
+    for result in results:
         if result["success"]:
             success_count += 1
         else: